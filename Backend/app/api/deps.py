@@ -12,8 +12,11 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core import security
 from app.core.config import config
 from app.core.db import AsyncSessionLocal, SessionLocal
-from app.models.user import User
+from app.core.metrics import metrics
+from app.models.user import User, UserStatus
 from app.schemas.common import TokenPayload
+from app.utils import token_epoch
+from app.utils.principal_cache import get_principal, set_principal
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{config.API_ROOT_URL}/login/access-token"
@@ -41,28 +44,80 @@ AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-async def get_current_user(session: AsyncSessionDep, token: TokenDep) -> User:
+def _decode_token(token: str) -> TokenPayload:
     try:
         payload = jwt.decode(token, config.SECRET_KEY, algorithms=[security.ALGORITHM])
-        token_data = TokenPayload(**payload)
+        return TokenPayload(**payload)
     except (InvalidTokenError, ValidationError):
         raise HTTPException(
             status_code=401,
             detail="Could not validate credentials",
         )
-    user = await session.get(User, token_data.sub)
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+
+
+async def _check_token_epoch(token_data: TokenPayload) -> int | None:
+    """
+    Reject tokens issued before the user's tokens were last revoked.
+
+    Returns the current epoch, or None when it is unknown (legacy token or no
+    epoch store) and the caller has to rely on the user row.
+    """
+    if token_data.ep is None:
+        return None
+    epoch = await token_epoch.get_epoch(token_data.sub)
+    if epoch is not None and token_data.ep != epoch:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return epoch
+
+
+async def _load_user(session: AsyncSession, token_data: TokenPayload) -> User:
+    user = await get_principal(token_data.sub)
+    if user is None:
+        user = await session.get(User, token_data.sub)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        await set_principal(user)
     if not user.is_active:
         raise HTTPException(status_code=401, detail="Inactive user")
     return user
 
 
+async def get_current_user(session: AsyncSessionDep, token: TokenDep) -> User:
+    token_data = _decode_token(token)
+    await _check_token_epoch(token_data)
+    return await _load_user(session, token_data)
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
-def is_superuser(current_user: CurrentUser) -> bool:
-    if current_user and current_user.is_superuser:
+async def get_token_principal(
+    session: AsyncSessionDep, token: TokenDep
+) -> TokenPayload:
+    """
+    Authorize from the token claims alone when they can be trusted.
+
+    Tokens carrying role/status claims with a current epoch skip the user
+    lookup; anything else falls back to loading the user.
+    """
+    token_data = _decode_token(token)
+    if token_data.has_claims and await _check_token_epoch(token_data) is not None:
+        if token_data.st != UserStatus.ACTIVE.value:
+            raise HTTPException(status_code=401, detail="Inactive user")
+        metrics.increment("auth.stateless")
+        return token_data
+
+    user = await _load_user(session, token_data)
+    return TokenPayload(
+        sub=str(user.id), su=user.is_superuser, st=UserStatus(user.status).value
+    )
+
+
+TokenPrincipal = Annotated[TokenPayload, Depends(get_token_principal)]
+
+
+def is_superuser(principal: TokenPrincipal) -> bool:
+    if principal.su:
         return True
     raise HTTPException(
         status_code=403,
@@ -70,5 +125,6 @@ def is_superuser(current_user: CurrentUser) -> bool:
     )
 
 
-Authenticated = Depends(get_current_user)
+# Authenticated/IsSuperUser don't need the user row; use CurrentUser when they do
+Authenticated = Depends(get_token_principal)
 IsSuperUser = Depends(is_superuser)
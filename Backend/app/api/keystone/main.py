@@ -2,6 +2,8 @@ from fastapi import APIRouter
 
 from app.api.keystone.routes import (
     auth,
+    dashboard,
+    exports,
     groups,
     invitations,
     notifications,
@@ -20,3 +22,5 @@ api_router.include_router(user_settings.router)
 api_router.include_router(notifications.router)
 api_router.include_router(utils.router)
 api_router.include_router(transactions.router)
+api_router.include_router(exports.router)
+api_router.include_router(dashboard.router)
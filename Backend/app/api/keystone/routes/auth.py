@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from loguru import logger
 from sqlmodel import select
@@ -28,7 +28,7 @@ from app.api.keystone.utils.user import (
 )
 from app.core import security
 from app.core.config import USER_APPROVAL_FLOW, config
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash_async, verify_password_async
 from app.emails.utils import send_email
 from app.models import Invitation, User, UserGroup
 from app.models.invitation import InvitationRegistration, InvitationType
@@ -44,10 +44,16 @@ from app.schemas.user import (
     UserRegister,
     UserUpdateMe,
 )
+from app.utils.datatable_count import invalidate_counts
+from app.utils.group_membership import record_user_left_groups
 from app.utils.notification import (
     create_notification,
     send_notification_to_admins,
 )
+from app.utils.principal_cache import invalidate_principals
+from app.utils.rate_limit import throttle_auth
+from app.utils.token_epoch import issue_epoch, revoking_tokens
+from app.utils.token_filter import might_exist, record_tokens, remember_missing
 
 router = APIRouter(
     tags=["login"],
@@ -69,9 +75,15 @@ async def register_user(
         )
     invitation_id = None
     if user_in.invitation_token:
-        query = select(Invitation).where(Invitation.token == user_in.invitation_token)
-        result = await session.exec(query)
-        invitation = result.first()
+        invitation = None
+        if await might_exist("invitation", user_in.invitation_token):
+            query = select(Invitation).where(
+                Invitation.token == user_in.invitation_token
+            )
+            result = await session.exec(query)
+            invitation = result.first()
+            if not invitation:
+                await remember_missing("invitation", user_in.invitation_token)
         if not invitation:
             raise HTTPException(status_code=400, detail="Invalid invitation token")
         if not invitation.active:
@@ -113,6 +125,7 @@ async def register_user(
         )
         session.add(invitation_registration)
         await session.commit()
+        await invalidate_counts("invitations")
 
     if user and user.status == UserStatus.PENDING_EMAIL_VERIFICATION:
         logger.info(f"Email Invitation pending")
@@ -154,13 +167,18 @@ async def register_user(
 
 @router.post("/login/access-token")
 async def login_access_token(
+    request: Request,
     session: AsyncSessionDep,
     background_tasks: BackgroundTasks,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ) -> Token:
     """OAuth2 compatible token login, get an access token for future requests"""
+    await throttle_auth(request, "login", email=form_data.username)
     user = await authenticate(
-        session=session, email=form_data.username, password=form_data.password
+        session=session,
+        email=form_data.username,
+        password=form_data.password,
+        background_tasks=background_tasks,
     )
     if not user:
         # print('auth side br yoyoyoyoyoyoyoyoyo')
@@ -181,7 +199,11 @@ async def login_access_token(
 
     return Token(
         access_token=security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user.id,
+            expires_delta=access_token_expires,
+            is_superuser=user.is_superuser,
+            status=user.status.value,
+            epoch=await issue_epoch(user.id),
         )
     )
 
@@ -209,6 +231,8 @@ async def update_user_me(
     db_user.sqlmodel_update(user_data)
 
     await session.commit()
+    await invalidate_principals(db_user.id)
+    await invalidate_counts("users")
     await session.refresh(db_user)
 
     return UserPublic.model_validate(db_user)
@@ -216,17 +240,22 @@ async def update_user_me(
 
 @router.patch("/me/password")
 async def update_password_me(
-    *, session: AsyncSessionDep, body: UpdatePassword, current_user: CurrentUser
+    *,
+    request: Request,
+    session: AsyncSessionDep,
+    body: UpdatePassword,
+    current_user: CurrentUser,
 ) -> Message:
     """
     Update own password.
     """
+    await throttle_auth(request, "update_password", email=current_user.email)
     # Get a fresh copy of the user that belongs to this session
     db_user = await session.get(User, current_user.id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if not verify_password(body.current_password, db_user.hashed_password):
+    if not await verify_password_async(body.current_password, db_user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect password")
 
     if body.current_password == body.new_password:
@@ -234,10 +263,11 @@ async def update_password_me(
             status_code=400, detail="New password cannot be the same as the current one"
         )
 
-    hashed_password = get_password_hash(body.new_password)
+    hashed_password = await get_password_hash_async(body.new_password)
     db_user.hashed_password = hashed_password
 
-    await session.commit()
+    async with revoking_tokens(db_user.id):
+        await session.commit()
     await session.refresh(db_user)
 
     logger.info(f"User {db_user.email} updated their password")
@@ -277,9 +307,15 @@ async def deactivate_self(
     user_groups = await session.scalars(
         select(UserGroup).where(UserGroup.user_id == db_user.id)
     )
+    group_ids = []
     for user_group in user_groups:
+        group_ids.append(user_group.group_id)
         await session.delete(user_group)
-    await session.commit()
+    async with revoking_tokens(db_user.id):
+        await session.commit()
+    await record_user_left_groups(db_user.id, group_ids)
+    await invalidate_principals(db_user.id)
+    await invalidate_counts("users", "groups")
     await session.refresh(db_user)
 
     logger.info(f"User {db_user.id} deactivated their account")
@@ -301,11 +337,15 @@ async def deactivate_self(
 
 @router.post("/password-recovery/{email}")
 async def recover_password(
-    email: str, session: AsyncSessionDep, background_tasks: BackgroundTasks
+    email: str,
+    request: Request,
+    session: AsyncSessionDep,
+    background_tasks: BackgroundTasks,
 ) -> Message:
     """
     Password Recovery
     """
+    await throttle_auth(request, "password_recovery", email=email)
     user = await get_user_by_email(session=session, email=email)
 
     if not user:
@@ -324,6 +364,7 @@ async def recover_password(
         session.add(password_reset_record)
         await session.commit()
         await session.refresh(password_reset_record)
+        await record_tokens("password_reset", [password_reset_record.token])
 
     email_data = generate_reset_password_email(
         email_to=user.email, email=email, token=password_reset_record.token
@@ -345,14 +386,21 @@ async def recover_password(
 
 
 @router.post("/reset-password")
-async def reset_password(session: AsyncSessionDep, body: NewPassword) -> Message:
+async def reset_password(
+    request: Request, session: AsyncSessionDep, body: NewPassword
+) -> Message:
     """
     Reset password
     """
+    await throttle_auth(request, "reset_password")
 
-    password_reset_record = await get_password_reset_record_by_token(
-        session=session, token=body.token
-    )
+    password_reset_record = None
+    if await might_exist("password_reset", body.token):
+        password_reset_record = await get_password_reset_record_by_token(
+            session=session, token=body.token
+        )
+        if not password_reset_record:
+            await remember_missing("password_reset", body.token)
     logger.info('password_reset_record', password_reset_record)
 
     if not password_reset_record:
@@ -371,20 +419,21 @@ async def reset_password(session: AsyncSessionDep, body: NewPassword) -> Message
         raise HTTPException(status_code=400, detail="Inactive user")
 
     # Check if new password matches current password
-    if verify_password(body.new_password, user.hashed_password):
+    if await verify_password_async(body.new_password, user.hashed_password):
         raise HTTPException(
             status_code=400,
             detail="New password cannot be the same as current password",
         )
 
-    hashed_password = get_password_hash(password=body.new_password)
+    hashed_password = await get_password_hash_async(body.new_password)
     user.hashed_password = hashed_password
     session.add(user)
 
     # Invalidate the reset record
     password_reset_record.expires_at = datetime.now(timezone.utc)
     session.add(password_reset_record)
-    await session.commit()
+    async with revoking_tokens(user.id):
+        await session.commit()
     logger.info(f"Password updated for user {user.email}")
 
     return Message(message="Password updated successfully")
@@ -399,6 +448,8 @@ async def verify_email(session: AsyncSessionDep, token: str) -> Message:
     """
     if not token:
         raise HTTPException(status_code=400, detail="No token provided")
+    if not await might_exist("email_verification", token):
+        raise HTTPException(status_code=404, detail="Invalid verification token")
 
     try:
         user = await get_user_by_email_verification_token(token=token, session=session)
@@ -410,6 +461,7 @@ async def verify_email(session: AsyncSessionDep, token: str) -> Message:
         )
 
     if not user:
+        await remember_missing("email_verification", token)
         raise HTTPException(status_code=404, detail="Invalid verification token")
 
     print('user information', user)
@@ -418,6 +470,8 @@ async def verify_email(session: AsyncSessionDep, token: str) -> Message:
         user.email_verification_token = None
         session.add(user)
         await session.commit()
+        await invalidate_principals(user.id)
+        await invalidate_counts("users")
         return Message(message="Email verified successfully")
 
     elif user.is_active:
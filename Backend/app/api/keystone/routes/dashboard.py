@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from sqlmodel import func, select
+
+from app.api.deps import AsyncSessionDep, Authenticated, IsSuperUser
+from app.models import DashboardCounter
+from app.schemas.dashboard import DashboardSummary
+from app.utils.dashboard_counters import (
+    invitation_type_counts,
+    read_counters,
+    user_status_counts,
+)
+
+router = APIRouter(
+    prefix="/dashboard",
+    tags=["dashboard"],
+    dependencies=[Authenticated, IsSuperUser],
+)
+
+
+@router.get("/summary")
+async def get_dashboard_summary(session: AsyncSessionDep) -> DashboardSummary:
+    """
+    User, invitation and group counts for the admin dashboard.
+
+    Read from counters maintained on every write, so the cost doesn't grow
+    with the tables.
+    """
+    counters = await read_counters(session)
+    invitations = await invitation_type_counts(session, counters)
+    updated_at = await session.scalar(select(func.max(DashboardCounter.updated_at)))
+    return DashboardSummary(
+        users=user_status_counts(counters),
+        invitations=invitations,
+        active_groups=counters.get("groups.active", 0),
+        registered=invitations.registered,
+        updated_at=updated_at,
+    )
@@ -0,0 +1,97 @@
+import uuid
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+
+from app.api.deps import AsyncSessionDep, Authenticated, CurrentUser, IsSuperUser
+from app.api.keystone.routes.users import USER_CURSOR_COLUMNS
+from app.api.keystone.utils.export import parse_export_filters
+from app.jobs.exports import wake_export_dispatcher
+from app.models.job import Job, JobStatus, JobType
+from app.schemas.export import ExportCreate, ExportRead
+from app.schemas.user import UsersExportParams
+from app.utils.job_files import read_job_file
+
+router = APIRouter(
+    prefix="/exports",
+    tags=["exports"],
+    dependencies=[Authenticated, IsSuperUser],
+)
+
+
+async def _get_export(session: AsyncSessionDep, id: uuid.UUID) -> Job:
+    job = await session.get(Job, id)
+    if not job or job.type != JobType.EXPORT:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
+
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+async def create_export(
+    session: AsyncSessionDep, current_user: CurrentUser, body: ExportCreate
+) -> ExportRead:
+    """
+    Queue an export of users, groups, invitations or transactions.
+
+    The file is written in the background; poll `GET /exports/{id}` until
+    it is completed, then fetch it from `GET /exports/{id}/download`.
+    """
+    try:
+        filters = parse_export_filters(body.resource, body.filters)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    # Sorting by an indexed column lets rows stream without a full sort first
+    if (
+        isinstance(filters, UsersExportParams)
+        and filters.order_by not in USER_CURSOR_COLUMNS
+    ):
+        raise HTTPException(
+            status_code=400, detail=f"Cannot export ordered by {filters.order_by}"
+        )
+
+    job = Job(
+        type=JobType.EXPORT,
+        created_by_user_id=current_user.id,
+        params={
+            "resource": body.resource,
+            "format": body.format,
+            # Export files are always compressed
+            "filters": filters.model_dump(mode="json", exclude={"gzip"}),
+        },
+    )
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+
+    wake_export_dispatcher()
+    return ExportRead.from_job(job)
+
+
+@router.get("/{id}")
+async def read_export(session: AsyncSessionDep, id: uuid.UUID) -> ExportRead:
+    """Get the status and progress of an export."""
+    return ExportRead.from_job(await _get_export(session, id))
+
+
+@router.get("/{id}/download")
+async def download_export(session: AsyncSessionDep, id: uuid.UUID) -> StreamingResponse:
+    """Download the gzipped file of a completed export."""
+    job = await _get_export(session, id)
+    if job.status == JobStatus.EXPIRED:
+        raise HTTPException(status_code=410, detail="Export file has expired")
+    if job.status != JobStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Export is not completed")
+
+    file_name = f"{job.params['resource']}.{job.params['format']}.gz"
+    return StreamingResponse(
+        read_job_file(job.id),
+        media_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{file_name}"',
+            "Content-Length": str(job.result["file_size"]),
+            # Already compressed, keeps GZipMiddleware from doing it again
+            "Content-Encoding": "identity",
+        },
+    )
@@ -1,4 +1,8 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+import uuid
+from operator import attrgetter
+from typing import Annotated
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, status
 from sqlalchemy.orm import selectinload
 from sqlmodel import func, or_, select
 
@@ -8,7 +12,8 @@ from app.api.deps import (
     CurrentUser,
     IsSuperUser,
 )
-from app.models.group import Group
+from app.api.keystone.utils import group as group_utils
+from app.models.group import Group, UserGroup
 from app.models.notification import NotificationType
 from app.models.transaction import Action, Model
 from app.models.user import User
@@ -16,6 +21,9 @@ from app.schemas.common import Message
 from app.schemas.group import (
     GroupCreate,
     GroupCreateInput,
+    GroupMemberRead,
+    GroupMembersPage,
+    GroupMembersParams,
     GroupRead,
     GroupReadWithUsers,
     GroupsDataTable,
@@ -25,11 +33,23 @@ from app.schemas.group import (
     GroupUserAdd,
 )
 from app.schemas.transaction import TransactionMetaData
+from app.utils import group_membership
 from app.utils import notification as notification_utils
 from app.utils import transaction as transaction_utils
+from app.utils.datatable_count import count_rows, invalidate_counts
+from app.utils.pagination import KeysetPaginator, cursor_column
+from app.utils.search import apply_user_search
+from app.utils.sql import any_of
+from app.utils.user_detail_cache import (
+    invalidate_group_details,
+    invalidate_user_details,
+)
 
 router = APIRouter(prefix="/groups", tags=["groups"], dependencies=[Authenticated])
 
+# Sort columns with a `(column, id)` index, see the keyset pagination migration
+GROUP_CURSOR_COLUMNS = ("created_at", "updated_at", "name")
+
 
 @router.get("/", dependencies=[IsSuperUser])
 async def read_groups(
@@ -54,23 +74,8 @@ async def read_groups_advanced(
     session: AsyncSessionDep, body: GroupsDataTableRequestBody
 ) -> GroupsDataTable:
     """Read groups with advanced filtering, searching, and pagination."""
-    # Create a subquery to count users for each group
-    user_count_subquery = (
-        select(Group.id.label("group_id"), func.count(User.id).label("user_count"))
-        .join(Group.users)
-        .group_by(Group.id)
-        .subquery()
-    )
-
-    # Main query with user count
-    query = (
-        select(
-            Group,
-            func.coalesce(user_count_subquery.c.user_count, 0).label("user_count"),
-        )
-        .outerjoin(user_count_subquery, Group.id == user_count_subquery.c.group_id)
-        .where(Group.is_active)
-    )
+    # `user_count` is the maintained `Group.member_count`
+    query = select(Group).where(Group.is_active)
 
     if body.search:
         search_terms = body.search.split()
@@ -83,11 +88,28 @@ async def read_groups_advanced(
             )
 
     if body.filters.user_id:
-        query = query.where(Group.users.any(User.id == body.filters.user_id))
+        group_ids = await group_membership.user_groups(session, body.filters.user_id)
+        if group_ids is None:
+            query = query.where(Group.users.any(User.id == body.filters.user_id))
+        else:
+            query = query.where(any_of(Group.id, group_ids))
 
     # Count total matches for pagination
-    count_query = select(func.count()).select_from(query.subquery())
-    count = await session.scalar(count_query)
+    count, count_strategy = await count_rows(session, query, body, scope="groups")
+
+    if body.pagination == "cursor":
+        paginator = KeysetPaginator(
+            body, cursor_column(Group, body.order_by, GROUP_CURSOR_COLUMNS), Group.id
+        )
+        result = await session.exec(paginator.apply(query))
+        groups, next_cursor, prev_cursor = paginator.page(result.all())
+        return GroupsDataTable(
+            data=[GroupRead.model_validate(group) for group in groups],
+            count=count,
+            count_strategy=count_strategy,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+        )
 
     # Apply sorting
     order_column = getattr(Group, body.order_by)
@@ -100,16 +122,9 @@ async def read_groups_advanced(
 
     # Execute query
     result = await session.exec(query)
-    groups_with_counts = result.all()
+    groups = [GroupRead.model_validate(group) for group in result.all()]
 
-    # Process results
-    groups = []
-    for group, user_count in groups_with_counts:
-        group_data = GroupRead.model_validate(group)
-        group_data.user_count = user_count
-        groups.append(group_data)
-
-    return GroupsDataTable(data=groups, count=count or 0)
+    return GroupsDataTable(data=groups, count=count, count_strategy=count_strategy)
 
 
 @router.post(
@@ -132,6 +147,7 @@ async def create_new_group(
     db_group = Group.model_validate(group_create)
     session.add(db_group)
     await session.commit()
+    await invalidate_counts("groups")
     await session.refresh(db_group)
 
     background_tasks.add_task(
@@ -181,13 +197,7 @@ async def update_existing_group(
     current_user: CurrentUser,
 ) -> GroupRead:
     """Update a group."""
-    statement = (
-        select(Group)
-        .options(
-            selectinload(Group.users),
-        )
-        .where(Group.id == group_id, Group.is_active)
-    )
+    statement = select(Group).where(Group.id == group_id, Group.is_active)
     result = await session.exec(statement)
     group = result.first()
     if not group or not group.is_active:
@@ -202,6 +212,8 @@ async def update_existing_group(
 
     session.add(group)
     await session.commit()
+    await invalidate_counts("groups")
+    await invalidate_group_details(group_id)
     await session.refresh(group)
 
     background_tasks.add_task(
@@ -226,41 +238,40 @@ async def update_group_users(
     background_tasks: BackgroundTasks,
     current_user: CurrentUser,
 ) -> GroupReadWithUsers:
-    """Update group users. Empty list removes all users."""
+    """
+    Replace the group users. Empty list removes all users.
+
+    Only the difference to the current members is written; the members are
+    read once, for the response.
+    """
     # Verify group exists
-    statement = (
-        select(Group)
-        .options(
-            selectinload(Group.users),
-        )
-        .where(Group.id == group_id, Group.is_active)
-    )
+    statement = select(Group).where(Group.id == group_id, Group.is_active)
     result = await session.exec(statement)
     group = result.first()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    if not users_in.user_ids:
-        group.users = []
-        await session.commit()
-        return GroupReadWithUsers.model_validate(group)
-
     # Verify all users exist
-    query = select(User).where(User.id.in_(users_in.user_ids))
-    result = await session.exec(query)
-    users = result.all()
-    found_user_ids = {user.id for user in users}
-    invalid_user_ids = set(users_in.user_ids) - found_user_ids
+    invalid_user_ids = await group_utils.find_missing_users(
+        session=session, user_ids=users_in.user_ids
+    )
     if invalid_user_ids:
         raise HTTPException(
-            status_code=400, detail=f"Users not found: {invalid_user_ids}"
+            status_code=400, detail=f"Users not found: {set(invalid_user_ids)}"
         )
 
-    old_user_ids = [user.id for user in group.users]
-    # Replace existing users with new list
-    group.users = users
+    added_ids, removed_ids = await group_utils.replace_group_members(
+        session=session, group_id=group_id, user_ids=users_in.user_ids
+    )
     await session.commit()
+    await invalidate_counts("users", "groups")
+    await invalidate_user_details(*added_ids, *removed_ids)
+    await group_membership.record_membership_changes(
+        group_id, added=added_ids, removed=removed_ids
+    )
+    # Picks up the member count kept by the trigger
     await session.refresh(group)
+    await session.refresh(group, ["users"])
 
     background_tasks.add_task(
         transaction_utils.log_transaction,
@@ -269,8 +280,8 @@ async def update_group_users(
         record_id=str(group_id),
         action=Action.UPDATE,
         meta_data=TransactionMetaData(
-            old_data={"users": [str(u) for u in old_user_ids]},
-            new_data={"users": [str(u) for u in users_in.user_ids]},
+            old_data={"removed_users": [str(u) for u in removed_ids]},
+            new_data={"added_users": [str(u) for u in added_ids]},
         ),
         description=f"Group {group.name} users updated",
     )
@@ -297,6 +308,8 @@ async def delete_existing_group(
     group.is_active = False
     session.add(group)
     await session.commit()
+    await invalidate_counts("groups")
+    await invalidate_group_details(group_id)
 
     background_tasks.add_task(
         transaction_utils.log_transaction,
@@ -319,41 +332,121 @@ async def delete_existing_group(
     return Message(message="Group deleted successfully")
 
 
+@router.get("/{group_id}/members", dependencies=[IsSuperUser])
+async def read_group_members(
+    session: AsyncSessionDep,
+    group_id: int,
+    params: Annotated[GroupMembersParams, Query()],
+) -> GroupMembersPage:
+    """
+    List the members of a group, a page at a time.
+
+    Pages by keyset: pass the `next_cursor` or `prev_cursor` of a response
+    back as `cursor`. `search` matches names and email.
+    """
+    statement = select(Group).where(Group.id == group_id, Group.is_active)
+    group = (await session.exec(statement)).first()
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    query = (
+        select(User, UserGroup)
+        .join(UserGroup, UserGroup.user_id == User.id)
+        .where(UserGroup.group_id == group_id)
+    )
+    if params.search:
+        query, _ = apply_user_search(query, params.search, "contains")
+
+    if params.order_by == "id":
+        paginator = KeysetPaginator(params, UserGroup.user_id, UserGroup.user_id)
+        entity = attrgetter("UserGroup")
+    else:
+        paginator = KeysetPaginator(params, getattr(User, params.order_by), User.id)
+        entity = attrgetter("User")
+
+    result = await session.exec(paginator.apply(query))
+    rows, next_cursor, prev_cursor = paginator.page(result.all(), entity=entity)
+    return GroupMembersPage(
+        data=[
+            GroupMemberRead.model_validate(
+                user, update={"joined_at": membership.created_at}
+            )
+            for user, membership in rows
+        ],
+        count=group.member_count,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+    )
+
+
+@router.put("/{group_id}/users/{user_id}", dependencies=[IsSuperUser])
+async def add_user_to_group(
+    session: AsyncSessionDep,
+    group_id: int,
+    user_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
+    current_user: CurrentUser,
+) -> Message:
+    """Add a single user to a group, doing nothing if they are a member."""
+    statement = select(Group).where(Group.id == group_id, Group.is_active)
+    group = (await session.exec(statement)).first()
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    if not await session.get(User, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    added = await group_utils.add_group_member(
+        session=session, group_id=group_id, user_id=user_id
+    )
+    await session.commit()
+    if not added:
+        return Message(message="User is already in this group")
+
+    await invalidate_counts("users", "groups")
+    await invalidate_user_details(user_id)
+    await group_membership.record_membership_changes(group_id, added=[user_id])
+
+    background_tasks.add_task(
+        transaction_utils.log_transaction,
+        user_id=current_user.id,
+        model=Model.GROUP,
+        record_id=str(group_id),
+        action=Action.UPDATE,
+        meta_data=TransactionMetaData(new_data={"added_users": [str(user_id)]}),
+        description=f"User {user_id} added to group {group.name}",
+    )
+
+    return Message(message="User added to group successfully")
+
+
 @router.delete("/{group_id}/users/{user_id}")
 async def remove_user_from_group(
     session: AsyncSessionDep,
     group_id: int,
-    user_id: str,
+    user_id: uuid.UUID,
     background_tasks: BackgroundTasks,
     current_user: CurrentUser,
 ) -> Message:
     """Remove a specific user from a group."""
     # Verify group exists
-    statement = (
-        select(Group)
-        .options(
-            selectinload(Group.users),
-        )
-        .where(Group.id == group_id, Group.is_active)
-    )
+    statement = select(Group).where(Group.id == group_id, Group.is_active)
     result = await session.exec(statement)
     group = result.first()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    # Verify user exists and is in the group
-    user = await session.get(User, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    if user not in group.users:
+    removed = await group_utils.remove_group_member(
+        session=session, group_id=group_id, user_id=user_id
+    )
+    if not removed:
+        if not await session.get(User, user_id):
+            raise HTTPException(status_code=404, detail="User not found")
         raise HTTPException(status_code=400, detail="User is not in this group")
 
-    # Remove user from group
-    old_user_ids = [str(u.id) for u in group.users]
-    group.users.remove(user)
     await session.commit()
-    await session.refresh(group)
+    await invalidate_counts("users", "groups")
+    await invalidate_user_details(user_id)
+    await group_membership.record_membership_changes(group_id, removed=[user_id])
 
     background_tasks.add_task(
         transaction_utils.log_transaction,
@@ -361,10 +454,7 @@ async def remove_user_from_group(
         model=Model.GROUP,
         record_id=str(group_id),
         action=Action.UPDATE,
-        meta_data=TransactionMetaData(
-            old_data={"users": old_user_ids},
-            new_data={"users": [str(u.id) for u in group.users]},
-        ),
+        meta_data=TransactionMetaData(old_data={"removed_users": [str(user_id)]}),
         description=f"User {user_id} removed from group {group.name}",
     )
 
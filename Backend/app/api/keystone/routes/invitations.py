@@ -1,10 +1,19 @@
 import uuid
-from collections import Counter
 from datetime import datetime, timezone
-
-from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+from pathlib import Path
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Form,
+    HTTPException,
+    UploadFile,
+    status,
+)
+from pydantic import AwareDatetime
 from sqlalchemy.orm import selectinload
-from sqlmodel import and_, func, select
+from sqlmodel import and_, select
 
 from app.api.deps import (
     AsyncSessionDep,
@@ -14,9 +23,16 @@ from app.api.deps import (
 )
 from app.api.keystone.utils.invitation import (
     create_invitation,
+    lock_email_invitations,
     send_invitation_email,
 )
+from app.core.config import config
+from app.jobs.invitation_uploads import (
+    UPLOAD_FORMATS,
+    wake_invitation_upload_dispatcher,
+)
 from app.models.invitation import Invitation, InvitationRegistration, InvitationType
+from app.models.job import Job, JobType
 from app.models.transaction import Action, Model
 from app.models.user import User
 from app.schemas.common import Message
@@ -28,13 +44,22 @@ from app.schemas.invitation import (
     InvitationsRead,
     InvitationTokenRead,
     InvitationTypeCount,
+    InvitationUploadRead,
     ReadInvitationsRequestBody,
 )
 from app.schemas.transaction import TransactionCreate, TransactionMetaData
 from app.utils import transaction as transaction_utils
+from app.utils.dashboard_counters import invitation_type_counts, read_counters
+from app.utils.datatable_count import count_rows, invalidate_counts
+from app.utils.job_files import JobFileWriter
+from app.utils.pagination import KeysetPaginator, cursor_column
+from app.utils.token_filter import might_exist, record_tokens, remember_missing
 
 router = APIRouter(prefix="/invitations", tags=["invitations"])
 
+# Sort columns with a `(column, id)` index, see the keyset pagination migration
+INVITATION_CURSOR_COLUMNS = ("created_at", "updated_at", "expires_at", "id")
+
 
 @router.post(
     "/datatable",
@@ -99,8 +124,25 @@ async def read_invitations_advanced(
             query = query.where(Invitation.created_at <= body.filters.created_at[1])
 
     # Get total count before pagination
-    count_query = select(func.count()).select_from(query.subquery())
-    count = await session.scalar(count_query)
+    count, count_strategy = await count_rows(session, query, body, scope="invitations")
+
+    if body.pagination == "cursor":
+        paginator = KeysetPaginator(
+            body,
+            cursor_column(Invitation, body.order_by, INVITATION_CURSOR_COLUMNS),
+            Invitation.id,
+        )
+        result = await session.exec(paginator.apply(query))
+        invitations, next_cursor, prev_cursor = paginator.page(result.unique().all())
+        return InvitationsRead.model_validate(
+            {
+                "data": invitations,
+                "count": count,
+                "count_strategy": count_strategy,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+            }
+        )
 
     # Apply ordering and pagination
     order_column = getattr(Invitation, body.order_by)
@@ -116,6 +158,7 @@ async def read_invitations_advanced(
         {
             "data": invitations,
             "count": count,
+            "count_strategy": count_strategy,
         }
     )
 
@@ -136,6 +179,9 @@ async def create_new_invitation(
 
     if invitation_in.type == InvitationType.EMAIL and invitation_in.emails:
         invitation_in.emails = list(set(invitation_in.emails))
+        # Held until commit, so concurrent invites of an email can't both
+        # miss each other
+        await lock_email_invitations(session)
         # Bulk check existing emails in one query
         result = await session.exec(
             select(User.email).where(User.email.in_(invitation_in.emails)).distinct()
@@ -182,6 +228,8 @@ async def create_new_invitation(
             ]
             session.add_all(invitations)
             await session.commit()
+            await record_tokens("invitation", [i.token for i in invitations])
+            await invalidate_counts("invitations")
 
             transaction_logs = [
                 TransactionCreate(
@@ -250,35 +298,74 @@ async def get_invitation_type_breakdown(
     """
     Get breakdown of invitations by type and status. Counts are split into active and inactive.
     """
-    counts = {
-        "email": 0,
-        "link": 0,
-        "active_total": 0,
-        "inactive_total": 0,
-        "total": 0,
-        "registered": 0,
-    }
-
-    result = await session.exec(select(Invitation))
-    invitations = result.all()
-    active_invitations = [invite for invite in invitations if invite.active]
-    type_counts = Counter(invite.type.value for invite in active_invitations)
-
-    for type_name, count_value in type_counts.items():
-        counts[type_name] = count_value
-
-    counts["active_total"] = len(active_invitations)
-    counts["inactive_total"] = len(invitations) - counts["active_total"]
-
-    # Count registered users (invitations with associated users)
-    registered_count = await session.scalar(
-        select(func.count()).select_from(InvitationRegistration)
+    return await invitation_type_counts(session, await read_counters(session))
+
+
+@router.post(
+    "/bulk-upload",
+    dependencies=[Authenticated, IsSuperUser],
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def upload_invitations(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    file: UploadFile,
+    user_expiry_date: Annotated[AwareDatetime | None, Form()] = None,
+) -> InvitationUploadRead:
+    """
+    Invite every email address of a CSV or NDJSON file.
+
+    CSV files use their `email` column, or their first column without a
+    header; NDJSON lines are `{"email": ...}` objects or strings. Addresses
+    with a user or an active invitation are skipped. The file is processed
+    in the background, poll `GET /invitations/bulk-upload/{id}` for progress.
+    """
+    format = UPLOAD_FORMATS.get(Path(file.filename or "").suffix.lower())
+    if format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload a .csv or .ndjson file",
+        )
+
+    job = Job(
+        type=JobType.INVITATION_UPLOAD,
+        created_by_user_id=current_user.id,
+        params={
+            "format": format,
+            "user_expiry_date": user_expiry_date and user_expiry_date.isoformat(),
+        },
     )
+    session.add(job)
+    # The file's rows refer to the job
+    await session.flush()
+    upload = JobFileWriter(session, job.id)
+    while data := await file.read(1024 * 1024):
+        if upload.size + len(data) > config.INVITATION_UPLOAD_MAX_SIZE_IN_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Upload is too large",
+            )
+        await upload.write(data)
+    await upload.close()
+    await session.commit()
+    await session.refresh(job)
 
-    counts["registered"] = registered_count or 0
-    counts["total"] = counts["active_total"] + counts["inactive_total"]
+    wake_invitation_upload_dispatcher()
+    return InvitationUploadRead.from_job(job)
 
-    return InvitationTypeCount(**counts)
+
+@router.get(
+    "/bulk-upload/{id}",
+    dependencies=[Authenticated, IsSuperUser],
+)
+async def read_invitation_upload(
+    session: AsyncSessionDep, id: uuid.UUID
+) -> InvitationUploadRead:
+    """Get the status and progress of an invitation upload."""
+    job = await session.get(Job, id)
+    if not job or job.type != JobType.INVITATION_UPLOAD:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return InvitationUploadRead.from_job(job)
 
 
 @router.get("/{invitation_id}")
@@ -317,9 +404,13 @@ async def read_invitation_by_token(
     session: AsyncSessionDep,
 ) -> InvitationTokenRead:
     """Get invitation details by token without authentication"""
-    statement = select(Invitation).where(Invitation.token == token)
-    result = await session.exec(statement)
-    invitation = result.first()
+    invitation = None
+    if await might_exist("invitation", token):
+        statement = select(Invitation).where(Invitation.token == token)
+        result = await session.exec(statement)
+        invitation = result.first()
+        if not invitation:
+            await remember_missing("invitation", token)
 
     if not invitation:
         raise HTTPException(
@@ -407,6 +498,7 @@ async def deactivate_invitation(
 
     session.add(invitation)
     await session.commit()
+    await invalidate_counts("invitations")
     await session.refresh(invitation)
 
     background_tasks.add_task(
@@ -1,11 +1,38 @@
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
-
-from app.api.deps import AsyncSessionDep, Authenticated, CurrentUser
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import AwareDatetime
+from sqlmodel import select
+
+from app.api.deps import (
+    AsyncSessionDep,
+    Authenticated,
+    CurrentUser,
+    IsSuperUser,
+    TokenPrincipal,
+)
+from app.core.config import config
+from app.jobs.notification_fanouts import wake_notification_fanout_dispatcher
+from app.models.group import Group
+from app.models.job import Job, JobType
 from app.models.notification import Notification
 from app.schemas.notification import (
+    NotificationFanoutCreate,
+    NotificationFanoutRead,
     NotificationList,
+    NotificationMarkRead,
     NotificationPublic,
+    NotificationsMarkedRead,
+    UnreadNotificationCount,
+)
+from app.utils.notification import mark_notifications_read
+from app.utils.notification_counter import invalidate_unread_counts, unread_count
+from app.utils.notification_stream import (
+    notification_events,
+    notification_hub,
+    publish_read,
 )
 
 router = APIRouter(
@@ -22,22 +49,58 @@ async def get_notifications(
     offset: int = 0,
     limit: int = 100,
 ) -> NotificationList:
-    """Get all unread notifications"""
-    statement = select(Notification).where(
-        Notification.user_id == current_user.id, Notification.is_read == False
-    )
-    count_statement = (
-        select(func.count())
-        .select_from(Notification)
+    """Get all unread notifications, newest first"""
+    statement = (
+        select(Notification)
         .where(Notification.user_id == current_user.id, Notification.is_read == False)
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
     )
-    count = await session.scalar(count_statement)
+    count = await unread_count(session, current_user.id)
 
     notifications = await session.scalars(statement.offset(offset).limit(limit))
 
     return NotificationList.model_validate({"data": notifications, "count": count})
 
 
+@router.get("/unread-count")
+async def get_unread_notification_count(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+) -> UnreadNotificationCount:
+    """Get the number of unread notifications, without a query when cached"""
+    return UnreadNotificationCount(count=await unread_count(session, current_user.id))
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_notifications(
+    session: AsyncSessionDep,
+    principal: TokenPrincipal,
+    last_event_id: Annotated[int | None, Header()] = None,
+) -> StreamingResponse:
+    """
+    Stream the current user's new notifications as server-sent events
+
+    `notification` events carry the notification, their id resumes the
+    stream through the Last-Event-ID header; `read` events carry the ids of
+    notifications marked read. Needs Redis, clients poll without it.
+    """
+    if not config.CACHE_ENABLED:
+        raise HTTPException(status_code=503, detail="Notification stream unavailable")
+    if notification_hub.connections >= config.NOTIFICATION_STREAM_MAX_CONNECTIONS:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many notification streams",
+            headers={"Retry-After": "30"},
+        )
+    # The stream outlives the request, don't hold on to its connection
+    await session.close()
+    return StreamingResponse(
+        notification_events(uuid.UUID(principal.sub), last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{notification_id}")
 async def get_notification(
     session: AsyncSessionDep,
@@ -74,9 +137,13 @@ async def mark_notification_as_read(
     if db_notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
+    was_read = db_notification.is_read
     db_notification.is_read = True
     session.add(db_notification)
     await session.commit()
+    if not was_read:
+        await invalidate_unread_counts(current_user.id)
+        await publish_read(current_user.id, [notification_id])
     await session.refresh(db_notification)
     return NotificationPublic.model_validate(db_notification)
 
@@ -85,18 +152,67 @@ async def mark_notification_as_read(
 async def mark_all_notifications_as_read(
     session: AsyncSessionDep,
     current_user: CurrentUser,
-) -> dict:
-    """Mark all of the current user's notifications as read"""
-    result = await session.exec(
-        select(Notification).where(
-            Notification.user_id == current_user.id, Notification.is_read == False
-        )
-    )
-    notifications = result.all()
+    before: AwareDatetime | None = None,
+) -> NotificationsMarkedRead:
+    """
+    Mark all of the current user's notifications as read, or only the ones
+    created before `before`
+    """
+    marked = await mark_notifications_read(session, current_user.id, before=before)
+    return NotificationsMarkedRead(count=len(marked))
+
+
+@router.patch("/read")
+async def mark_notifications_as_read(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    body: NotificationMarkRead,
+) -> NotificationsMarkedRead:
+    """Mark the current user's notifications with the given ids as read"""
+    marked = await mark_notifications_read(session, current_user.id, ids=body.ids)
+    return NotificationsMarkedRead(count=len(marked))
 
-    for notification in notifications:
-        notification.is_read = True
-        session.add(notification)
 
+@router.post(
+    "/fan-out", status_code=status.HTTP_202_ACCEPTED, dependencies=[IsSuperUser]
+)
+async def create_notification_fanout(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    body: NotificationFanoutCreate,
+) -> NotificationFanoutRead:
+    """
+    Queue a notification to every user of an audience
+
+    The notifications are created in the background; poll
+    `GET /notifications/fan-out/{id}` for progress.
+    """
+    group_id = body.audience.group_id
+    if group_id is not None and not await session.get(Group, group_id):
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    job = Job(
+        type=JobType.NOTIFICATION_FANOUT,
+        created_by_user_id=current_user.id,
+        params={
+            "audience": body.audience.model_dump(mode="json"),
+            "notification": body.model_dump(mode="json", exclude={"audience"}),
+        },
+    )
+    session.add(job)
     await session.commit()
-    return {"success": True, "count": len(notifications)}
+    await session.refresh(job)
+
+    wake_notification_fanout_dispatcher()
+    return NotificationFanoutRead.from_job(job)
+
+
+@router.get("/fan-out/{id}", dependencies=[IsSuperUser])
+async def read_notification_fanout(
+    session: AsyncSessionDep, id: uuid.UUID
+) -> NotificationFanoutRead:
+    """Get the status and progress of a notification fan-out"""
+    job = await session.get(Job, id)
+    if not job or job.type != JobType.NOTIFICATION_FANOUT:
+        raise HTTPException(status_code=404, detail="Fan-out not found")
+    return NotificationFanoutRead.from_job(job)
@@ -1,12 +1,10 @@
-import tempfile
 import uuid
+from typing import Annotated
 
-import aiofiles
-import aiofiles.os
-from fastapi import APIRouter, BackgroundTasks, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from loguru import logger
-from sqlmodel import func, or_, select
+from sqlmodel import select
 
 from app.api.deps import (
     AsyncSessionDep,
@@ -17,19 +15,19 @@ from app.api.deps import (
 from app.api.keystone.utils import user as user_utils
 from app.core.config import config
 from app.emails.utils import generate_new_account_email, send_email
-from app.models import Group, User, UserGroup
-from app.models.invitation import Invitation, InvitationRegistration
+from app.models import Group, User
 from app.models.transaction import Action, Model
 from app.schemas.transaction import TransactionMetaData
 from app.schemas.user import (
     ReadUsersRequestBody,
+    UserBulkUpdate,
+    UserBulkUpdateResult,
     UserCreate,
     UserDetail,
-    UserGroupRead,
-    UserInvitationRead,
     UserPublic,
     UserRegisterAdmin,
     UsersDataTable,
+    UsersExportParams,
     UserStatus,
     UserStatusCount,
     UserStatusResponse,
@@ -37,6 +35,13 @@ from app.schemas.user import (
     UserUpdate,
 )
 from app.utils import transaction as transaction_utils
+from app.utils.csv_export import stream_csv
+from app.utils.dashboard_counters import read_counters, user_status_counts
+from app.utils.datatable_count import count_rows, invalidate_counts
+from app.utils.pagination import KeysetPaginator, cursor_column
+from app.utils.principal_cache import invalidate_principals
+from app.utils.search import apply_user_search
+from app.utils.token_epoch import revoking_tokens
 
 router = APIRouter(
     prefix="/users",
@@ -44,6 +49,16 @@ router = APIRouter(
     dependencies=[Authenticated, IsSuperUser],
 )
 
+# Sort columns with a `(column, id)` index, see the keyset pagination migration
+USER_CURSOR_COLUMNS = (
+    "created_at",
+    "updated_at",
+    "first_name",
+    "last_name",
+    "email",
+    "status",
+)
+
 
 @router.post("/datatable")
 async def read_users_advanced(
@@ -51,42 +66,36 @@ async def read_users_advanced(
 ) -> UsersDataTable:
     query = select(User)
 
+    rank = None
     if body.search:
-        search_terms = body.search.split()
-        for term in search_terms:
-            query = query.where(
-                or_(
-                    User.first_name.ilike(f"%{term}%"),
-                    User.last_name.ilike(f"%{term}%"),
-                    User.email.ilike(f"%{term}%"),
-                )
-            )
+        query, rank = apply_user_search(query, body.search, body.search_mode)
+
+    query = await user_utils.filter_users_by_index(session, query, body.filters)
+
+    count, count_strategy = await count_rows(session, query, body, scope="users")
 
-    # Apply nested filters
-    if body.filters.status and body.filters.status != "all":
-        query = query.where(User.status == body.filters.status)
-    if body.filters.role and body.filters.role != "all":
-        query = query.where(User.is_superuser == (body.filters.role == "superuser"))
-    if body.filters.group and body.filters.group != "all":
-        query = query.where(
-            User.groups.any(UserGroup.group_id == int(body.filters.group))
+    if body.pagination == "cursor":
+        # Relevance isn't a stable page boundary, cursor pages keep `order_by`
+        paginator = KeysetPaginator(
+            body, cursor_column(User, body.order_by, USER_CURSOR_COLUMNS), User.id
         )
-    if body.filters.exclude_group and body.filters.exclude_group != "all":
-        query = query.where(
-            ~User.groups.any(UserGroup.group_id == int(body.filters.exclude_group))
+        users = (await session.scalars(paginator.apply(query))).all()
+        users, next_cursor, prev_cursor = paginator.page(users)
+        return UsersDataTable.model_validate(
+            {
+                "data": users,
+                "count": count,
+                "count_strategy": count_strategy,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+            }
         )
-    if body.filters.created_at:
-        if body.filters.created_at[0]:
-            query = query.where(User.created_at >= body.filters.created_at[0])
-        if body.filters.created_at[1]:
-            query = query.where(User.created_at <= body.filters.created_at[1])
-
-    count_query = select(func.count()).select_from(query.subquery())
-    count = await session.scalar(count_query)
 
     order_column = getattr(User, body.order_by)
     if body.order == "desc":
         order_column = order_column.desc()
+    if rank is not None and count <= config.USER_SEARCH_RANK_MAX_ROWS:
+        query = query.order_by(rank.desc())
     query = query.order_by(order_column)
     query = query.offset(body.offset).limit(body.limit)
 
@@ -96,6 +105,7 @@ async def read_users_advanced(
         {
             "data": users,
             "count": count,
+            "count_strategy": count_strategy,
         }
     )
 
@@ -158,6 +168,35 @@ async def create_user(
     return UserPublic.model_validate(user)
 
 
+@router.post("/bulk")
+async def bulk_update_users(
+    session: AsyncSessionDep,
+    bulk_in: UserBulkUpdate,
+    current_user: CurrentUser,
+) -> UserBulkUpdateResult:
+    """
+    Change the status, role or groups of many users at once.
+
+    Select users by `user_ids` or by the datatable `search` and `filters`.
+    Changes are applied in chunks, each committed with its audit entries, so
+    a failure part way leaves the earlier chunks applied. When tokens can't
+    be revoked the update stops and `complete` is false, the counts being
+    those of the chunks applied.
+    """
+    for group_id in (bulk_in.add_to_group, bulk_in.remove_from_group):
+        if group_id is None:
+            continue
+        group = await session.scalar(
+            select(Group.id).where(Group.id == group_id, Group.is_active)
+        )
+        if group is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+
+    return await user_utils.bulk_update_users(
+        session=session, bulk_in=bulk_in, current_user_id=current_user.id
+    )
+
+
 @router.get("/status-counts")
 async def get_user_status_breakdown(
     session: AsyncSessionDep,
@@ -165,58 +204,46 @@ async def get_user_status_breakdown(
     """
     Get breakdown of users by status.
     """
-
-    status_counts = select(User.status, func.count(User.id)).group_by(User.status)
-    results = await session.exec(status_counts)
-    status_results = results.all()
-
-    return UserStatusCount(
-        **{status.value: count for status, count in status_results},
-        total=sum(count for _, count in status_results),
-    )
+    return user_status_counts(await read_counters(session))
 
 
 @router.get("/export")
-async def export_user_data(session: AsyncSessionDep) -> FileResponse:
+async def export_user_data(
+    params: Annotated[UsersExportParams, Query()],
+) -> StreamingResponse:
     """
-    Export user data to CSV.
+    Export users matching the datatable filters to CSV.
+
+    Rows are streamed straight from the database, so there is no limit on
+    the number of users exported. With `gzip` a `users.csv.gz` file is sent.
     """
-    try:
-        users = await session.scalars(
-            select(User)
-            .where(User.status == UserStatus.ACTIVE)
-            .order_by(User.created_at.desc())
-            .limit(1000)
+    # Sorting by an indexed column lets rows stream without a full sort first
+    if params.order_by not in USER_CURSOR_COLUMNS:
+        raise HTTPException(
+            status_code=400, detail=f"Cannot export ordered by {params.order_by}"
         )
 
-        if not users:
-            raise HTTPException(status_code=404, detail="No users found")
-
-        # Create a temporary file
-        tmp_path = tempfile.mktemp(suffix=".csv")
-
-        # Use aiofiles to write asynchronously
-        async with aiofiles.open(tmp_path, mode="w") as tmp:
-            fieldnames = ["id", "first_name", "last_name", "email", "created_at"]
-
-            await tmp.write(",".join(fieldnames) + "\n")
-
-            for user in users:
-                row = {
-                    "id": user.id,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "email": user.email,
-                    "created_at": user.created_at.isoformat(),
-                }
-                # Escape commas and quotes in field values
-                csv_line = ",".join(f'"{str(row[field])}"' for field in fieldnames)
-                await tmp.write(csv_line + "\n")
-
-        return FileResponse(path=tmp_path, filename="users.csv", media_type="text/csv")
-    except Exception:
-        logger.warning("Error exporting data")
-        raise HTTPException(status_code=500, detail="Error exporting data")
+    content = stream_csv(
+        user_utils.build_users_export_query(params),
+        header=user_utils.USER_EXPORT_FIELDS,
+        compress=params.gzip,
+        batch_size=config.USER_EXPORT_BATCH_SIZE,
+    )
+    if params.gzip:
+        return StreamingResponse(
+            content,
+            media_type="application/gzip",
+            headers={
+                "Content-Disposition": 'attachment; filename="users.csv.gz"',
+                # Already compressed, keeps GZipMiddleware from doing it again
+                "Content-Encoding": "identity",
+            },
+        )
+    return StreamingResponse(
+        content,
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+    )
 
 
 @router.get("/{user_id}")
@@ -224,43 +251,10 @@ async def read_user_by_id(user_id: uuid.UUID, session: AsyncSessionDep) -> UserD
     """
     Get a specific user by id.
     """
-    user = await session.get(User, user_id)
-
+    user = await user_utils.get_user_detail(session=session, user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-
-    groups_query = (
-        select(Group)
-        .join(UserGroup)
-        .where(UserGroup.user_id == user.id, Group.is_active == True)
-    )
-    groups = await session.exec(groups_query)
-
-    invitation_query = (
-        select(Invitation)
-        .join(InvitationRegistration)
-        .where(InvitationRegistration.user_id == user.id)
-        .limit(1)
-    )
-    invitation = await session.exec(invitation_query)
-    invitation = invitation.first()
-
-    return UserDetail(
-        id=user.id,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        email=user.email,
-        status=user.status,
-        is_superuser=user.is_superuser,
-        created_at=user.created_at,
-        groups=[UserGroupRead.model_validate(group) for group in groups],
-        invitation=UserInvitationRead.model_validate(invitation)
-        if invitation
-        else None,
-        is_active=user.is_active,
-        updated_at=user.updated_at,
-        last_login=user.last_login,
-    )
+    return user
 
 
 @router.patch("/{user_id}")
@@ -337,7 +331,10 @@ async def update_user_status(
     user.status = status_update.status
 
     session.add(user)
-    await session.commit()
+    async with revoking_tokens(user.id):
+        await session.commit()
+    await invalidate_principals(user.id)
+    await invalidate_counts("users")
     await session.refresh(user)
 
     background_tasks.add_task(
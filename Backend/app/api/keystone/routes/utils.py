@@ -2,8 +2,9 @@ from fastapi import APIRouter
 from pydantic.networks import EmailStr
 
 from app.api.deps import IsSuperUser
+from app.core.metrics import metrics
 from app.emails.utils import generate_test_email, send_email
-from app.schemas.common import Message
+from app.schemas.common import Message, MetricsSnapshot
 
 router = APIRouter(
     prefix="/utils",
@@ -32,3 +33,11 @@ def test_email(email_to: EmailStr) -> Message:
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
+
+
+@router.get("/metrics/", dependencies=[IsSuperUser])
+async def read_metrics() -> MetricsSnapshot:
+    """
+    In-process metrics of the worker that served the request.
+    """
+    return MetricsSnapshot.model_validate(metrics.snapshot())
@@ -6,10 +6,18 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api.keystone.utils.user import get_user_by_email
 from app.core.config import config
-from app.core.security import verify_password
+from app.core.metrics import metrics
+from app.core.security import (
+    PasswordHasherBusyError,
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_password_async,
+)
 from app.emails.utils import EmailData, render_email_template, send_email
 from app.models.user import User, UserStatus
 from app.utils.decorators import with_async_db_session
+from app.utils.principal_cache import invalidate_principals
+from app.utils.token_filter import record_tokens
 from loguru import logger
 
 STATUS_MESSAGES = {
@@ -62,17 +70,55 @@ STATUS_MESSAGES = {
 
 
 async def authenticate(
-    *, session: AsyncSession, email: str, password: str
+    *,
+    session: AsyncSession,
+    email: str,
+    password: str,
+    background_tasks: BackgroundTasks | None = None,
 ) -> User | None:
-    """Authenticate a user asynchronously"""
+    """
+    Authenticate a user asynchronously.
+
+    When `background_tasks` is given, a hash below the BCRYPT_MIN_ROUNDS cost is
+    replaced after the response is sent.
+    """
     db_user = await get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    if not await verify_password_async(password, db_user.hashed_password):
         return None
+    if background_tasks and password_needs_rehash(db_user.hashed_password):
+        background_tasks.add_task(
+            rehash_password,
+            user_id=db_user.id,
+            password=password,
+            old_hash=db_user.hashed_password,
+        )
     return db_user
 
 
+@with_async_db_session
+async def rehash_password(
+    *, session: AsyncSession, user_id: UUID, password: str, old_hash: str
+) -> None:
+    """Re-hash a verified password at the configured bcrypt cost"""
+    try:
+        new_hash = await get_password_hash_async(password)
+    except PasswordHasherBusyError:
+        # Try again on a later login
+        return
+
+    db_user = await session.get(User, user_id)
+    # Skip if the password changed while we were hashing
+    if not db_user or db_user.hashed_password != old_hash:
+        return
+    db_user.hashed_password = new_hash
+    session.add(db_user)
+    await session.commit()
+    metrics.increment("password_hasher.rehashed")
+    logger.info(f"Rehashed password for user {user_id}")
+
+
 def render_verification_email(verification_link, username, **kwargs) -> EmailData:
     context = {
         "project_name": config.PROJECT_NAME,
@@ -101,6 +147,8 @@ async def send_verification_email(
     """Send verification email asynchronously"""
     logger.info(f"Sending verification email to {user.email}")
     token = user.email_verification_token
+    if token is not None:
+        await record_tokens("email_verification", [token])
     verification_link = f"{config.FRONTEND_HOST}/verify-email?token={token}"
 
     email_data = render_verification_email(
@@ -124,3 +172,4 @@ async def update_last_login(*, session: AsyncSession, user_id: UUID) -> None:
         db_user.last_login = datetime.now(timezone.utc)
         session.add(db_user)
         await session.commit()
+        await invalidate_principals(user_id)
@@ -0,0 +1,71 @@
+from typing import Any
+
+from sqlalchemy import Select
+from sqlmodel import select
+
+from app.api.keystone.utils import user as user_utils
+from app.models import Group, Invitation, Transaction
+from app.schemas.export import ExportFilters, ExportResource
+from app.schemas.user import UsersExportParams
+
+EXPORT_FIELDS: dict[ExportResource, list[str]] = {
+    "users": user_utils.USER_EXPORT_FIELDS,
+    "groups": [
+        "id",
+        "name",
+        "description",
+        "is_active",
+        "created_by_user_id",
+        "created_at",
+    ],
+    "invitations": [
+        "id",
+        "type",
+        "email",
+        "created_by_user_id",
+        "user_expiry_date",
+        "expires_at",
+        "created_at",
+    ],
+    "transactions": [
+        "id",
+        "user_id",
+        "model",
+        "record_id",
+        "action",
+        "description",
+        "meta_data",
+        "created_at",
+    ],
+}
+
+EXPORT_MODELS: dict[ExportResource, Any] = {
+    "groups": Group,
+    "invitations": Invitation,
+    "transactions": Transaction,
+}
+
+
+def parse_export_filters(
+    resource: ExportResource, filters: dict[str, Any]
+) -> UsersExportParams | ExportFilters:
+    """Validate the filters of an export of `resource`."""
+    if resource == "users":
+        return UsersExportParams.model_validate(filters)
+    return ExportFilters.model_validate(filters)
+
+
+def build_export_query(resource: ExportResource, filters: dict[str, Any]) -> Select:
+    """Select the export columns of the rows of `resource` matching `filters`."""
+    params = parse_export_filters(resource, filters)
+    if isinstance(params, UsersExportParams):
+        return user_utils.build_users_export_query(params)
+
+    model = EXPORT_MODELS[resource]
+    query = select(*(getattr(model, field) for field in EXPORT_FIELDS[resource]))
+    if params.created_from:
+        query = query.where(model.created_at >= params.created_from)
+    if params.created_to:
+        query = query.where(model.created_at <= params.created_to)
+    # Primary key order streams straight off the index, without a sort
+    return query.order_by(model.id)
@@ -0,0 +1,75 @@
+import uuid
+from collections.abc import Sequence
+
+from sqlalchemy import delete, exists, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.group import UserGroup
+from app.models.user import User
+from app.utils.sql import none_of, unnest
+
+
+async def find_missing_users(
+    *, session: AsyncSession, user_ids: Sequence[uuid.UUID]
+) -> list[uuid.UUID]:
+    """The ids in `user_ids` without a user, checked by primary key lookups."""
+    ids = unnest(User.id, user_ids)
+    result = await session.exec(
+        select(ids.c.value).where(~exists().where(User.id == ids.c.value))
+    )
+    return list(result.all())
+
+
+async def replace_group_members(
+    *, session: AsyncSession, group_id: int, user_ids: Sequence[uuid.UUID]
+) -> tuple[list[uuid.UUID], list[uuid.UUID]]:
+    """
+    Make `user_ids` the members of the group, without committing.
+
+    Only the difference is written: members not listed are deleted and the
+    listed users not yet members inserted, so memberships are never loaded.
+    The users must exist. Returns the ids added and the ids removed.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    removed = await session.exec(
+        delete(UserGroup)
+        .where(UserGroup.group_id == group_id, none_of(UserGroup.user_id, user_ids))
+        .returning(UserGroup.user_id)
+    )
+    removed_ids = list(removed.scalars().all())
+
+    ids = unnest(UserGroup.user_id, user_ids)
+    added = await session.exec(
+        insert(UserGroup)
+        .from_select(["user_id", "group_id"], select(ids.c.value, literal(group_id)))
+        .on_conflict_do_nothing()
+        .returning(UserGroup.user_id)
+    )
+    return list(added.scalars().all()), removed_ids
+
+
+async def add_group_member(
+    *, session: AsyncSession, group_id: int, user_id: uuid.UUID
+) -> bool:
+    """Insert one membership by primary key, False if it already existed."""
+    result = await session.exec(
+        insert(UserGroup)
+        .values(user_id=user_id, group_id=group_id)
+        .on_conflict_do_nothing()
+        .returning(UserGroup.user_id)
+    )
+    return result.first() is not None
+
+
+async def remove_group_member(
+    *, session: AsyncSession, group_id: int, user_id: uuid.UUID
+) -> bool:
+    """Delete one membership by primary key, False if there was none."""
+    result = await session.exec(
+        delete(UserGroup)
+        .where(UserGroup.group_id == group_id, UserGroup.user_id == user_id)
+        .returning(UserGroup.user_id)
+    )
+    return result.first() is not None
@@ -2,6 +2,7 @@ from typing import Any
 from uuid import UUID
 
 from fastapi import BackgroundTasks
+from sqlalchemy import text
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import config
@@ -9,6 +10,12 @@ from app.emails.utils import EmailData, render_email_template, send_email
 from app.models.invitation import Invitation
 from app.models.user import User
 from app.schemas.invitation import InvitationCreate
+from app.utils.datatable_count import invalidate_counts
+from app.utils.token_filter import record_tokens
+
+# Advisory lock held while creating email invitations, arbitrary but unique
+# to them
+_EMAIL_INVITATIONS_LOCK_KEY = 0x656D61696C73
 
 
 def render_invitation_email(
@@ -37,6 +44,29 @@ def render_invitation_email(
     )
 
 
+def inviter_display_name(inviter: User) -> str:
+    return f"{inviter.first_name} {inviter.last_name}".strip() or "ASU Auto-Caller"
+
+
+def registration_link(token: UUID) -> str:
+    return f"{config.FRONTEND_HOST}/register?token={token}"
+
+
+async def lock_email_invitations(session: AsyncSession) -> None:
+    """
+    Serialize the transactions creating email invitations, until commit.
+
+    Whether an invitation is active depends on the time, so no unique index
+    can keep one active invitation per email. Writers look for existing
+    ones after taking this lock instead, and see those committed by the
+    writer they waited for.
+    """
+    await session.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"),
+        {"key": _EMAIL_INVITATIONS_LOCK_KEY},
+    )
+
+
 async def send_invitation_email(
     *,
     session: AsyncSession,
@@ -48,16 +78,9 @@ async def send_invitation_email(
     if not inviter:
         raise ValueError("Inviter not found")
 
-    token = invitation.token
-    registration_link = f"{config.FRONTEND_HOST}/register?token={token}"
-
-    inviter_name = f"{inviter.first_name} {inviter.last_name}".strip()
-    if not inviter_name:
-        inviter_name = "ASU Auto-Caller"
-
     email = render_invitation_email(
-        inviter_name=inviter_name,
-        registration_link=registration_link,
+        inviter_name=inviter_display_name(inviter),
+        registration_link=registration_link(invitation.token),
     )
 
     background_tasks.add_task(
@@ -82,5 +105,7 @@ async def create_invitation(
     )
     session.add(invitation)
     await session.commit()
+    await record_tokens("invitation", [invitation.token])
+    await invalidate_counts("invitations")
     await session.refresh(invitation)
     return invitation
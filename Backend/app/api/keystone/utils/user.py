@@ -1,17 +1,61 @@
 import uuid
+from collections.abc import AsyncIterator
 from typing import Any
 
-from sqlmodel import select
+from loguru import logger
+from sqlalchemy import (
+    JSON,
+    Row,
+    Select,
+    bindparam,
+    delete,
+    insert,
+    literal,
+    or_,
+    text,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+from sqlmodel import func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import SelectOfScalar
 
-from app.core.security import get_password_hash
-from app.models.user import User
-from app.schemas.user import UserCreate, UserUpdate
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.security import get_password_hash_async
+from app.models import Group, Invitation, InvitationRegistration, User, UserGroup
+from app.models.transaction import Action, Model, Transaction
+from app.schemas.user import (
+    UserBulkUpdate,
+    UserBulkUpdateResult,
+    UserCreate,
+    UserDetail,
+    UserInvitationRead,
+    UserMinimal,
+    UsersExportParams,
+    UsersFilterParams,
+    UserUpdate,
+)
+from app.utils import group_membership
+from app.utils.datatable_count import invalidate_counts
+from app.utils.principal_cache import get_principal, invalidate_principals
+from app.utils.search import apply_user_search
+from app.utils.sql import any_of, none_of
+from app.utils.token_epoch import TokenRevocationError, revoking_tokens
+from app.utils.user_detail_cache import (
+    cache_user_detail,
+    get_cached_user_detail,
+    invalidate_user_details,
+)
 
 
 async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
+    hashed_password = await get_password_hash_async(user_create.password)
     db_obj = User.model_validate(
-        user_create, update={"hashed_password": get_password_hash(user_create.password)}
+        user_create, update={"hashed_password": hashed_password}
     )
     session.add(db_obj)
 
@@ -21,6 +65,7 @@ async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User
         await session.rollback()
         raise e
 
+    await invalidate_counts("users")
     await session.refresh(db_obj)
 
     return db_obj
@@ -33,15 +78,432 @@ async def update_user(
     extra_data = {}
     if "password" in user_data:
         password = user_data["password"]
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash_async(password)
         extra_data["hashed_password"] = hashed_password
     db_user.sqlmodel_update(user_data, update=extra_data)
     session.add(db_user)
-    await session.commit()
+    if {"password", "is_superuser", "status"} & user_data.keys():
+        async with revoking_tokens(db_user.id):
+            await session.commit()
+    else:
+        await session.commit()
+    await invalidate_principals(db_user.id)
+    await invalidate_counts("users")
     await session.refresh(db_user)
     return db_user
 
 
+async def _bulk_selection_chunks(
+    session: AsyncSession, bulk_in: UserBulkUpdate
+) -> AsyncIterator[list[uuid.UUID]]:
+    """Yield the ids of the selected users, USER_BULK_UPDATE_CHUNK_SIZE at a time."""
+    query = select(User)
+    if bulk_in.user_ids is not None:
+        query = query.where(any_of(User.id, bulk_in.user_ids))
+    else:
+        if bulk_in.search:
+            query, _ = apply_user_search(query, bulk_in.search, bulk_in.search_mode)
+        query = filter_users(query, bulk_in.filters)
+    query = (
+        query.with_only_columns(User.id)
+        .order_by(User.id)
+        .limit(config.USER_BULK_UPDATE_CHUNK_SIZE)
+    )
+
+    # Keyset over the id, earlier chunks may no longer match the filters
+    last_id = None
+    while True:
+        page = query if last_id is None else query.where(User.id > last_id)
+        user_ids = list((await session.scalars(page)).all())
+        if not user_ids:
+            return
+        yield user_ids
+        last_id = user_ids[-1]
+
+
+async def _bulk_update_chunk(
+    session: AsyncSession,
+    bulk_in: UserBulkUpdate,
+    user_ids: list[uuid.UUID],
+    current_user_id: uuid.UUID,
+) -> tuple[list[Row], list[uuid.UUID], list[uuid.UUID]]:
+    """
+    Apply `bulk_in` to `user_ids` and write the audit rows, without committing.
+
+    Returns the `(id, old status, old is_superuser)` of the users updated and
+    the ids added to and removed from groups.
+    """
+    values: dict[str, Any] = {}
+    changed = []
+    if bulk_in.status is not None:
+        values["status"] = bulk_in.status
+        changed.append(User.status != bulk_in.status)
+    if bulk_in.is_superuser is not None:
+        values["is_superuser"] = bulk_in.is_superuser
+        changed.append(User.is_superuser != bulk_in.is_superuser)
+
+    updated: list[Row] = []
+    audit: list[dict[str, Any]] = []
+    if values:
+        # Locks the rows and keeps their old values for RETURNING
+        old = (
+            select(User.id, User.status, User.is_superuser)
+            .where(any_of(User.id, user_ids), User.id != current_user_id, or_(*changed))
+            .with_for_update()
+            .subquery("old")
+        )
+        result = await session.execute(
+            update(User)
+            .where(User.id == old.c.id)
+            # Its onupdate would stamp every selected user as just logged in
+            .values(**values, last_login=User.last_login)
+            .returning(User.id, old.c.status, old.c.is_superuser)
+        )
+        updated = list(result.all())
+        for user_id, old_status, old_is_superuser in updated:
+            old_data: dict[str, Any] = {}
+            new_data: dict[str, Any] = {}
+            if bulk_in.status is not None:
+                old_data["status"] = old_status.name
+                new_data["status"] = bulk_in.status.name
+            if bulk_in.is_superuser is not None:
+                old_data["is_superuser"] = old_is_superuser
+                new_data["is_superuser"] = bulk_in.is_superuser
+            audit.append(
+                {
+                    "user_id": current_user_id,
+                    "model": Model.USER,
+                    "record_id": str(user_id),
+                    "action": Action.UPDATE,
+                    "description": "User updated in bulk",
+                    "meta_data": {"old_data": old_data, "new_data": new_data},
+                }
+            )
+
+    added: list[uuid.UUID] = []
+    if bulk_in.add_to_group is not None:
+        result = await session.execute(
+            pg_insert(UserGroup)
+            .from_select(
+                ["user_id", "group_id"],
+                select(User.id, literal(bulk_in.add_to_group)).where(
+                    any_of(User.id, user_ids)
+                ),
+            )
+            .on_conflict_do_nothing()
+            .returning(UserGroup.user_id)
+        )
+        added = list(result.scalars().all())
+        if added:
+            audit.append(
+                {
+                    "user_id": current_user_id,
+                    "model": Model.GROUP,
+                    "record_id": str(bulk_in.add_to_group),
+                    "action": Action.UPDATE,
+                    "description": "Users added to group in bulk",
+                    "meta_data": {"new_data": {"added_users": list(map(str, added))}},
+                }
+            )
+
+    removed: list[uuid.UUID] = []
+    if bulk_in.remove_from_group is not None:
+        result = await session.execute(
+            delete(UserGroup)
+            .where(
+                UserGroup.group_id == bulk_in.remove_from_group,
+                any_of(UserGroup.user_id, user_ids),
+            )
+            .returning(UserGroup.user_id)
+        )
+        removed = list(result.scalars().all())
+        if removed:
+            audit.append(
+                {
+                    "user_id": current_user_id,
+                    "model": Model.GROUP,
+                    "record_id": str(bulk_in.remove_from_group),
+                    "action": Action.UPDATE,
+                    "description": "Users removed from group in bulk",
+                    "meta_data": {
+                        "old_data": {"removed_users": list(map(str, removed))}
+                    },
+                }
+            )
+
+    if audit:
+        await session.execute(insert(Transaction), audit)
+    return updated, added, removed
+
+
+async def bulk_update_users(
+    *, session: AsyncSession, bulk_in: UserBulkUpdate, current_user_id: uuid.UUID
+) -> UserBulkUpdateResult:
+    """
+    Apply a status, role or group change to every user selected by `bulk_in`.
+
+    Users are processed USER_BULK_UPDATE_CHUNK_SIZE at a time. Each chunk
+    runs one `UPDATE ... WHERE id = ANY(...) RETURNING`, plus an INSERT or
+    DELETE for group changes and one multi-row INSERT of audit transactions.
+    It commits on its own, so row locks are only held for one chunk. Users
+    already in the requested state are not written or audited, and the
+    current user is left out of status and role changes.
+
+    When the tokens of a chunk's users can't be revoked, that chunk is
+    rolled back and the update stops there; the result counts the chunks
+    committed before it and is marked incomplete.
+    """
+    outcome = UserBulkUpdateResult()
+    async for user_ids in _bulk_selection_chunks(session, bulk_in):
+        updated, added, removed = await _bulk_update_chunk(
+            session, bulk_in, user_ids, current_user_id
+        )
+        updated_ids = [row[0] for row in updated]
+        try:
+            async with revoking_tokens(*updated_ids):
+                await session.commit()
+        except TokenRevocationError:
+            await session.rollback()
+            outcome.complete = False
+            logger.error(
+                f"Bulk user update stopped after {outcome.matched} users, "
+                f"tokens couldn't be revoked"
+            )
+            break
+        await invalidate_principals(*updated_ids)
+        await invalidate_user_details(*added, *removed)
+        if added:
+            await group_membership.record_membership_changes(
+                bulk_in.add_to_group, added=added
+            )
+        if removed:
+            await group_membership.record_membership_changes(
+                bulk_in.remove_from_group, removed=removed
+            )
+
+        outcome.matched += len(user_ids)
+        outcome.updated += len(updated)
+        outcome.added_to_group += len(added)
+        outcome.removed_from_group += len(removed)
+
+    if outcome.updated or outcome.added_to_group or outcome.removed_from_group:
+        await invalidate_counts("users", "groups")
+    metrics.increment("users.bulk_updated", outcome.updated)
+    return outcome
+
+
+USER_EXPORT_FIELDS = ["id", "first_name", "last_name", "email", "created_at"]
+
+
+def filter_users(
+    query: SelectOfScalar[User], filters: UsersFilterParams
+) -> SelectOfScalar[User]:
+    """Apply the users datatable filters to `query`."""
+    if filters.status and filters.status != "all":
+        query = query.where(User.status == filters.status)
+    if filters.role and filters.role != "all":
+        query = query.where(User.is_superuser == (filters.role == "superuser"))
+    if filters.group and filters.group != "all":
+        query = query.where(User.groups.any(UserGroup.group_id == int(filters.group)))
+    if filters.exclude_group and filters.exclude_group != "all":
+        query = query.where(
+            ~User.groups.any(UserGroup.group_id == int(filters.exclude_group))
+        )
+    if filters.created_at:
+        if filters.created_at[0]:
+            query = query.where(User.created_at >= filters.created_at[0])
+        if filters.created_at[1]:
+            query = query.where(User.created_at <= filters.created_at[1])
+    return query
+
+
+async def filter_users_by_index(
+    session: AsyncSession, query: SelectOfScalar[User], filters: UsersFilterParams
+) -> SelectOfScalar[User]:
+    """
+    Apply the users datatable filters, answering the group filters from the
+    membership index when it is available.
+
+    The member ids become an `id = ANY(...)` pre-filter, or `<> ALL(...)` for
+    an excluded group, instead of EXISTS subqueries against `user_groups`
+    evaluated per candidate row. Groups with more than
+    GROUP_MEMBERSHIP_PREFILTER_MAX_IDS members keep the subquery.
+    """
+    group = int(filters.group) if filters.group and filters.group != "all" else None
+    exclude = (
+        int(filters.exclude_group)
+        if filters.exclude_group and filters.exclude_group != "all"
+        else None
+    )
+    indexed: dict[str, Any] = {}
+    if group is not None:
+        members = await group_membership.members_excluding(
+            session, group, [] if exclude is None else [exclude]
+        )
+        if (
+            members is not None
+            and len(members) <= config.GROUP_MEMBERSHIP_PREFILTER_MAX_IDS
+        ):
+            query = query.where(any_of(User.id, members))
+            indexed = {"group": "", "exclude_group": None}
+    elif exclude is not None:
+        members = await group_membership.group_members(session, exclude)
+        if (
+            members is not None
+            and len(members) <= config.GROUP_MEMBERSHIP_PREFILTER_MAX_IDS
+        ):
+            query = query.where(none_of(User.id, members))
+            indexed = {"exclude_group": None}
+    return filter_users(query, filters.model_copy(update=indexed))
+
+
+def build_users_export_query(params: UsersExportParams) -> Select:
+    """Select the export columns of the users matching `params`, in order."""
+    query = select(User)
+    if params.search:
+        query, _ = apply_user_search(query, params.search, params.search_mode)
+    query = filter_users(query, params.filters)
+
+    # The id keeps rows with equal sort values in a stable order
+    order_column = getattr(User, params.order_by)
+    if params.order == "desc":
+        query = query.order_by(order_column.desc(), User.id.desc())
+    else:
+        query = query.order_by(order_column.asc(), User.id.asc())
+    columns = [getattr(User, field) for field in USER_EXPORT_FIELDS]
+    return query.with_only_columns(*columns)
+
+
+def build_user_detail_query() -> Select:
+    """
+    Select a user, their active groups and their invitation in one statement.
+
+    Groups are aggregated into a JSON array by a correlated subquery; the
+    invitation and its creator come from a LATERAL join limited to one row,
+    so a user without an invitation still matches. The user id is the
+    `user_id` parameter.
+    """
+    groups = (
+        select(
+            func.coalesce(
+                func.json_agg(
+                    aggregate_order_by(
+                        func.json_build_object(
+                            "id",
+                            Group.id,
+                            "name",
+                            Group.name,
+                            "description",
+                            Group.description,
+                            "created_at",
+                            Group.created_at,
+                        ),
+                        Group.id,
+                    )
+                ),
+                text("'[]'::json"),
+                type_=JSON,
+            )
+        )
+        .select_from(UserGroup)
+        .join(Group, Group.id == UserGroup.group_id)
+        .where(UserGroup.user_id == User.id, Group.is_active)
+        .scalar_subquery()
+    )
+
+    creator = aliased(User)
+    invitation = (
+        select(
+            Invitation.id.label("invitation_id"),
+            Invitation.token.label("invitation_token"),
+            Invitation.type.label("invitation_type"),
+            Invitation.created_at.label("invitation_created_at"),
+            creator.first_name.label("creator_first_name"),
+            creator.last_name.label("creator_last_name"),
+            creator.email.label("creator_email"),
+            creator.status.label("creator_status"),
+        )
+        .join(
+            InvitationRegistration,
+            InvitationRegistration.invitation_id == Invitation.id,
+        )
+        .join(creator, creator.id == Invitation.created_by_user_id)
+        .where(InvitationRegistration.user_id == User.id)
+        .limit(1)
+        .lateral("invitation")
+    )
+
+    return (
+        select(User, groups.label("groups"), invitation)
+        .outerjoin(invitation, true())
+        .where(User.id == bindparam("user_id"))
+    )
+
+
+# Building the statement costs more than running it, so it is built once
+USER_DETAIL_QUERY = build_user_detail_query()
+
+
+def _user_detail_from_row(row: Row) -> UserDetail:
+    user = row.User
+    invitation = None
+    if row.invitation_id is not None:
+        invitation = UserInvitationRead(
+            id=row.invitation_id,
+            token=row.invitation_token,
+            type=row.invitation_type,
+            created_at=row.invitation_created_at,
+            created_by_user=UserMinimal(
+                first_name=row.creator_first_name,
+                last_name=row.creator_last_name,
+                email=row.creator_email,
+                status=row.creator_status,
+            ),
+        )
+    return UserDetail(
+        id=user.id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email=user.email,
+        status=user.status,
+        is_superuser=user.is_superuser,
+        created_at=user.created_at,
+        groups=row.groups,
+        invitation=invitation,
+        is_active=user.is_active,
+        updated_at=user.updated_at,
+        last_login=user.last_login,
+    )
+
+
+async def get_user_detail(
+    *, session: AsyncSession, user_id: uuid.UUID
+) -> UserDetail | None:
+    """
+    Load the UserDetail of `user_id`, or None if the user does not exist.
+
+    Details are cached for USER_DETAIL_CACHE_TTL_IN_SECONDS. A cached detail
+    is only served while its `updated_at` matches the cached principal, so a
+    user write that skipped invalidation still can't return stale data.
+    """
+    detail = await get_cached_user_detail(user_id)
+    if detail is not None:
+        principal = await get_principal(user_id)
+        if principal is None or principal.updated_at == detail.updated_at:
+            metrics.increment("user_detail_cache.hit")
+            return detail
+    metrics.increment("user_detail_cache.miss")
+
+    result = await session.exec(USER_DETAIL_QUERY, params={"user_id": user_id})
+    row = result.first()
+    if row is None:
+        return None
+
+    detail = _user_detail_from_row(row)
+    await cache_user_detail(detail)
+    return detail
+
+
 async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
     """Get user by email asynchronously"""
     result = await session.exec(select(User).where(User.email == email.lower()))
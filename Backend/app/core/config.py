@@ -64,6 +64,26 @@ class Config(BaseSettings):
     PASSWORD_RESET_TOKEN_EXPIRY_IN_HOURS: int = 24
     INVITATION_EXPIRY_IN_HOURS: int = 24
 
+    # ==== Password Hashing ====
+    # Cost of new hashes, tune per host with `kcli server calibrate-bcrypt`
+    BCRYPT_ROUNDS: int = 12
+    # Shared by every host: only hashes below it are rehashed on login, so
+    # hosts calibrated to different costs don't rehash each other's hashes
+    BCRYPT_MIN_ROUNDS: int = 10
+    PASSWORD_HASHER_MAX_WORKERS: int = 2
+    PASSWORD_HASHER_MAX_QUEUE_SIZE: int = 64
+
+    # ==== Auth Throttling ====
+    # Token buckets in front of the login and password endpoints
+    AUTH_THROTTLE_ENABLED: bool = True
+    AUTH_THROTTLE_IP_PER_MINUTE: int = 10
+    AUTH_THROTTLE_IP_BURST: int = 10
+    AUTH_THROTTLE_EMAIL_PER_MINUTE: int = 5
+    AUTH_THROTTLE_EMAIL_BURST: int = 5
+    AUTH_THROTTLE_GLOBAL_PER_SECOND: float = 20
+    AUTH_THROTTLE_GLOBAL_BURST: int = 40
+    AUTH_THROTTLE_LOCAL_MAX_SIZE: int = 100_000
+
     # ==== Server Settings ====
     API_ROOT_URL: str = "/api"
     WORKER_GRACEFUL_SHUTDOWN_TIMEOUT_IN_SECONDS: int = 30
@@ -86,6 +106,120 @@ class Config(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str = ""
     REDIS_DB: int = 0
+    REDIS_SOCKET_TIMEOUT_IN_SECONDS: float = 0.5
+
+    # ==== Principal Cache ====
+    # Authenticated user lookups; the Redis tier is only used when CACHE_ENABLED
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_TTL_IN_SECONDS: int = 300
+    PRINCIPAL_CACHE_LOCAL_TTL_IN_SECONDS: int = 10
+    PRINCIPAL_CACHE_LOCAL_MAX_SIZE: int = 10_000
+    # Token epochs need Redis; without it every request authorizes from the DB
+    TOKEN_EPOCH_LOCAL_TTL_IN_SECONDS: int = 5
+    # GET /users/{id} responses, only cached in Redis when CACHE_ENABLED. Group
+    # renames and membership changes invalidate them, anything else expires
+    USER_DETAIL_CACHE_TTL_IN_SECONDS: int = 30
+
+    # ==== Search ====
+    # Full-text matches are ordered by relevance only up to this many rows;
+    # ranking recomputes every matching document
+    USER_SEARCH_RANK_MAX_ROWS: int = 10_000
+
+    # ==== Datatables ====
+    # Lifetime of `count_mode="cached"` totals; writes invalidate them earlier
+    DATATABLE_COUNT_CACHE_TTL_IN_SECONDS: int = 30
+    # Rows fetched per server-side cursor round trip by the users CSV export
+    USER_EXPORT_BATCH_SIZE: int = 2000
+
+    # ==== Group Membership Index ====
+    # Redis sets mirroring user_groups, only used when CACHE_ENABLED. Group
+    # write paths keep them in sync, the TTL bounds drift from other writers
+    GROUP_MEMBERSHIP_INDEX_TTL_IN_SECONDS: int = 3600
+    # Datatable group filters become an `id = ANY(...)` pre-filter up to this
+    # many ids; larger groups keep the EXISTS subquery
+    GROUP_MEMBERSHIP_PREFILTER_MAX_IDS: int = 10_000
+
+    # ==== Bulk Updates ====
+    # Users changed per transaction by POST /users/bulk; every chunk holds its
+    # row locks until it commits
+    USER_BULK_UPDATE_CHUNK_SIZE: int = 1000
+
+    # ==== Dashboard ====
+    # Counters are kept exact by triggers; reconciling only fixes writes that
+    # bypassed them
+    DASHBOARD_RECONCILE_INTERVAL_IN_MINUTES: int = 60
+
+    # ==== Notifications ====
+    # Unread counts are kept exact by triggers; reconciling only fixes writes
+    # that bypassed them. Cached counts are dropped by notification writes
+    NOTIFICATION_COUNTER_RECONCILE_INTERVAL_IN_MINUTES: int = 60
+    NOTIFICATION_UNREAD_CACHE_TTL_IN_SECONDS: int = 300
+    # GET /notifications/stream, only served when CACHE_ENABLED. Streams each
+    # hold a connection, the cap is per worker
+    NOTIFICATION_STREAM_MAX_CONNECTIONS: int = 1000
+    NOTIFICATION_STREAM_HEARTBEAT_IN_SECONDS: int = 15
+    NOTIFICATION_STREAM_RETRY_IN_MILLISECONDS: int = 3000
+    # Missed unread notifications replayed to a stream resuming with Last-Event-ID
+    NOTIFICATION_STREAM_RESUME_MAX_EVENTS: int = 100
+    # Bodies are shared by their recipients' notifications and deleted once
+    # none is left, this many per transaction
+    NOTIFICATION_MESSAGE_PURGE_BATCH_SIZE: int = 1000
+
+    # ==== Notification Fan-out ====
+    # Recipients per transaction, each chunk is one INSERT ... SELECT
+    NOTIFICATION_FANOUT_CHUNK_SIZE: int = 10_000
+    NOTIFICATION_FANOUT_MAX_CONCURRENT_JOBS: int = 1
+    NOTIFICATION_FANOUT_DISPATCH_INTERVAL_IN_SECONDS: int = 10
+    NOTIFICATION_FANOUT_STALE_AFTER_IN_MINUTES: int = 10
+
+    # ==== Notification Partitions ====
+    # `notification` is partitioned by month; partitions are created this many
+    # months ahead of the current one
+    NOTIFICATION_PARTITION_MONTHS_AHEAD: int = 3
+    # Months that ended this long ago are dropped whole; their unread
+    # notifications are kept in the default partition until read
+    NOTIFICATION_RETENTION_IN_DAYS: int = 180
+
+    # ==== Export Jobs ====
+    # Exports running at once across all workers; each holds two connections
+    EXPORT_MAX_CONCURRENT_JOBS: int = 2
+    EXPORT_BATCH_SIZE: int = 5000
+    EXPORT_DISPATCH_INTERVAL_IN_SECONDS: int = 10
+    # Running exports that stop reporting progress are failed after this long
+    EXPORT_STALE_AFTER_IN_MINUTES: int = 10
+    EXPORT_RETENTION_IN_HOURS: int = 24
+
+    # ==== Token Purge ====
+    # Expired password resets are deleted right away. Invitations nobody
+    # registered with are kept this long after expiring, then deleted
+    INVITATION_RETENTION_IN_DAYS: int = 90
+    # Rows deleted per transaction, keeps row locks and WAL bursts short
+    TOKEN_PURGE_BATCH_SIZE: int = 1000
+
+    # ==== Token Filter ====
+    # Per-worker Bloom filters of the invitation, password reset and email
+    # verification tokens, only used when CACHE_ENABLED. Unknown tokens are
+    # rejected without a query; tokens created since a rebuild are checked in
+    # Redis, so a filter is trusted for three rebuild intervals at most
+    TOKEN_FILTER_REBUILD_INTERVAL_IN_MINUTES: int = 10
+    TOKEN_FILTER_FALSE_POSITIVE_RATE: float = 0.01
+    # Tokens that passed the filter but matched no row are rejected this long
+    TOKEN_NEGATIVE_CACHE_TTL_IN_SECONDS: int = 60
+
+    # ==== Job Files ====
+    # Uploads and exports are stored in the database, split in rows this size
+    JOB_FILE_CHUNK_SIZE_IN_BYTES: int = 1024 * 1024
+
+    # ==== Invitation Uploads ====
+    # Uploaded CSV/NDJSON files are stored as job files until processed
+    INVITATION_UPLOAD_MAX_SIZE_IN_BYTES: int = 20 * 1024 * 1024
+    # Emails per transaction, each chunk is one deduplicating INSERT
+    INVITATION_UPLOAD_CHUNK_SIZE: int = 1000
+    # Invitation emails sent per worker thread hand-off
+    INVITATION_UPLOAD_EMAIL_BATCH_SIZE: int = 100
+    INVITATION_UPLOAD_MAX_CONCURRENT_JOBS: int = 1
+    INVITATION_UPLOAD_DISPATCH_INTERVAL_IN_SECONDS: int = 10
+    INVITATION_UPLOAD_STALE_AFTER_IN_MINUTES: int = 10
 
     # ==== Email ====
     SMTP_TLS: bool = True
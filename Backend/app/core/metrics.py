@@ -0,0 +1,77 @@
+import threading
+from collections import deque
+from typing import Any
+
+# Number of most recent observations kept per timing series
+TIMING_WINDOW_SIZE = 1024
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(percentile / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry.
+
+    Counters are monotonically increasing integers, timings keep a rolling
+    window of the most recent observations (in seconds) so percentiles can be
+    reported without an external metrics backend. Values are per worker process.
+    """
+
+    def __init__(self, window_size: int = TIMING_WINDOW_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._window_size = window_size
+        self._counters: dict[str, int] = {}
+        self._timings: dict[str, deque[float]] = {}
+        self._timing_totals: dict[str, int] = {}
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            series = self._timings.get(name)
+            if series is None:
+                series = self._timings[name] = deque(maxlen=self._window_size)
+            series.append(seconds)
+            self._timing_totals[name] = self._timing_totals.get(name, 0) + 1
+
+    def get_counter(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+            self._timing_totals.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return counters and p50/p95/p99 timings (in milliseconds)."""
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {
+                name: (sorted(series), self._timing_totals.get(name, 0))
+                for name, series in self._timings.items()
+            }
+
+        return {
+            "counters": counters,
+            "timings": {
+                name: {
+                    "count": total,
+                    "p50_ms": round(_percentile(values, 50) * 1000, 3),
+                    "p95_ms": round(_percentile(values, 95) * 1000, 3),
+                    "p99_ms": round(_percentile(values, 99) * 1000, 3),
+                    "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+                }
+                for name, (values, total) in timings.items()
+            },
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,33 @@
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import config
+
+# Errors that mean "Redis is unavailable"; callers fall back to the database
+REDIS_ERRORS = (RedisError, OSError)
+
+_redis: aioredis.Redis | None = None
+
+
+def get_redis() -> aioredis.Redis:
+    """Return the shared async Redis client, creating it on first use."""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(
+            config.REDIS_URL,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT_IN_SECONDS,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT_IN_SECONDS,
+        )
+    return _redis
+
+
+async def close_redis() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+        _redis = None
+
+
+def redis_key(*parts: object) -> str:
+    """Build a namespaced Redis key, e.g. `Keystone:principal:<user_id>`."""
+    return ":".join([config.PROJECT_NAME, *(str(part) for part in parts)])
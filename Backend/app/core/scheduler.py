@@ -1,5 +1,7 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 scheduler = AsyncIOScheduler()
 daily_midnight_trigger = CronTrigger(hour=0, minute=0)  # Run every day at midnight
+hourly_trigger = IntervalTrigger(hours=1)
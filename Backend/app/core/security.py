@@ -1,20 +1,52 @@
+import asyncio
+import multiprocessing
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, TypeVar
 
 import jwt
+from loguru import logger
 from passlib.context import CryptContext
 
 from app.core.config import config
+from app.core.metrics import metrics
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=max(config.BCRYPT_ROUNDS, config.BCRYPT_MIN_ROUNDS),
+    # Only hashes below it are reported by needs_update and rehashed on login
+    bcrypt__min_rounds=config.BCRYPT_MIN_ROUNDS,
+)
 
 
 ALGORITHM = "HS256"
 
+T = TypeVar("T")
 
-def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
+
+def create_access_token(
+    subject: str | Any,
+    expires_delta: timedelta,
+    *,
+    is_superuser: bool | None = None,
+    status: str | None = None,
+    epoch: int | None = None,
+) -> str:
+    """
+    Create a signed access token.
+
+    When `is_superuser`, `status` and `epoch` are all given they are embedded
+    as the `su`, `st` and `ep` claims so requests can be authorized without
+    loading the user row.
+    """
     expire = datetime.now(timezone.utc) + expires_delta
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode: dict[str, Any] = {"exp": expire, "sub": str(subject)}
+    if is_superuser is not None and status is not None and epoch is not None:
+        to_encode.update({"su": is_superuser, "st": status, "ep": epoch})
     encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -25,3 +57,92 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether the hash uses another scheme or a bcrypt cost below BCRYPT_MIN_ROUNDS."""
+    return pwd_context.needs_update(hashed_password)
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a bounded process pool.
+
+    bcrypt is deliberately slow, so calling it inline from an async handler
+    blocks the event loop of the whole worker. The pool is created lazily on
+    first use and calls beyond `max_queue_size` pending operations are rejected
+    with `PasswordHasherBusyError` instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queue_size: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def start(self) -> None:
+        """Create the process pool ahead of the first request."""
+        self._get_executor()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, name: str, func: Callable[..., T], *args: Any) -> T:
+        if self._pending >= self.max_queue_size:
+            metrics.increment(f"password_hasher.{name}.rejected")
+            raise PasswordHasherBusyError("Password hashing queue is full")
+
+        self._pending += 1
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            try:
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+            except BrokenProcessPool:
+                logger.warning("Password hasher pool broken, recreating it")
+                self.shutdown()
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+            metrics.observe(f"password_hasher.{name}", time.perf_counter() - start)
+            metrics.increment(f"password_hasher.{name}.calls")
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(
+            "verify", verify_password, plain_password, hashed_password
+        )
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", get_password_hash, password)
+
+
+password_hasher = PasswordHasher(
+    max_workers=config.PASSWORD_HASHER_MAX_WORKERS,
+    max_queue_size=config.PASSWORD_HASHER_MAX_QUEUE_SIZE,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.hash(password)
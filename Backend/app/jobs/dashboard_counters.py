@@ -0,0 +1,57 @@
+from loguru import logger
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.metrics import metrics
+from app.models import DashboardCounter
+from app.utils.dashboard_counters import counted_rows_query
+from app.utils.decorators import with_async_db_session
+
+# Advisory lock held while reconciling, arbitrary but unique to it
+_RECONCILE_LOCK_KEY = 0x636F756E74657273
+
+
+@with_async_db_session
+async def reconcile_dashboard_counters(session: AsyncSession) -> list[str]:
+    """
+    Correct dashboard counters that drifted from the rows they count.
+
+    Triggers keep the counters exact, but writes made with triggers disabled,
+    e.g. by a backup restore, go uncounted. Rows and counters are compared
+    within one statement, so from one snapshot, and the difference is added
+    to the counters; writes committed meanwhile, which their triggers
+    counted, are not undone. Returns the names of the counters corrected.
+    """
+    # Workers reconciling at once would apply the same correction twice
+    await session.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"), {"key": _RECONCILE_LOCK_KEY}
+    )
+
+    counted = counted_rows_query().subquery("counted")
+    name, counted_value = counted.c
+    counters = DashboardCounter.__table__
+    delta = func.coalesce(counted_value, 0) - func.coalesce(counters.c.value, 0)
+    drift = select(func.coalesce(name, counters.c.name), delta, func.now()).select_from(
+        counted.join(counters, name == counters.c.name, full=True)
+    )
+    statement = insert(DashboardCounter).from_select(
+        ["name", "value", "updated_at"], drift.where(delta != 0)
+    )
+    result = await session.exec(
+        statement.on_conflict_do_update(
+            index_elements=[DashboardCounter.name],
+            set_={
+                "value": DashboardCounter.value + statement.excluded.value,
+                "updated_at": statement.excluded.updated_at,
+            },
+        ).returning(DashboardCounter.name)
+    )
+    corrected = list(result.scalars().all())
+    # Releases the advisory lock
+    await session.commit()
+
+    if corrected:
+        metrics.increment("dashboard_counters.corrected", len(corrected))
+        logger.warning(f"Corrected drifted dashboard counters: {corrected}")
+    return corrected
@@ -6,7 +6,10 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.models.invitation import Invitation, InvitationRegistration
 from app.models.user import User, UserStatus
+from app.utils.datatable_count import invalidate_counts
 from app.utils.decorators import with_async_db_session
+from app.utils.principal_cache import invalidate_principals
+from app.utils.token_epoch import revoking_tokens
 
 
 @with_async_db_session
@@ -52,7 +55,11 @@ async def expire_users(session: AsyncSession) -> None:
             logger.info(f"Expired user {user.id}")
 
         # Commit the transaction
-        await session.commit()
+        expired_user_ids = [user.id for user in users_to_be_expired]
+        async with revoking_tokens(*expired_user_ids):
+            await session.commit()
+        await invalidate_principals(*expired_user_ids)
+        await invalidate_counts("users")
 
         logger.info(f"Expired {len(users_to_be_expired)} users")
 
@@ -0,0 +1,231 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import time
+import uuid
+from collections.abc import Callable, Sequence
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import Row
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.keystone.utils.export import EXPORT_FIELDS, build_export_query
+from app.core.config import config
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import metrics
+from app.jobs.queue import (
+    claim_pending_jobs,
+    start_job_task,
+    update_running_job,
+    wake_dispatcher,
+)
+from app.models.job import Job, JobStatus, JobType
+from app.utils.csv_export import format_value, stream_rows
+from app.utils.datatable_count import estimated_count
+from app.utils.decorators import with_async_db_session
+from app.utils.job_files import JobFileWriter, delete_job_files
+
+DISPATCH_JOB_ID = "dispatch_exports"
+
+# Advisory lock held while claiming exports, arbitrary but unique to them
+_DISPATCH_LOCK_KEY = 0x6578706F7274
+# Progress writes double as the heartbeat the stale check relies on
+_PROGRESS_INTERVAL_IN_SECONDS = 1.0
+
+
+class ExportCancelled(Exception):
+    """The job stopped running while its export was being written."""
+
+
+class _ExportWriter:
+    """
+    Encodes batches of rows as CSV or NDJSON and gzips them, returning the
+    compressed bytes produced so far.
+    """
+
+    def __init__(self, fields: Sequence[str], format: str) -> None:
+        self.fields = fields
+        self.format = format
+        self.output = io.BytesIO()
+        self.stream = io.TextIOWrapper(
+            gzip.GzipFile(fileobj=self.output, mode="wb", compresslevel=6),
+            encoding="utf-8",
+            newline="",
+        )
+        self.csv = csv.writer(self.stream)
+        if format == "csv":
+            self.csv.writerow(fields)
+
+    def write(self, rows: Sequence[Row]) -> bytes:
+        if self.format == "csv":
+            self.csv.writerows([format_value(value) for value in row] for row in rows)
+        else:
+            self.stream.writelines(
+                json.dumps(
+                    dict(zip(self.fields, row, strict=True)), default=format_value
+                )
+                + "\n"
+                for row in rows
+            )
+        return self._drain()
+
+    def close(self) -> bytes:
+        """The rest of the file, gzip trailer included."""
+        self.stream.close()
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        # Not flushed, zlib compresses across batches
+        data = self.output.getvalue()
+        self.output.seek(0)
+        self.output.truncate()
+        return data
+
+
+async def run_export(
+    job_id: uuid.UUID,
+    session_factory: Callable[[], AsyncSession] | None = None,
+) -> None:
+    """
+    Write the rows of a claimed export job to a gzip file stored as job file
+    rows, so any worker can serve its download.
+
+    Rows stream through a server-side cursor and every batch is encoded and
+    compressed in a thread, so the event loop keeps serving requests. The
+    file's rows are committed along with the progress; failed or
+    interrupted exports delete them.
+    """
+    session_factory = session_factory or AsyncSessionLocal
+    async with session_factory() as session:
+        job = await session.get(Job, job_id)
+        if job is None or job.status != JobStatus.RUNNING:
+            return
+
+        resource, format = job.params["resource"], job.params["format"]
+        file_name = f"{job.id}.{format}.gz"
+        file = JobFileWriter(session, job_id)
+        start = time.perf_counter()
+        progress = 0
+
+        try:
+            query = build_export_query(resource, job.params["filters"])
+            # Only drives the progress bar, an exact count would read every row
+            await update_running_job(
+                session, job_id, total=await estimated_count(session, query)
+            )
+
+            writer = await asyncio.to_thread(
+                _ExportWriter, EXPORT_FIELDS[resource], format
+            )
+            reported_at = time.monotonic()
+            async for rows in stream_rows(
+                query,
+                batch_size=config.EXPORT_BATCH_SIZE,
+                session_factory=session_factory,
+            ):
+                await file.write(await asyncio.to_thread(writer.write, rows))
+                progress += len(rows)
+                if time.monotonic() - reported_at >= _PROGRESS_INTERVAL_IN_SECONDS:
+                    if not await update_running_job(session, job_id, progress=progress):
+                        raise ExportCancelled
+                    reported_at = time.monotonic()
+            await file.write(await asyncio.to_thread(writer.close))
+            await file.close()
+        except ExportCancelled:
+            await session.rollback()
+            await delete_job_files(session, job_id)
+            await session.commit()
+            logger.warning(f"Export {job_id} stopped running, discarded its file")
+            return
+        except (Exception, asyncio.CancelledError) as e:
+            interrupted = isinstance(e, asyncio.CancelledError)
+            await session.rollback()
+            await delete_job_files(session, job_id)
+            metrics.increment("exports.failed")
+            logger.error(f"Export {job_id} failed: {e!r}")
+            # Details stay in the logs, they may name tables or queries
+            await update_running_job(
+                session,
+                job_id,
+                status=JobStatus.FAILED,
+                error="Export interrupted" if interrupted else "Export failed",
+                progress=progress,
+                finished_at=datetime.now(timezone.utc),
+            )
+            if interrupted:
+                raise
+            return
+
+        # Commits the last of the file's rows along
+        completed = await update_running_job(
+            session,
+            job_id,
+            status=JobStatus.COMPLETED,
+            progress=progress,
+            total=progress,
+            result={"file_name": file_name, "file_size": file.size},
+            finished_at=datetime.now(timezone.utc),
+        )
+        if not completed:
+            await delete_job_files(session, job_id)
+            await session.commit()
+            return
+        metrics.increment("exports.completed")
+        metrics.observe("exports.duration", time.perf_counter() - start)
+        logger.info(f"Exported {progress} {resource} to {file_name}")
+
+
+@with_async_db_session
+async def dispatch_exports(session: AsyncSession) -> list[uuid.UUID]:
+    """
+    Start pending exports while fewer than EXPORT_MAX_CONCURRENT_JOBS run.
+
+    Returns the ids of the exports started.
+    """
+    job_ids = await claim_pending_jobs(
+        session,
+        type=JobType.EXPORT,
+        max_running=config.EXPORT_MAX_CONCURRENT_JOBS,
+        stale_after=timedelta(minutes=config.EXPORT_STALE_AFTER_IN_MINUTES),
+        lock_key=_DISPATCH_LOCK_KEY,
+        stale_error="Export stopped responding",
+    )
+    for job_id in job_ids:
+        start_job_task(run_export(job_id))
+    return job_ids
+
+
+def wake_export_dispatcher() -> None:
+    """Run the dispatcher now rather than at its next interval."""
+    wake_dispatcher(DISPATCH_JOB_ID)
+
+
+@with_async_db_session
+async def purge_expired_exports(session: AsyncSession) -> None:
+    """
+    Delete export files older than EXPORT_RETENTION_IN_HOURS.
+
+    Their jobs are kept, marked expired, so clients polling them learn the
+    file is gone. Files of failed exports are deleted as they fail.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        hours=config.EXPORT_RETENTION_IN_HOURS
+    )
+    result = await session.exec(
+        select(Job).where(
+            Job.type == JobType.EXPORT,
+            Job.status == JobStatus.COMPLETED,
+            Job.finished_at < cutoff,
+        )
+    )
+    jobs = result.all()
+    await delete_job_files(session, *(job.id for job in jobs))
+    for job in jobs:
+        job.status = JobStatus.EXPIRED
+        session.add(job)
+    await session.commit()
+    logger.info(f"Expired {len(jobs)} exports")
@@ -0,0 +1,371 @@
+import asyncio
+import csv
+import io
+import json
+import tempfile
+import time
+import uuid
+from collections.abc import Callable, Iterator, Sequence
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from typing import IO, Any
+
+from loguru import logger
+from pydantic import EmailStr, TypeAdapter, ValidationError
+from sqlalchemy import exists, func, insert, literal, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.keystone.utils.invitation import (
+    inviter_display_name,
+    lock_email_invitations,
+    registration_link,
+    render_invitation_email,
+)
+from app.core.config import config
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import metrics
+from app.emails.utils import send_email
+from app.jobs.queue import (
+    claim_pending_jobs,
+    start_job_task,
+    update_running_job,
+    wake_dispatcher,
+)
+from app.models.invitation import Invitation, InvitationType
+from app.models.job import Job, JobStatus, JobType
+from app.models.transaction import Action, Model, Transaction
+from app.models.user import User
+from app.utils.datatable_count import invalidate_counts
+from app.utils.decorators import with_async_db_session
+from app.utils.job_files import delete_job_files, read_job_file
+from app.utils.sql import unnest
+from app.utils.token_filter import record_tokens
+
+UPLOAD_DISPATCH_JOB_ID = "dispatch_invitation_uploads"
+
+# Advisory lock held while claiming uploads, arbitrary but unique to them
+_DISPATCH_LOCK_KEY = 0x696E7669746573
+# Invalid line numbers kept in the job result, the count covers all of them
+_MAX_INVALID_LINES = 100
+
+_email_adapter = TypeAdapter(EmailStr)
+
+UPLOAD_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class UploadCancelled(Exception):
+    """The job stopped running while its upload was being processed."""
+
+
+class _UploadReader:
+    """
+    Reads the email addresses of an uploaded file, a chunk at a time.
+
+    CSV files take the `email` column when the first row names one, otherwise
+    the first column of every row. NDJSON lines are objects with an `email`
+    key or bare JSON strings.
+    """
+
+    def __init__(self, file: IO[bytes], format: str) -> None:
+        self.stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        self.line = 0
+        self.values = self._csv_values() if format == "csv" else self._ndjson_values()
+
+    def _csv_values(self) -> Iterator[str]:
+        rows = csv.reader(self.stream)
+        first_row = next(rows, None)
+        if first_row is None:
+            return
+        header = [cell.strip().lower() for cell in first_row]
+        if "email" in header:
+            column = header.index("email")
+            self.line += 1
+        else:
+            column = 0
+            rows = chain([first_row], rows)
+        for row in rows:
+            yield row[column] if len(row) > column else ""
+
+    def _ndjson_values(self) -> Iterator[str | None]:
+        for text in self.stream:
+            try:
+                value = json.loads(text) if text.strip() else ""
+            except ValueError:
+                value = None
+            if isinstance(value, dict):
+                value = value.get("email")
+            # Anything but a string is invalid
+            yield value if isinstance(value, str) else None
+
+    def read(self, size: int) -> tuple[list[str], list[int], int]:
+        """
+        Up to `size` rows as `(emails, invalid line numbers, rows read)`,
+        reading no rows at the end of the file. Blank rows are skipped.
+        """
+        values = list(islice(self.values, size))
+        emails: list[str] = []
+        invalid: list[int] = []
+        for value in values:
+            self.line += 1
+            if value is not None:
+                value = value.strip()
+                if not value:
+                    continue
+            try:
+                emails.append(_email_adapter.validate_python(value))
+            except ValidationError:
+                invalid.append(self.line)
+        return emails, invalid, len(values)
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+def _count_rows(file: IO[bytes]) -> int:
+    """Non-blank lines of the file, a CSV header included."""
+    rows = sum(1 for line in file if line.strip())
+    file.seek(0)
+    return rows
+
+
+async def _download_upload(
+    job_id: uuid.UUID, session_factory: Callable[[], AsyncSession]
+) -> IO[bytes]:
+    """Copy the uploaded file of `job_id` to a temporary file of this worker."""
+    file = await asyncio.to_thread(tempfile.TemporaryFile)
+    try:
+        async for chunk in read_job_file(job_id, session_factory):
+            await asyncio.to_thread(file.write, chunk)
+        await asyncio.to_thread(file.seek, 0)
+    except BaseException:
+        await asyncio.to_thread(file.close)
+        raise
+    return file
+
+
+async def _insert_chunk(
+    session: AsyncSession, job: Job, emails: Sequence[str], expires_at: datetime
+) -> list[tuple[str, uuid.UUID]]:
+    """
+    Invite the `emails` that have neither a user nor an active invitation.
+
+    Deduplication and insertion are one INSERT ... SELECT over the chunk,
+    followed by one multi-row INSERT of audit transactions. Both run under
+    `lock_email_invitations`, which holds until the caller commits. Returns
+    the `(email, token)` of the invitations created, without committing.
+    """
+    await lock_email_invitations(session)
+    columns = Invitation.__table__.c
+    user_expiry_date = job.params["user_expiry_date"]
+    if user_expiry_date is not None:
+        user_expiry_date = datetime.fromisoformat(user_expiry_date)
+    email = unnest(columns.email, list(dict.fromkeys(emails))).c.value
+    new_invitations = select(
+        email,
+        literal(InvitationType.EMAIL, columns.type.type),
+        func.gen_random_uuid(),
+        literal(job.created_by_user_id, columns.created_by_user_id.type),
+        literal(user_expiry_date, columns.user_expiry_date.type),
+        literal(expires_at, columns.expires_at.type),
+    ).where(
+        ~exists().where(User.email == email),
+        ~exists().where(Invitation.email == email, Invitation.expires_at > func.now()),
+    )
+    result = await session.execute(
+        insert(Invitation)
+        .from_select(
+            [
+                "email",
+                "type",
+                "token",
+                "created_by_user_id",
+                "user_expiry_date",
+                "expires_at",
+            ],
+            new_invitations,
+        )
+        .returning(Invitation.id, Invitation.email, Invitation.token)
+    )
+    created = result.all()
+    if created:
+        await session.execute(
+            insert(Transaction),
+            [
+                {
+                    "user_id": job.created_by_user_id,
+                    "model": Model.INVITATION,
+                    "record_id": str(row.id),
+                    "action": Action.CREATE,
+                    "description": "Email invitation created",
+                    "meta_data": {"new_data": {"email": row.email}},
+                }
+                for row in created
+            ],
+        )
+    return [(row.email, row.token) for row in created]
+
+
+def _send_invitation_emails(
+    invitations: Sequence[tuple[str, uuid.UUID]], inviter_name: str
+) -> None:
+    for email, token in invitations:
+        message = render_invitation_email(
+            inviter_name=inviter_name, registration_link=registration_link(token)
+        )
+        send_email(
+            email_to=email, subject=message.subject, html_content=message.html_content
+        )
+
+
+async def run_invitation_upload(
+    job_id: uuid.UUID,
+    session_factory: Callable[[], AsyncSession] | None = None,
+) -> None:
+    """
+    Invite the email addresses of a claimed upload job.
+
+    The file is parsed in a thread, INVITATION_UPLOAD_CHUNK_SIZE rows at a
+    time. Each chunk is deduplicated and inserted by a single statement and
+    committed on its own, then its emails are sent from a thread in batches
+    of INVITATION_UPLOAD_EMAIL_BATCH_SIZE. Invitations of committed chunks
+    are kept when a later chunk fails. The file is read from the job's file
+    rows into a temporary one, and those rows are deleted once processed.
+    """
+    session_factory = session_factory or AsyncSessionLocal
+    async with session_factory() as session:
+        job = await session.get(Job, job_id)
+        if job is None or job.status != JobStatus.RUNNING:
+            return
+
+        start = time.perf_counter()
+        progress = 0
+        counts: dict[str, Any] = {
+            "created": 0,
+            "existing": 0,
+            "invalid": 0,
+            "emails_queued": 0,
+            "invalid_lines": [],
+        }
+        try:
+            inviter = await session.get(User, job.created_by_user_id)
+            if inviter is None:
+                raise ValueError("Inviter not found")
+            inviter_name = inviter_display_name(inviter)
+            if not config.emails_enabled:
+                logger.warning(f"Emails are not configured, upload {job_id} sends none")
+
+            file = await _download_upload(job_id, session_factory)
+            try:
+                total = await asyncio.to_thread(_count_rows, file)
+            except BaseException:
+                await asyncio.to_thread(file.close)
+                raise
+            await update_running_job(session, job_id, total=total)
+            reader = await asyncio.to_thread(_UploadReader, file, job.params["format"])
+            try:
+                while True:
+                    emails, invalid, read = await asyncio.to_thread(
+                        reader.read, config.INVITATION_UPLOAD_CHUNK_SIZE
+                    )
+                    if not read:
+                        break
+                    # Every chunk gets a full expiry, however long the upload
+                    expires_at = datetime.now(timezone.utc) + timedelta(
+                        hours=config.INVITATION_EXPIRY_IN_HOURS
+                    )
+                    created = await _insert_chunk(session, job, emails, expires_at)
+                    await session.commit()
+                    await record_tokens("invitation", [token for _, token in created])
+
+                    progress += read
+                    counts["created"] += len(created)
+                    counts["existing"] += len(emails) - len(created)
+                    counts["invalid"] += len(invalid)
+                    room = _MAX_INVALID_LINES - len(counts["invalid_lines"])
+                    counts["invalid_lines"] += invalid[:room]
+
+                    if created and config.emails_enabled:
+                        batch_size = config.INVITATION_UPLOAD_EMAIL_BATCH_SIZE
+                        for i in range(0, len(created), batch_size):
+                            await asyncio.to_thread(
+                                _send_invitation_emails,
+                                created[i : i + batch_size],
+                                inviter_name,
+                            )
+                        counts["emails_queued"] += len(created)
+
+                    # Also the heartbeat the stale check relies on
+                    if not await update_running_job(
+                        session, job_id, progress=progress, result=counts
+                    ):
+                        raise UploadCancelled
+            finally:
+                await asyncio.to_thread(reader.close)
+                if counts["created"]:
+                    await invalidate_counts("invitations")
+        except UploadCancelled:
+            logger.warning(f"Invitation upload {job_id} stopped running")
+            await delete_job_files(session, job_id)
+            await session.commit()
+            return
+        except (Exception, asyncio.CancelledError) as e:
+            interrupted = isinstance(e, asyncio.CancelledError)
+            await session.rollback()
+            await delete_job_files(session, job_id)
+            metrics.increment("invitation_uploads.failed")
+            logger.error(f"Invitation upload {job_id} failed: {e!r}")
+            await update_running_job(
+                session,
+                job_id,
+                status=JobStatus.FAILED,
+                error="Upload interrupted" if interrupted else "Upload failed",
+                progress=progress,
+                result=counts,
+                finished_at=datetime.now(timezone.utc),
+            )
+            if interrupted:
+                raise
+            return
+
+        await delete_job_files(session, job_id)
+        await update_running_job(
+            session,
+            job_id,
+            status=JobStatus.COMPLETED,
+            progress=progress,
+            total=progress,
+            result=counts,
+            finished_at=datetime.now(timezone.utc),
+        )
+        metrics.increment("invitation_uploads.completed")
+        metrics.increment("invitation_uploads.created", counts["created"])
+        metrics.observe("invitation_uploads.duration", time.perf_counter() - start)
+        logger.info(
+            f"Invitation upload {job_id} invited {counts['created']} of {progress} rows"
+        )
+
+
+@with_async_db_session
+async def dispatch_invitation_uploads(session: AsyncSession) -> list[uuid.UUID]:
+    """
+    Start pending invitation uploads while fewer than
+    INVITATION_UPLOAD_MAX_CONCURRENT_JOBS run.
+
+    Returns the ids of the uploads started.
+    """
+    job_ids = await claim_pending_jobs(
+        session,
+        type=JobType.INVITATION_UPLOAD,
+        max_running=config.INVITATION_UPLOAD_MAX_CONCURRENT_JOBS,
+        stale_after=timedelta(minutes=config.INVITATION_UPLOAD_STALE_AFTER_IN_MINUTES),
+        lock_key=_DISPATCH_LOCK_KEY,
+        stale_error="Upload stopped responding",
+    )
+    for job_id in job_ids:
+        start_job_task(run_invitation_upload(job_id))
+    return job_ids
+
+
+def wake_invitation_upload_dispatcher() -> None:
+    """Run the dispatcher now rather than at its next interval."""
+    wake_dispatcher(UPLOAD_DISPATCH_JOB_ID)
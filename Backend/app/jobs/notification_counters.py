@@ -0,0 +1,62 @@
+from loguru import logger
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.metrics import metrics
+from app.models import Notification, NotificationCounter
+from app.utils.decorators import with_async_db_session
+from app.utils.notification_counter import invalidate_unread_counts
+
+# Advisory lock held while reconciling, arbitrary but unique to it
+_RECONCILE_LOCK_KEY = 0x756E72656164
+
+
+@with_async_db_session
+async def reconcile_notification_counters(session: AsyncSession) -> int:
+    """
+    Correct unread counters that drifted from the notifications they count.
+
+    Works like `reconcile_dashboard_counters`: unread notifications and
+    counters are compared within one statement and the difference is added
+    to the counters. Returns the number of counters corrected.
+    """
+    # Workers reconciling at once would apply the same correction twice
+    await session.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"), {"key": _RECONCILE_LOCK_KEY}
+    )
+
+    counted = (
+        select(Notification.user_id, func.count().label("unread"))
+        .where(~Notification.is_read)
+        .group_by(Notification.user_id)
+        .subquery("counted")
+    )
+    counters = NotificationCounter.__table__
+    delta = func.coalesce(counted.c.unread, 0) - func.coalesce(counters.c.unread, 0)
+    drift = select(
+        func.coalesce(counted.c.user_id, counters.c.user_id), delta, func.now()
+    ).select_from(
+        counted.join(counters, counted.c.user_id == counters.c.user_id, full=True)
+    )
+    statement = insert(NotificationCounter).from_select(
+        ["user_id", "unread", "updated_at"], drift.where(delta != 0)
+    )
+    result = await session.exec(
+        statement.on_conflict_do_update(
+            index_elements=[NotificationCounter.user_id],
+            set_={
+                "unread": NotificationCounter.unread + statement.excluded.unread,
+                "updated_at": statement.excluded.updated_at,
+            },
+        ).returning(NotificationCounter.user_id)
+    )
+    corrected = list(result.scalars().all())
+    # Releases the advisory lock
+    await session.commit()
+
+    if corrected:
+        await invalidate_unread_counts(*corrected)
+        metrics.increment("notification_counters.corrected", len(corrected))
+        logger.warning(f"Corrected {len(corrected)} drifted unread counters")
+    return len(corrected)
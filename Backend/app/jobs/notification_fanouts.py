@@ -0,0 +1,252 @@
+import asyncio
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.sql import Select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.keystone.utils.user import filter_users
+from app.core.config import config
+from app.core.db import AsyncSessionLocal
+from app.core.metrics import metrics
+from app.jobs.queue import (
+    claim_pending_jobs,
+    start_job_task,
+    update_running_job,
+    wake_dispatcher,
+)
+from app.models.group import UserGroup
+from app.models.job import Job, JobStatus, JobType
+from app.models.notification import (
+    Notification,
+    NotificationChannel,
+    NotificationMessage,
+    NotificationType,
+)
+from app.models.user import User
+from app.schemas.notification import NotificationAudience
+from app.utils.decorators import with_async_db_session
+from app.utils.notification_counter import invalidate_all_unread_counts
+from app.utils.notification_stream import publish_fanout
+from app.utils.search import apply_user_search
+from app.utils.sql import any_of
+
+FANOUT_DISPATCH_JOB_ID = "dispatch_notification_fanouts"
+
+# Advisory lock held while claiming fan-outs, arbitrary but unique to them
+_DISPATCH_LOCK_KEY = 0x66616E6F7574
+
+
+class FanoutCancelled(Exception):
+    """The job stopped running while its notifications were being created."""
+
+
+@dataclass(frozen=True)
+class FanoutChunk:
+    """What one chunk inserted; nothing about the rows themselves."""
+
+    created: int
+    first_id: int
+    last_id: int
+
+
+def recipients_query(audience: NotificationAudience) -> Select:
+    """Select the ids of the users `audience` covers, once each."""
+    if audience.group_id is not None:
+        # Walks the (group_id, user_id) index in user id order
+        return select(UserGroup.user_id).where(UserGroup.group_id == audience.group_id)
+
+    query = select(User.id)
+    if audience.user_ids is not None:
+        return query.where(any_of(User.id, audience.user_ids))
+    if audience.search:
+        query, _ = apply_user_search(query, audience.search, audience.search_mode)
+    return filter_users(query, audience.filters)
+
+
+async def insert_notification_chunks(
+    session: AsyncSession,
+    recipients: Select,
+    *,
+    message: str,
+    type: NotificationType = NotificationType.INFO,
+    channel: NotificationChannel = NotificationChannel.WEB,
+    meta_data: dict | None = None,
+    chunk_size: int | None = None,
+) -> AsyncIterator[FanoutChunk]:
+    """
+    Create a notification for every user id `recipients` selects.
+
+    The body is inserted once, with the first chunk. Each chunk of
+    `chunk_size` recipients, in user id order, is one INSERT ... SELECT:
+    recipients never leave the database, and only the chunk's row count and
+    id range come back. Chunks are yielded without committing; the unread
+    counter triggers run once per chunk.
+    """
+    chunk_size = chunk_size or config.NOTIFICATION_FANOUT_CHUNK_SIZE
+    user_id = recipients.selected_columns[0]
+    body = NotificationMessage(
+        message=message, type=type, channel=channel, meta_data=meta_data or {}
+    )
+    session.add(body)
+    await session.flush()
+    message_id = literal(body.id, Notification.__table__.c.message_id.type)
+
+    # Keyset over the user id, earlier chunks may no longer match the audience
+    last_user_id: uuid.UUID | None = None
+    while True:
+        page = (
+            recipients
+            if last_user_id is None
+            else recipients.where(user_id > last_user_id)
+        )
+        batch = page.order_by(None).order_by(user_id).limit(chunk_size).cte("batch")
+        recipient = batch.c[0]
+        inserted = (
+            insert(Notification)
+            .from_select(["user_id", "message_id"], select(recipient, message_id))
+            .returning(Notification.id)
+            .cte("inserted")
+        )
+        row = (
+            await session.execute(
+                select(
+                    select(recipient)
+                    .order_by(recipient.desc())
+                    .limit(1)
+                    .scalar_subquery()
+                    .label("last_user_id"),
+                    func.count().label("created"),
+                    func.min(inserted.c.id).label("first_id"),
+                    func.max(inserted.c.id).label("last_id"),
+                ).select_from(inserted)
+            )
+        ).one()
+        if not row.created:
+            if last_user_id is None:
+                # Nobody to notify, don't leave the body behind
+                await session.delete(body)
+                await session.flush()
+            return
+        yield FanoutChunk(
+            created=row.created, first_id=row.first_id, last_id=row.last_id
+        )
+        if row.created < chunk_size:
+            return
+        last_user_id = row.last_user_id
+
+
+async def run_notification_fanout(
+    job_id: uuid.UUID,
+    session_factory: Callable[[], AsyncSession] | None = None,
+) -> None:
+    """
+    Create the notifications of a claimed fan-out job.
+
+    Chunks of NOTIFICATION_FANOUT_CHUNK_SIZE recipients are committed on
+    their own, then pushed to open streams and reported as progress.
+    Notifications of committed chunks are kept when a later chunk fails.
+    """
+    session_factory = session_factory or AsyncSessionLocal
+    async with session_factory() as session:
+        job = await session.get(Job, job_id)
+        if job is None or job.status != JobStatus.RUNNING:
+            return
+
+        start = time.perf_counter()
+        progress = 0
+        try:
+            audience = NotificationAudience.model_validate(job.params["audience"])
+            notification = job.params["notification"]
+            recipients = recipients_query(audience)
+            total = await session.scalar(
+                select(func.count()).select_from(recipients.subquery())
+            )
+            await update_running_job(session, job_id, total=total)
+
+            chunks = insert_notification_chunks(
+                session,
+                recipients,
+                message=notification["message"],
+                type=NotificationType(notification["type"]),
+                channel=NotificationChannel(notification["channel"]),
+                meta_data=notification["meta_data"],
+            )
+            async for chunk in chunks:
+                await session.commit()
+                await invalidate_all_unread_counts()
+                await publish_fanout(chunk.first_id, chunk.last_id)
+
+                progress += chunk.created
+                # Also the heartbeat the stale check relies on
+                if not await update_running_job(session, job_id, progress=progress):
+                    raise FanoutCancelled
+        except FanoutCancelled:
+            logger.warning(f"Notification fan-out {job_id} stopped running")
+            return
+        except (Exception, asyncio.CancelledError) as e:
+            interrupted = isinstance(e, asyncio.CancelledError)
+            await session.rollback()
+            metrics.increment("notification_fanouts.failed")
+            logger.error(f"Notification fan-out {job_id} failed: {e!r}")
+            await update_running_job(
+                session,
+                job_id,
+                status=JobStatus.FAILED,
+                error="Fan-out interrupted" if interrupted else "Fan-out failed",
+                progress=progress,
+                finished_at=datetime.now(timezone.utc),
+            )
+            if interrupted:
+                raise
+            return
+
+        elapsed = time.perf_counter() - start
+        await update_running_job(
+            session,
+            job_id,
+            status=JobStatus.COMPLETED,
+            progress=progress,
+            total=progress,
+            finished_at=datetime.now(timezone.utc),
+        )
+        metrics.increment("notification_fanouts.completed")
+        metrics.increment("notification_fanouts.created", progress)
+        metrics.observe("notification_fanouts.duration", elapsed)
+        logger.info(
+            f"Notification fan-out {job_id} created {progress} notifications "
+            f"in {elapsed:.1f}s"
+        )
+
+
+@with_async_db_session
+async def dispatch_notification_fanouts(session: AsyncSession) -> list[uuid.UUID]:
+    """
+    Start pending fan-outs while fewer than
+    NOTIFICATION_FANOUT_MAX_CONCURRENT_JOBS run.
+
+    Returns the ids of the fan-outs started.
+    """
+    job_ids = await claim_pending_jobs(
+        session,
+        type=JobType.NOTIFICATION_FANOUT,
+        max_running=config.NOTIFICATION_FANOUT_MAX_CONCURRENT_JOBS,
+        stale_after=timedelta(
+            minutes=config.NOTIFICATION_FANOUT_STALE_AFTER_IN_MINUTES
+        ),
+        lock_key=_DISPATCH_LOCK_KEY,
+        stale_error="Fan-out stopped responding",
+    )
+    for job_id in job_ids:
+        start_job_task(run_notification_fanout(job_id))
+    return job_ids
+
+
+def wake_notification_fanout_dispatcher() -> None:
+    """Run the dispatcher now rather than at its next interval."""
+    wake_dispatcher(FANOUT_DISPATCH_JOB_ID)
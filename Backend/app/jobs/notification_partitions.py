@@ -0,0 +1,220 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.utils.decorators import with_async_db_session
+
+DEFAULT_PARTITION = "notification_default"
+
+_PARTITION_NAME = re.compile(r"notification_p(\d{4})_(\d{2})")
+# Advisory lock held while changing partitions, arbitrary but unique to it
+_PARTITION_LOCK_KEY = 0x706172746E73
+# Attaching and detaching wait this long for the locks they need rather than
+# queueing every notification query behind them
+_LOCK_TIMEOUT = "5s"
+
+
+@dataclass
+class PartitionMaintenance:
+    """Names of the partitions one maintenance run went through."""
+
+    created: list[str] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
+    # Failed, e.g. on a lock timeout; retried on the next run
+    failed: list[str] = field(default_factory=list)
+    # Unread notifications of dropped partitions, moved to the default one
+    moved: int = 0
+    # Notifications moved that way and read since, deleted
+    purged: int = 0
+
+
+def partition_name(month: date) -> str:
+    return f"notification_p{month:%Y_%m}"
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _bound(month: date) -> str:
+    return f"{month} 00:00+00"
+
+
+async def _begin_change(session: AsyncSession) -> None:
+    """Serialize partition changes of concurrent runs, until commit."""
+    await session.execute(
+        text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PARTITION_LOCK_KEY}
+    )
+    await session.execute(text(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'"))
+
+
+async def _partition_months(session: AsyncSession) -> set[date]:
+    """The months of the monthly partitions attached to `notification`."""
+    result = await session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits AS i "
+            "JOIN pg_class AS c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST('notification' AS regclass)"
+        )
+    )
+    months = set()
+    for name in result.scalars():
+        if match := _PARTITION_NAME.fullmatch(name):
+            months.add(date(int(match[1]), int(match[2]), 1))
+    return months
+
+
+async def _default_months(session: AsyncSession) -> set[date]:
+    """The months of the rows that landed in the default partition."""
+    result = await session.execute(
+        text(
+            "SELECT DISTINCT CAST(date_trunc('month', created_at AT TIME ZONE 'UTC') "
+            f"AS date) FROM {DEFAULT_PARTITION}"
+        )
+    )
+    return set(result.scalars())
+
+
+async def create_notification_partition(session: AsyncSession, month: date) -> bool:
+    """
+    Create the partition of `month`, unless it exists.
+
+    Rows of that month in the default partition are moved into it first: a
+    partition can't be attached over rows the default one holds. They move
+    between partitions, the unread counter triggers of `notification` don't
+    see it. Returns whether the partition was created.
+    """
+    await _begin_change(session)
+    if month in await _partition_months(session):
+        await session.rollback()
+        return False
+
+    name, upper = partition_name(month), _next_month(month)
+    await session.execute(
+        text(f"CREATE TABLE {name} (LIKE notification INCLUDING DEFAULTS)")
+    )
+    await session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE created_at >= :lower AND created_at < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {
+            "lower": datetime.combine(month, time(), timezone.utc),
+            "upper": datetime.combine(upper, time(), timezone.utc),
+        },
+    )
+    # Also builds the partition's copies of the table's indexes and keys
+    await session.execute(
+        text(
+            f"ALTER TABLE notification ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{_bound(month)}') TO ('{_bound(upper)}')"
+        )
+    )
+    await session.commit()
+    return True
+
+
+async def drop_notification_partition(session: AsyncSession, month: date) -> int | None:
+    """
+    Detach and drop the partition of `month`.
+
+    Its unread notifications are moved to the default partition first, so
+    unread counters stay exact and one unread notification doesn't keep the
+    whole month; read bodies are left to `purge_notification_messages`.
+    Returns the number of notifications moved, or None when the partition
+    doesn't exist.
+    """
+    name = partition_name(month)
+    await _begin_change(session)
+    # Every worker runs the job, another one may have dropped it already
+    if month not in await _partition_months(session):
+        await session.rollback()
+        return None
+    await session.execute(text(f"ALTER TABLE notification DETACH PARTITION {name}"))
+    # Nothing covers the month anymore, the default partition takes its rows.
+    # They move between partitions, the unread counter triggers of
+    # `notification` don't see it
+    moved = await session.execute(
+        text(f"INSERT INTO {DEFAULT_PARTITION} SELECT * FROM {name} WHERE NOT is_read")
+    )
+    await session.execute(text(f"DROP TABLE {name}"))
+    await session.commit()
+    return moved.rowcount
+
+
+async def _purge_read_expired(session: AsyncSession, before: date) -> int:
+    """Delete the read notifications left over from dropped months."""
+    result = await session.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE is_read AND created_at < :before"),
+        {"before": datetime.combine(before, time(), timezone.utc)},
+    )
+    await session.commit()
+    return result.rowcount
+
+
+@with_async_db_session
+async def maintain_notification_partitions(
+    session: AsyncSession, now: datetime | None = None
+) -> PartitionMaintenance:
+    """
+    Keep `notification` partitioned by month.
+
+    Creates the partitions of the current month and of the
+    NOTIFICATION_PARTITION_MONTHS_AHEAD next ones, and of every unexpired
+    month with rows in the default partition. Drops the partitions of the
+    months that ended NOTIFICATION_RETENTION_IN_DAYS ago rather than
+    deleting rows; their unread notifications stay in the default partition
+    until read. Every partition is changed in a transaction of its own.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=config.NOTIFICATION_RETENTION_IN_DAYS)
+    # Months before this one have expired
+    retained = date(cutoff.year, cutoff.month, 1)
+    month = date(now.year, now.month, 1)
+    wanted = {m for m in await _default_months(session) if m >= retained}
+    for _ in range(config.NOTIFICATION_PARTITION_MONTHS_AHEAD + 1):
+        wanted.add(month)
+        month = _next_month(month)
+    existing = await _partition_months(session)
+    await session.rollback()
+
+    maintenance = PartitionMaintenance()
+    for month in sorted(wanted - existing):
+        try:
+            if await create_notification_partition(session, month):
+                maintenance.created.append(partition_name(month))
+            existing.add(month)
+        except DBAPIError as e:
+            await session.rollback()
+            maintenance.failed.append(partition_name(month))
+            logger.warning(f"Failed to create {partition_name(month)}: {e}")
+
+    for month in sorted(m for m in existing if m < retained):
+        try:
+            moved = await drop_notification_partition(session, month)
+            if moved is not None:
+                maintenance.dropped.append(partition_name(month))
+                maintenance.moved += moved
+        except DBAPIError as e:
+            await session.rollback()
+            maintenance.failed.append(partition_name(month))
+            logger.warning(f"Failed to drop {partition_name(month)}: {e}")
+    maintenance.purged = await _purge_read_expired(session, retained)
+
+    metrics.increment("notification_partitions.created", len(maintenance.created))
+    metrics.increment("notification_partitions.dropped", len(maintenance.dropped))
+    metrics.increment("notification_partitions.failed", len(maintenance.failed))
+    logger.info(
+        f"Created {len(maintenance.created)} and dropped {len(maintenance.dropped)} "
+        f"notification partitions, moved {maintenance.moved} unread notifications "
+        f"to the default one and purged {maintenance.purged} read ones from it"
+    )
+    return maintenance
@@ -0,0 +1,40 @@
+from loguru import logger
+from sqlalchemy import delete, exists
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.models.notification import Notification, NotificationMessage
+from app.utils.decorators import with_async_db_session
+
+
+@with_async_db_session
+async def purge_notification_messages(session: AsyncSession) -> int:
+    """
+    Delete the notification bodies no notification refers to anymore.
+
+    Deleting a notification, or the user it belongs to, leaves its body
+    behind for the other recipients. Bodies are deleted
+    NOTIFICATION_MESSAGE_PURGE_BATCH_SIZE per transaction; each check walks
+    the `message_id` index. Returns the number of bodies deleted.
+    """
+    deleted = 0
+    while True:
+        batch = (
+            select(NotificationMessage.id)
+            .where(~exists().where(Notification.message_id == NotificationMessage.id))
+            .limit(config.NOTIFICATION_MESSAGE_PURGE_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(
+            delete(NotificationMessage).where(NotificationMessage.id.in_(batch))
+        )
+        await session.commit()
+        deleted += result.rowcount
+        if result.rowcount < config.NOTIFICATION_MESSAGE_PURGE_BATCH_SIZE:
+            break
+
+    metrics.increment("notification_messages.purged", deleted)
+    logger.info(f"Purged {deleted} orphaned notification messages")
+    return deleted
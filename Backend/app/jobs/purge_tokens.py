@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import ColumnElement, delete, exists
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.models.invitation import Invitation, InvitationRegistration
+from app.models.password_reset import PasswordReset
+from app.utils.datatable_count import invalidate_counts
+from app.utils.decorators import with_async_db_session
+
+
+async def _delete_in_batches(
+    session: AsyncSession,
+    model: type[Invitation] | type[PasswordReset],
+    condition: ColumnElement[bool],
+) -> int:
+    """
+    Delete the rows of `model` matching `condition`, TOKEN_PURGE_BATCH_SIZE
+    per transaction. Rows locked by a request are skipped until the next run.
+    """
+    deleted = 0
+    while True:
+        batch = (
+            select(model.id)
+            .where(condition)
+            .limit(config.TOKEN_PURGE_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        result = await session.execute(delete(model).where(model.id.in_(batch)))
+        await session.commit()
+        deleted += result.rowcount
+        if result.rowcount < config.TOKEN_PURGE_BATCH_SIZE:
+            return deleted
+
+
+@with_async_db_session
+async def purge_expired_tokens(session: AsyncSession) -> dict[str, int]:
+    """
+    Delete expired password resets and stale invitations.
+
+    Invitations are stale once expired for INVITATION_RETENTION_IN_DAYS
+    without anyone having registered with them; used ones are kept, user
+    expiry depends on them. Both scans walk the `expires_at` indexes, so
+    keeping the tables to mostly live tokens keeps their token indexes small.
+    Returns the number of rows deleted per table.
+    """
+    now = datetime.now(timezone.utc)
+    password_resets = await _delete_in_batches(
+        session, PasswordReset, PasswordReset.expires_at <= now
+    )
+
+    retention_cutoff = now - timedelta(days=config.INVITATION_RETENTION_IN_DAYS)
+    invitations = await _delete_in_batches(
+        session,
+        Invitation,
+        (Invitation.expires_at <= retention_cutoff)
+        & ~exists().where(InvitationRegistration.invitation_id == Invitation.id),
+    )
+    if invitations:
+        await invalidate_counts("invitations")
+
+    metrics.increment("token_purge.password_resets", password_resets)
+    metrics.increment("token_purge.invitations", invitations)
+    logger.info(
+        f"Purged {password_resets} expired password resets "
+        f"and {invitations} stale invitations"
+    )
+    return {"password_reset": password_resets, "invitation": invitations}
@@ -0,0 +1,122 @@
+import asyncio
+import uuid
+from collections.abc import Coroutine
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import func, text, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.metrics import metrics
+from app.core.scheduler import scheduler
+from app.models.job import Job, JobStatus, JobType
+from app.utils.job_files import delete_job_files
+
+# Keeps the running job tasks referenced until they finish
+_running: set[asyncio.Task] = set()
+
+
+async def update_running_job(
+    session: AsyncSession, job_id: uuid.UUID, **values
+) -> bool:
+    """Update a running job, returning False when it is no longer running."""
+    result = await session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.RUNNING)
+        .values(**values)
+    )
+    await session.commit()
+    return result.rowcount > 0
+
+
+async def claim_pending_jobs(
+    session: AsyncSession,
+    *,
+    type: JobType,
+    max_running: int,
+    stale_after: timedelta,
+    lock_key: int,
+    stale_error: str,
+) -> list[uuid.UUID]:
+    """
+    Mark pending jobs of `type` running while fewer than `max_running` run.
+
+    Every API worker runs the dispatchers; the advisory lock makes them take
+    turns so the cap holds across workers. Running jobs that stopped
+    reporting progress for `stale_after`, e.g. because their worker died, are
+    failed with `stale_error` first so they free their slot. Returns the ids
+    of the jobs claimed, which the caller starts.
+    """
+    now = datetime.now(timezone.utc)
+    await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": lock_key})
+
+    stale = await session.execute(
+        update(Job)
+        .where(
+            Job.type == type,
+            Job.status == JobStatus.RUNNING,
+            Job.updated_at < now - stale_after,
+        )
+        .values(
+            status=JobStatus.FAILED,
+            error=stale_error,
+            finished_at=now,
+        )
+        .returning(Job.id)
+    )
+    stale_ids = stale.scalars().all()
+    if stale_ids:
+        # Nothing reads what they uploaded or wrote anymore
+        await delete_job_files(session, *stale_ids)
+        metrics.increment(f"{type.value}s.stale", len(stale_ids))
+        logger.warning(f"Failed {len(stale_ids)} stale {type.value} jobs")
+
+    running = await session.scalar(
+        select(func.count())
+        .select_from(Job)
+        .where(Job.type == type, Job.status == JobStatus.RUNNING)
+    )
+    slots = max_running - (running or 0)
+    if slots <= 0:
+        await session.commit()
+        return []
+
+    result = await session.exec(
+        select(Job.id)
+        .where(Job.type == type, Job.status == JobStatus.PENDING)
+        .order_by(Job.created_at)
+        .limit(slots)
+    )
+    job_ids = list(result.all())
+    if job_ids:
+        await session.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids))
+            .values(status=JobStatus.RUNNING, started_at=now)
+        )
+    # Releases the advisory lock
+    await session.commit()
+    return job_ids
+
+
+def start_job_task(coro: Coroutine[Any, Any, None]) -> None:
+    """Run a claimed job in this process, see `cancel_running_jobs`."""
+    task = asyncio.create_task(coro)
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+
+async def cancel_running_jobs() -> None:
+    """Interrupt the jobs running in this process, e.g. on shutdown."""
+    for task in _running:
+        task.cancel()
+    await asyncio.gather(*_running, return_exceptions=True)
+
+
+def wake_dispatcher(scheduler_job_id: str) -> None:
+    """Run a dispatcher now rather than at its next interval."""
+    job = scheduler.get_job(scheduler_job_id)
+    if job is not None:
+        job.modify(next_run_time=datetime.now(timezone.utc))
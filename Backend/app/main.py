@@ -1,21 +1,46 @@
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
-from redis import asyncio as aioredis
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.keystone.main import api_router as keystone_api_router
 from app.api.project.main import api_router as project_api_router
 from app.core.config import config
 from app.core.logger import configure_logger
-from app.core.scheduler import daily_midnight_trigger, scheduler
+from app.core.redis import close_redis, get_redis
+from app.core.scheduler import daily_midnight_trigger, hourly_trigger, scheduler
+from app.core.security import PasswordHasherBusyError, password_hasher
+from app.jobs.dashboard_counters import reconcile_dashboard_counters
 from app.jobs.expire_users import expire_users
+from app.jobs.exports import (
+    DISPATCH_JOB_ID,
+    dispatch_exports,
+    purge_expired_exports,
+)
+from app.jobs.invitation_uploads import (
+    UPLOAD_DISPATCH_JOB_ID,
+    dispatch_invitation_uploads,
+)
+from app.jobs.notification_counters import reconcile_notification_counters
+from app.jobs.notification_fanouts import (
+    FANOUT_DISPATCH_JOB_ID,
+    dispatch_notification_fanouts,
+)
+from app.jobs.notification_partitions import maintain_notification_partitions
+from app.jobs.purge_notification_messages import purge_notification_messages
+from app.jobs.purge_tokens import purge_expired_tokens
+from app.jobs.queue import cancel_running_jobs
+from app.utils.notification_stream import notification_hub
+from app.utils.token_epoch import TokenRevocationError
+from app.utils.token_filter import rebuild_token_filters
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -29,16 +54,65 @@ if config.SENTRY_DSN and not config.is_local:
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
     configure_logger()
-    redis = aioredis.from_url(config.REDIS_URL)
     FastAPICache.init(
-        RedisBackend(redis),
+        RedisBackend(get_redis()),
         prefix=f"{config.PROJECT_NAME}:cache",
         enable=config.CACHE_ENABLED,
     )
     scheduler.add_job(expire_users, trigger=daily_midnight_trigger)
+    scheduler.add_job(
+        dispatch_exports,
+        trigger="interval",
+        seconds=config.EXPORT_DISPATCH_INTERVAL_IN_SECONDS,
+        id=DISPATCH_JOB_ID,
+    )
+    scheduler.add_job(purge_expired_exports, trigger=hourly_trigger)
+    scheduler.add_job(purge_expired_tokens, trigger=hourly_trigger)
+    scheduler.add_job(purge_notification_messages, trigger=hourly_trigger)
+    scheduler.add_job(
+        dispatch_invitation_uploads,
+        trigger="interval",
+        seconds=config.INVITATION_UPLOAD_DISPATCH_INTERVAL_IN_SECONDS,
+        id=UPLOAD_DISPATCH_JOB_ID,
+    )
+    scheduler.add_job(
+        dispatch_notification_fanouts,
+        trigger="interval",
+        seconds=config.NOTIFICATION_FANOUT_DISPATCH_INTERVAL_IN_SECONDS,
+        id=FANOUT_DISPATCH_JOB_ID,
+    )
+    scheduler.add_job(
+        rebuild_token_filters,
+        trigger="interval",
+        minutes=config.TOKEN_FILTER_REBUILD_INTERVAL_IN_MINUTES,
+        next_run_time=datetime.now(timezone.utc),
+    )
+    # Also on startup, e.g. after a restore that bypassed the counter triggers
+    scheduler.add_job(
+        reconcile_dashboard_counters,
+        trigger="interval",
+        minutes=config.DASHBOARD_RECONCILE_INTERVAL_IN_MINUTES,
+        next_run_time=datetime.now(timezone.utc),
+    )
+    # Also on startup, so a new deployment has its partitions ahead
+    scheduler.add_job(
+        maintain_notification_partitions,
+        trigger=daily_midnight_trigger,
+        next_run_time=datetime.now(timezone.utc),
+    )
+    scheduler.add_job(
+        reconcile_notification_counters,
+        trigger="interval",
+        minutes=config.NOTIFICATION_COUNTER_RECONCILE_INTERVAL_IN_MINUTES,
+    )
     scheduler.start()
+    password_hasher.start()
     yield
     scheduler.shutdown()
+    await notification_hub.close()
+    await cancel_running_jobs()
+    password_hasher.shutdown()
+    await close_redis()
 
 
 app = FastAPI(
@@ -68,5 +142,28 @@ if config.all_cors_origins:
 app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
 
 
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_handler(
+    _: Request, __: PasswordHasherBusyError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(TokenRevocationError)
+async def token_revocation_handler(
+    _: Request, __: TokenRevocationError
+) -> JSONResponse:
+    # Only reaches here from changes committed at once, raised before the
+    # commit; bulk updates catch it and report the chunks they applied
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable, nothing was changed"},
+    )
+
+
 app.include_router(keystone_api_router)
 app.include_router(project_api_router)
@@ -0,0 +1,59 @@
+"""add user search indexes
+
+Revision ID: f7b022f0e834
+Revises: e686035a6982
+Create Date: 2026-10-17 09:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f7b022f0e834"
+down_revision = "e686035a6982"
+branch_labels = None
+depends_on = None
+
+# Keep in sync with app.utils.search
+USER_SEARCH_TEXT = """first_name || ' ' || last_name || ' ' || email"""
+USER_SEARCH_DOCUMENT = (
+    f"to_tsvector('simple', {USER_SEARCH_TEXT} || ' ' "
+    "|| translate(email, '@.-_+', '     '))"
+)
+
+
+def upgrade():
+    # Built concurrently so existing user tables stay writable
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_search_document "
+            f'ON "user" USING gin ({USER_SEARCH_DOCUMENT})'
+        )
+
+        # pg_trgm is a contrib extension and may be missing or not allowed;
+        # substring search then keeps working without an index
+        op.execute(
+            """
+            DO $$
+            BEGIN
+                CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            EXCEPTION WHEN OTHERS THEN
+                RAISE NOTICE 'pg_trgm unavailable, skipping trigram index: %',
+                    SQLERRM;
+            END $$;
+            """
+        )
+        bind = op.get_bind()
+        has_trgm = bind.exec_driver_sql(
+            "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+        ).scalar()
+        if has_trgm:
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_search_text_trgm "
+                f'ON "user" USING gin (({USER_SEARCH_TEXT}) gin_trgm_ops)'
+            )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_user_search_text_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_user_search_document")
@@ -0,0 +1,44 @@
+"""add keyset pagination indexes
+
+Revision ID: 125d70a6b15c
+Revises: f7b022f0e834
+Create Date: 2026-10-17 10:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "125d70a6b15c"
+down_revision = "f7b022f0e834"
+branch_labels = None
+depends_on = None
+
+# Keep in sync with the *_CURSOR_COLUMNS of the datatable routes. Every
+# column is paired with the primary key, which is the cursor tiebreaker.
+# Invitations sorted by id are served by the primary key itself.
+CURSOR_INDEXES = {
+    "user": ["created_at", "updated_at", "first_name", "last_name", "email", "status"],
+    "group": ["created_at", "updated_at", "name"],
+    "invitation": ["created_at", "updated_at", "expires_at"],
+}
+
+
+def upgrade():
+    # Built concurrently so the tables stay writable
+    with op.get_context().autocommit_block():
+        for table, columns in CURSOR_INDEXES.items():
+            for column in columns:
+                op.create_index(
+                    f"ix_{table}_{column}_id",
+                    table,
+                    [column, "id"],
+                    postgresql_concurrently=True,
+                    if_not_exists=True,
+                )
+
+
+def downgrade():
+    for table, columns in CURSOR_INDEXES.items():
+        for column in columns:
+            op.drop_index(f"ix_{table}_{column}_id", table_name=table, if_exists=True)
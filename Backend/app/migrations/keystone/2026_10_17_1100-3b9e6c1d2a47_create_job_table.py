@@ -0,0 +1,63 @@
+"""create job table
+
+Revision ID: 3b9e6c1d2a47
+Revises: 125d70a6b15c
+Create Date: 2026-10-17 11:00:00.000000+00:00
+
+"""
+
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3b9e6c1d2a47"
+down_revision = "125d70a6b15c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "job",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("type", sa.Enum("EXPORT", name="jobtype"), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum(
+                "PENDING",
+                "RUNNING",
+                "COMPLETED",
+                "FAILED",
+                "EXPIRED",
+                name="jobstatus",
+            ),
+            nullable=False,
+        ),
+        sa.Column("created_by_user_id", sa.Uuid(), nullable=True),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["created_by_user_id"], ["user.id"], ondelete="SET NULL"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_job_type_status", "job", ["type", "status"])
+    op.create_index("ix_job_created_at", "job", ["created_at"])
+    op.create_index("ix_job_updated_at", "job", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_job_updated_at", table_name="job")
+    op.drop_index("ix_job_created_at", table_name="job")
+    op.drop_index("ix_job_type_status", table_name="job")
+    op.drop_table("job")
+    sa.Enum(name="jobstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="jobtype").drop(op.get_bind(), checkfirst=True)
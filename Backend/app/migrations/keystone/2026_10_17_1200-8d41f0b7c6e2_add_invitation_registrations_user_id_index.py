@@ -0,0 +1,36 @@
+"""add invitation registrations user id index
+
+Revision ID: 8d41f0b7c6e2
+Revises: 3b9e6c1d2a47
+Create Date: 2026-10-17 12:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8d41f0b7c6e2"
+down_revision = "3b9e6c1d2a47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The primary key leads with invitation_id, so looking up the invitation
+    # of a user scanned the whole table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_invitation_registrations_user_id",
+            "invitation_registrations",
+            ["user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_invitation_registrations_user_id",
+        table_name="invitation_registrations",
+        if_exists=True,
+    )
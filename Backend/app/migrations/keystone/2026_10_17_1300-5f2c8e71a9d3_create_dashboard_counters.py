@@ -0,0 +1,106 @@
+"""create dashboard counters
+
+Revision ID: 5f2c8e71a9d3
+Revises: 8d41f0b7c6e2
+Create Date: 2026-10-17 13:00:00.000000+00:00
+
+"""
+
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5f2c8e71a9d3"
+down_revision = "8d41f0b7c6e2"
+branch_labels = None
+depends_on = None
+
+# table: (counter name expression, counter names cleared on TRUNCATE)
+COUNTED_TABLES = {
+    "user": ("'users.' || lower(status::text)", "users.%"),
+    "invitation": ("'invitations.' || lower(type::text)", "invitations.%"),
+    "invitation_registrations": ("'registrations'", "registrations"),
+    "group": ("CASE WHEN is_active THEN 'groups.active' END", "groups.%"),
+}
+
+# Statement-level, so a bulk UPDATE adjusts each counter once. Rows are
+# upserted in name order, concurrent writers lock counters in the same order.
+COUNT_ROWS_FUNCTION = """
+CREATE FUNCTION dashboard_count_rows() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    counter text := TG_ARGV[0];
+    deltas text;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE dashboard_counters SET value = 0, updated_at = now()
+        WHERE name LIKE TG_ARGV[1];
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        deltas := format('SELECT %s AS name, 1 AS delta FROM new_rows', counter);
+    ELSIF TG_OP = 'DELETE' THEN
+        deltas := format('SELECT %s AS name, -1 AS delta FROM old_rows', counter);
+    ELSE
+        deltas := format(
+            'SELECT %1$s AS name, 1 AS delta FROM new_rows '
+            'UNION ALL SELECT %1$s, -1 FROM old_rows',
+            counter
+        );
+    END IF;
+
+    EXECUTE format(
+        'INSERT INTO dashboard_counters AS c (name, value, updated_at) '
+        'SELECT name, sum(delta), now() FROM (%s) AS d WHERE name IS NOT NULL '
+        'GROUP BY name HAVING sum(delta) <> 0 ORDER BY name '
+        'ON CONFLICT (name) DO UPDATE '
+        'SET value = c.value + excluded.value, updated_at = excluded.updated_at',
+        deltas
+    );
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade():
+    op.create_table(
+        "dashboard_counters",
+        sa.Column("name", sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.execute(COUNT_ROWS_FUNCTION)
+
+    for table, (counter, prefix) in COUNTED_TABLES.items():
+        for event, transition in (
+            ("INSERT", "NEW TABLE AS new_rows"),
+            ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+            ("DELETE", "OLD TABLE AS old_rows"),
+        ):
+            op.execute(
+                f'CREATE TRIGGER dashboard_count_{event.lower()} AFTER {event} ON "{table}" '
+                f"REFERENCING {transition} FOR EACH STATEMENT "
+                f"EXECUTE FUNCTION dashboard_count_rows($${counter}$$)"
+            )
+        op.execute(
+            f'CREATE TRIGGER dashboard_count_truncate AFTER TRUNCATE ON "{table}" '
+            f"FOR EACH STATEMENT "
+            f"EXECUTE FUNCTION dashboard_count_rows($${counter}$$, '{prefix}')"
+        )
+
+        # Start from the current rows
+        op.execute(
+            f"INSERT INTO dashboard_counters (name, value, updated_at) "
+            f'SELECT name, count(*), now() FROM (SELECT {counter} AS name FROM "{table}") AS r '
+            f"WHERE name IS NOT NULL GROUP BY name"
+        )
+
+
+def downgrade():
+    for table in COUNTED_TABLES:
+        for event in ("insert", "update", "delete", "truncate"):
+            op.execute(f'DROP TRIGGER dashboard_count_{event} ON "{table}"')
+    op.execute("DROP FUNCTION dashboard_count_rows()")
+    op.drop_table("dashboard_counters")
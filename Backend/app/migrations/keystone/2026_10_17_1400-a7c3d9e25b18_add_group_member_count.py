@@ -0,0 +1,82 @@
+"""add group member count
+
+Revision ID: a7c3d9e25b18
+Revises: 5f2c8e71a9d3
+Create Date: 2026-10-17 14:00:00.000000+00:00
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a7c3d9e25b18"
+down_revision = "5f2c8e71a9d3"
+branch_labels = None
+depends_on = None
+
+# Statement-level, so replacing a membership updates each group row once
+COUNT_MEMBERS_FUNCTION = """
+CREATE FUNCTION group_count_members() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    deltas text;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE "group" SET member_count = 0 WHERE member_count <> 0;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        deltas := 'SELECT group_id, 1 AS delta FROM new_rows';
+    ELSIF TG_OP = 'DELETE' THEN
+        deltas := 'SELECT group_id, -1 AS delta FROM old_rows';
+    ELSE
+        deltas := 'SELECT group_id, 1 AS delta FROM new_rows '
+            'UNION ALL SELECT group_id, -1 FROM old_rows';
+    END IF;
+
+    EXECUTE format(
+        'UPDATE "group" AS g SET member_count = g.member_count + d.delta '
+        'FROM (SELECT group_id, sum(delta) AS delta FROM (%s) AS r '
+        'GROUP BY group_id HAVING sum(delta) <> 0) AS d '
+        'WHERE g.id = d.group_id',
+        deltas
+    );
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade():
+    op.add_column(
+        "group",
+        sa.Column("member_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(COUNT_MEMBERS_FUNCTION)
+    for event, transition in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        op.execute(
+            f"CREATE TRIGGER group_count_members_{event.lower()} "
+            f"AFTER {event} ON user_groups REFERENCING {transition} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION group_count_members()"
+        )
+    op.execute(
+        "CREATE TRIGGER group_count_members_truncate AFTER TRUNCATE ON user_groups "
+        "FOR EACH STATEMENT EXECUTE FUNCTION group_count_members()"
+    )
+
+    op.execute(
+        'UPDATE "group" AS g SET member_count = m.count '
+        "FROM (SELECT group_id, count(*) AS count FROM user_groups "
+        "GROUP BY group_id) AS m WHERE g.id = m.group_id"
+    )
+
+
+def downgrade():
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER group_count_members_{event} ON user_groups")
+    op.execute("DROP FUNCTION group_count_members()")
+    op.drop_column("group", "member_count")
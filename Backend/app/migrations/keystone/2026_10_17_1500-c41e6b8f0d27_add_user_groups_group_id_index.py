@@ -0,0 +1,34 @@
+"""add user groups group id index
+
+Revision ID: c41e6b8f0d27
+Revises: a7c3d9e25b18
+Create Date: 2026-10-17 15:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c41e6b8f0d27"
+down_revision = "a7c3d9e25b18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The primary key leads with user_id, so listing or diffing the members
+    # of a group scanned every membership
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_groups_group_id_user_id",
+            "user_groups",
+            ["group_id", "user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_user_groups_group_id_user_id", table_name="user_groups", if_exists=True
+    )
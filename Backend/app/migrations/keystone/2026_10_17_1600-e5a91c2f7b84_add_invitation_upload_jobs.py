@@ -0,0 +1,34 @@
+"""add invitation upload jobs
+
+Revision ID: e5a91c2f7b84
+Revises: c41e6b8f0d27
+Create Date: 2026-10-17 16:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e5a91c2f7b84"
+down_revision = "c41e6b8f0d27"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'INVITATION_UPLOAD'")
+        # Uploads check every email against the invitations sent before
+        op.create_index(
+            "ix_invitation_email",
+            "invitation",
+            ["email"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_invitation_email", table_name="invitation", if_exists=True)
+    # Postgres can't drop an enum value, only the jobs using it
+    op.execute("DELETE FROM job WHERE type = 'INVITATION_UPLOAD'")
@@ -0,0 +1,45 @@
+"""add token indexes
+
+Revision ID: 9b3f6d2e8a15
+Revises: e5a91c2f7b84
+Create Date: 2026-10-17 17:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b3f6d2e8a15"
+down_revision = "e5a91c2f7b84"
+branch_labels = None
+depends_on = None
+
+# name: (table, columns, unique)
+INDEXES = {
+    # Public endpoints look invitations and resets up by token
+    "ix_invitation_token": ("invitation", ["token"], True),
+    "ix_password_reset_token": ("password_reset", ["token"], True),
+    "ix_password_reset_user_id_expires_at": (
+        "password_reset",
+        ["user_id", "expires_at"],
+        False,
+    ),
+}
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, (table, columns, unique) in INDEXES.items():
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    for name, (table, _, _) in INDEXES.items():
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,102 @@
+"""create notification counters
+
+Revision ID: 2d7e4a9c1f36
+Revises: 9b3f6d2e8a15
+Create Date: 2026-10-17 18:00:00.000000+00:00
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "2d7e4a9c1f36"
+down_revision = "9b3f6d2e8a15"
+branch_labels = None
+depends_on = None
+
+# Statement-level like the dashboard counters, so marking a user's
+# notifications read adjusts their counter once. Decrements only update
+# existing counters: a user's counter may already be gone when the user's
+# deletion cascades to their notifications. Increments are upserted in
+# user_id order, concurrent fan-outs lock counters in the same order.
+COUNT_UNREAD_FUNCTION = """
+CREATE FUNCTION notification_count_unread() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    deltas text;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE notification_counters SET unread = 0, updated_at = now()
+        WHERE unread <> 0;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        deltas := 'SELECT user_id, 1 AS delta FROM new_rows WHERE NOT is_read';
+    ELSIF TG_OP = 'DELETE' THEN
+        deltas := 'SELECT user_id, -1 AS delta FROM old_rows WHERE NOT is_read';
+    ELSE
+        deltas := 'SELECT user_id, 1 AS delta FROM new_rows WHERE NOT is_read '
+            'UNION ALL SELECT user_id, -1 FROM old_rows WHERE NOT is_read';
+    END IF;
+
+    EXECUTE format(
+        'UPDATE notification_counters AS c '
+        'SET unread = c.unread + d.delta, updated_at = now() '
+        'FROM (SELECT user_id, sum(delta) AS delta FROM (%s) AS r '
+        'GROUP BY user_id HAVING sum(delta) < 0) AS d '
+        'WHERE c.user_id = d.user_id',
+        deltas
+    );
+    EXECUTE format(
+        'INSERT INTO notification_counters AS c (user_id, unread, updated_at) '
+        'SELECT user_id, sum(delta), now() FROM (%s) AS r '
+        'GROUP BY user_id HAVING sum(delta) > 0 ORDER BY user_id '
+        'ON CONFLICT (user_id) DO UPDATE '
+        'SET unread = c.unread + excluded.unread, updated_at = excluded.updated_at',
+        deltas
+    );
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade():
+    op.create_table(
+        "notification_counters",
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("unread", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.execute(COUNT_UNREAD_FUNCTION)
+
+    for event, transition in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        op.execute(
+            f"CREATE TRIGGER notification_count_{event.lower()} "
+            f"AFTER {event} ON notification REFERENCING {transition} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()"
+        )
+    op.execute(
+        "CREATE TRIGGER notification_count_truncate AFTER TRUNCATE ON notification "
+        "FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()"
+    )
+
+    # Start from the current rows
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread, updated_at) "
+        "SELECT user_id, count(*), now() FROM notification WHERE NOT is_read "
+        "GROUP BY user_id"
+    )
+
+
+def downgrade():
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER notification_count_{event} ON notification")
+    op.execute("DROP FUNCTION notification_count_unread()")
+    op.drop_table("notification_counters")
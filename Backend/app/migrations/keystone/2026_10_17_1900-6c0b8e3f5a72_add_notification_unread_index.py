@@ -0,0 +1,38 @@
+"""add notification unread index
+
+Revision ID: 6c0b8e3f5a72
+Revises: 2d7e4a9c1f36
+Create Date: 2026-10-17 19:00:00.000000+00:00
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "6c0b8e3f5a72"
+down_revision = "2d7e4a9c1f36"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only unread rows, the ones listed and marked read, so it stays small
+    # however many read notifications pile up
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_notification_user_id_created_at_unread",
+            "notification",
+            ["user_id", "created_at", "id"],
+            postgresql_where=sa.text("NOT is_read"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_notification_user_id_created_at_unread",
+        table_name="notification",
+        if_exists=True,
+    )
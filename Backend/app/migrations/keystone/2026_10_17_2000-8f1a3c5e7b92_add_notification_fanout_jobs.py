@@ -0,0 +1,25 @@
+"""add notification fanout jobs
+
+Revision ID: 8f1a3c5e7b92
+Revises: 6c0b8e3f5a72
+Create Date: 2026-10-17 20:00:00.000000+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8f1a3c5e7b92"
+down_revision = "6c0b8e3f5a72"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'NOTIFICATION_FANOUT'")
+
+
+def downgrade():
+    # Postgres can't drop an enum value, only the jobs using it
+    op.execute("DELETE FROM job WHERE type = 'NOTIFICATION_FANOUT'")
@@ -0,0 +1,116 @@
+"""create notification messages
+
+Revision ID: 4a7d9e2b6c13
+Revises: 8f1a3c5e7b92
+Create Date: 2026-10-17 21:00:00.000000+00:00
+
+"""
+
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "4a7d9e2b6c13"
+down_revision = "8f1a3c5e7b92"
+branch_labels = None
+depends_on = None
+
+NOTIFICATION_TYPE = postgresql.ENUM(
+    "INFO", "WARNING", "ERROR", name="notificationtype", create_type=False
+)
+NOTIFICATION_CHANNEL = postgresql.ENUM(
+    "EMAIL", "WEB", "SMS", name="notificationchannel", create_type=False
+)
+
+# Rows of a broadcast were inserted by one statement, so they share their
+# creation time as well as their body; those become one message. json has
+# no equality, the metadata is compared as text.
+BACKFILL_MESSAGES = """
+INSERT INTO notification_messages (type, channel, message, meta_data, created_at)
+SELECT type, channel, message, meta_data::json, created_at
+FROM (
+    SELECT DISTINCT type, channel, message, meta_data::text AS meta_data, created_at
+    FROM notification
+) AS bodies
+"""
+
+LINK_MESSAGES = """
+UPDATE notification AS n SET message_id = m.id
+FROM notification_messages AS m
+WHERE n.type = m.type
+    AND n.channel = m.channel
+    AND n.message = m.message
+    AND n.meta_data::text IS NOT DISTINCT FROM m.meta_data::text
+    AND n.created_at = m.created_at
+"""
+
+
+def upgrade():
+    op.create_table(
+        "notification_messages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("type", NOTIFICATION_TYPE, nullable=False),
+        sa.Column("channel", NOTIFICATION_CHANNEL, nullable=False),
+        sa.Column("message", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("meta_data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.add_column("notification", sa.Column("message_id", sa.Integer(), nullable=True))
+
+    op.execute(BACKFILL_MESSAGES)
+    # Read states don't change, no need for the counter trigger to diff
+    # every row of the table
+    op.execute("ALTER TABLE notification DISABLE TRIGGER notification_count_update")
+    op.execute(LINK_MESSAGES)
+    op.execute("ALTER TABLE notification ENABLE TRIGGER notification_count_update")
+
+    op.alter_column("notification", "message_id", nullable=False)
+    op.create_foreign_key(
+        None,
+        "notification",
+        "notification_messages",
+        ["message_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+    op.create_index(op.f("ix_notification_message_id"), "notification", ["message_id"])
+
+    op.drop_index(op.f("ix_notification_updated_at"), table_name="notification")
+    for column in ("type", "channel", "message", "meta_data", "updated_at"):
+        op.drop_column("notification", column)
+    # Dropped columns keep their space until rows are rewritten; run
+    # VACUUM FULL notification (or pg_repack) to reclaim it right away
+
+
+def downgrade():
+    op.add_column("notification", sa.Column("type", NOTIFICATION_TYPE, nullable=True))
+    op.add_column(
+        "notification", sa.Column("channel", NOTIFICATION_CHANNEL, nullable=True)
+    )
+    op.add_column(
+        "notification",
+        sa.Column("message", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column("notification", sa.Column("meta_data", sa.JSON(), nullable=True))
+    op.add_column(
+        "notification",
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+    op.execute("ALTER TABLE notification DISABLE TRIGGER notification_count_update")
+    op.execute(
+        "UPDATE notification AS n SET type = m.type, channel = m.channel, "
+        "message = m.message, meta_data = m.meta_data, updated_at = n.created_at "
+        "FROM notification_messages AS m WHERE m.id = n.message_id"
+    )
+    op.execute("ALTER TABLE notification ENABLE TRIGGER notification_count_update")
+
+    for column in ("type", "channel", "message", "updated_at"):
+        op.alter_column("notification", column, nullable=False)
+    op.create_index(op.f("ix_notification_updated_at"), "notification", ["updated_at"])
+    op.drop_index(op.f("ix_notification_message_id"), table_name="notification")
+    op.drop_column("notification", "message_id")
+    op.drop_table("notification_messages")
@@ -0,0 +1,163 @@
+"""partition notifications by month
+
+Revision ID: 7c2e5b9d1a48
+Revises: 4a7d9e2b6c13
+Create Date: 2026-10-17 22:00:00.000000+00:00
+
+"""
+
+from datetime import date, datetime, timezone
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c2e5b9d1a48"
+down_revision = "4a7d9e2b6c13"
+branch_labels = None
+depends_on = None
+
+# Months created past the current one; maintain_notification_partitions
+# keeps them ahead from then on
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, user_id, is_read, created_at, message_id"
+
+
+def _month(year: int, month: int) -> date:
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def _drop_counter_triggers(table: str) -> None:
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER notification_count_{event} ON {table}")
+
+
+def _create_counter_triggers() -> None:
+    # The function is the one of the counters migration, statement-level
+    # triggers of a partitioned table see the rows of all its partitions
+    for event, transition in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        op.execute(
+            f"CREATE TRIGGER notification_count_{event.lower()} "
+            f"AFTER {event} ON notification REFERENCING {transition} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()"
+        )
+    op.execute(
+        "CREATE TRIGGER notification_count_truncate AFTER TRUNCATE ON notification "
+        "FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()"
+    )
+
+
+def _create_indexes() -> None:
+    op.create_index(op.f("ix_notification_created_at"), "notification", ["created_at"])
+    op.create_index(op.f("ix_notification_message_id"), "notification", ["message_id"])
+    op.create_index(
+        "ix_notification_user_id_created_at_unread",
+        "notification",
+        ["user_id", "created_at", "id"],
+        postgresql_where=sa.text("NOT is_read"),
+    )
+
+
+def _detach_old_table(name: str) -> None:
+    """Rename `notification` and free the names the new table reuses."""
+    op.execute(f"ALTER TABLE notification RENAME TO {name}")
+    _drop_counter_triggers(name)
+    for constraint in (
+        "notification_pkey",
+        "notification_user_id_fkey",
+        "notification_message_id_fkey",
+    ):
+        op.drop_constraint(constraint, name)
+    for index in (
+        "ix_notification_created_at",
+        "ix_notification_message_id",
+        "ix_notification_user_id_created_at_unread",
+    ):
+        op.drop_index(index, table_name=name)
+    # Dropping the old table would drop the sequence it owns
+    op.execute("ALTER SEQUENCE notification_id_seq OWNED BY NONE")
+
+
+def _notification_columns() -> list[sa.Column]:
+    return [
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('notification_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.Uuid(), nullable=False),
+        sa.Column("is_read", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("message_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["message_id"], ["notification_messages.id"], ondelete="CASCADE"
+        ),
+    ]
+
+
+def upgrade():
+    _detach_old_table("notification_unpartitioned")
+
+    # The partition key has to be part of the primary key
+    op.create_table(
+        "notification",
+        *_notification_columns(),
+        sa.PrimaryKeyConstraint("id", "created_at"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    # Catches rows no monthly partition covers yet; the maintenance job
+    # moves them into partitions of their own
+    op.execute("CREATE TABLE notification_default PARTITION OF notification DEFAULT")
+
+    oldest = op.get_bind().scalar(
+        sa.text(
+            "SELECT min(created_at AT TIME ZONE 'UTC') FROM notification_unpartitioned"
+        )
+    )
+    now = datetime.now(timezone.utc)
+    first = oldest or now
+    month = _month(first.year, first.month)
+    last = _month(now.year, now.month + MONTHS_AHEAD)
+    while month <= last:
+        upper = _month(month.year, month.month + 1)
+        op.execute(
+            f"CREATE TABLE notification_p{month:%Y_%m} PARTITION OF notification "
+            f"FOR VALUES FROM ('{month} 00:00+00') TO ('{upper} 00:00+00')"
+        )
+        month = upper
+
+    # Counters already count these rows, the triggers come afterwards
+    op.execute(
+        f"INSERT INTO notification ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM notification_unpartitioned"
+    )
+    op.drop_table("notification_unpartitioned")
+    op.execute("ALTER SEQUENCE notification_id_seq OWNED BY notification.id")
+    _create_indexes()
+    _create_counter_triggers()
+
+
+def downgrade():
+    _detach_old_table("notification_partitioned")
+
+    op.create_table(
+        "notification",
+        *_notification_columns(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute(
+        f"INSERT INTO notification ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM notification_partitioned"
+    )
+    # Drops its partitions along
+    op.drop_table("notification_partitioned")
+    op.execute("ALTER SEQUENCE notification_id_seq OWNED BY notification.id")
+    _create_indexes()
+    _create_counter_triggers()
@@ -0,0 +1,37 @@
+"""create job file chunks
+
+Revision ID: b6d1f4a8c2e9
+Revises: 7c2e5b9d1a48
+Create Date: 2026-10-17 23:00:00.000000+00:00
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b6d1f4a8c2e9"
+down_revision = "7c2e5b9d1a48"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "job_file_chunks",
+        sa.Column("job_id", sa.Uuid(), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["job.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("job_id", "seq"),
+    )
+    # Uploads left on a worker's disk are lost, their jobs can't run anymore
+    op.execute(
+        "UPDATE job SET status = 'FAILED', error = 'Upload file is missing', "
+        "finished_at = now() "
+        "WHERE type = 'INVITATION_UPLOAD' AND status IN ('PENDING', 'RUNNING')"
+    )
+
+
+def downgrade():
+    op.drop_table("job_file_chunks")
@@ -4,9 +4,12 @@ from .user import User  # noqa
 from .invitation import Invitation, InvitationRegistration  # noqa
 from .user_settings import UserSettings  # noqa
 from .group import Group, UserGroup  # noqa
-from .notification import Notification  # noqa
+from .notification import Notification, NotificationMessage  # noqa
 from .password_reset import PasswordReset  # noqa
 from .transaction import Transaction  # noqa
+from .job import Job, JobFileChunk  # noqa
+from .dashboard_counter import DashboardCounter  # noqa
+from .notification_counter import NotificationCounter  # noqa
 
 __all__ = [
     "User",
@@ -16,6 +19,11 @@ __all__ = [
     "Group",
     "UserGroup",
     "Notification",
+    "NotificationMessage",
     "PasswordReset",
     "Transaction",
+    "Job",
+    "JobFileChunk",
+    "DashboardCounter",
+    "NotificationCounter",
 ]
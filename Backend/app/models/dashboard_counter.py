@@ -0,0 +1,23 @@
+from pydantic import AwareDatetime
+from sqlalchemy import BigInteger
+from sqlalchemy.sql import func
+from sqlalchemy.types import DateTime
+from sqlmodel import Field, SQLModel
+
+
+class DashboardCounter(SQLModel, table=True):
+    """
+    Row counts shown on the admin dashboard, e.g. `users.active`.
+
+    Kept current by triggers on the counted tables, see the dashboard
+    counters migration, and reconciled by `reconcile_dashboard_counters`.
+    """
+
+    __tablename__ = "dashboard_counters"
+    name: str = Field(primary_key=True, max_length=100)
+    value: int = Field(default=0, sa_type=BigInteger)
+    updated_at: AwareDatetime = Field(
+        sa_type=DateTime(timezone=True),
+        default=func.now(),
+        nullable=False,
+    )
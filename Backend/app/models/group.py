@@ -2,6 +2,7 @@ import uuid
 from typing import TYPE_CHECKING
 
 from pydantic import AwareDatetime
+from sqlalchemy import Index
 from sqlalchemy.sql import func
 from sqlalchemy.types import DateTime
 from sqlmodel import Field, Relationship, SQLModel
@@ -14,6 +15,8 @@ if TYPE_CHECKING:
 
 class UserGroup(SQLModel, table=True):
     __tablename__ = "user_groups"
+    # The primary key leads with user_id, this serves lookups by group
+    __table_args__ = (Index("ix_user_groups_group_id_user_id", "group_id", "user_id"),)
     user_id: uuid.UUID = Field(
         foreign_key="user.id", primary_key=True, ondelete="CASCADE"
     )
@@ -32,6 +35,8 @@ class Group(SQLModel, TimestampMixin, table=True):
     description: str | None = None
     created_by_user_id: uuid.UUID = Field(foreign_key="user.id")
     is_active: bool = Field(default=True)
+    # Maintained by a trigger on user_groups, see the member count migration
+    member_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
     created_by_user: "User" = Relationship(
         back_populates="created_groups",
@@ -41,3 +46,7 @@ class Group(SQLModel, TimestampMixin, table=True):
         },
     )
     users: list["User"] = Relationship(back_populates="groups", link_model=UserGroup)
+
+    @property
+    def user_count(self) -> int:
+        return self.member_count
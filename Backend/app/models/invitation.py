@@ -25,15 +25,16 @@ class InvitationRegistration(SQLModel, table=True):
         foreign_key="invitation.id", primary_key=True, ondelete="CASCADE"
     )
     user_id: uuid.UUID = Field(
-        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE", index=True
     )
 
 
 class Invitation(SQLModel, TimestampMixin, table=True):
     id: int = Field(default=None, primary_key=True)
     type: InvitationType = Field(default=InvitationType.EMAIL)
-    token: uuid.UUID = Field(default_factory=uuid.uuid4)
-    email: EmailStr | None = None
+    token: uuid.UUID = Field(default_factory=uuid.uuid4, unique=True, index=True)
+    # Looked up when deduplicating new invitations
+    email: EmailStr | None = Field(default=None, index=True)
     created_by_user_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
     user_expiry_date: AwareDatetime | None = Field(
         default=None, sa_type=DateTime(timezone=True)
@@ -0,0 +1,72 @@
+import uuid
+from enum import Enum
+
+from pydantic import AwareDatetime
+from sqlalchemy import Index, LargeBinary
+from sqlalchemy.types import DateTime
+from sqlmodel import JSON, Column, Field, SQLModel
+
+from app.models.mixins.timestamp_mixin import TimestampMixin
+
+
+class JobType(str, Enum):
+    EXPORT = "export"
+    INVITATION_UPLOAD = "invitation_upload"
+    NOTIFICATION_FANOUT = "notification_fanout"
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    # Completed jobs whose artifact was removed by retention
+    EXPIRED = "expired"
+
+
+class Job(SQLModel, TimestampMixin, table=True):
+    """
+    A unit of background work started from the API.
+
+    Jobs are persisted so their progress survives restarts and can be polled
+    from any worker. `params` holds the validated request, `result` whatever
+    the job produced (e.g. the artifact of an export).
+    """
+
+    # Workers look up jobs to claim and to count by type and status
+    __table_args__ = (Index("ix_job_type_status", "type", "status"),)
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    type: JobType
+    status: JobStatus = Field(default=JobStatus.PENDING)
+    created_by_user_id: uuid.UUID | None = Field(
+        default=None, foreign_key="user.id", ondelete="SET NULL", nullable=True
+    )
+    params: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    result: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    progress: int = 0
+    total: int | None = None
+    error: str | None = None
+    started_at: AwareDatetime | None = Field(
+        default=None, sa_type=DateTime(timezone=True)
+    )
+    finished_at: AwareDatetime | None = Field(
+        default=None, sa_type=DateTime(timezone=True)
+    )
+
+
+class JobFileChunk(SQLModel, table=True):
+    """
+    A piece of a file a job reads or produces, e.g. an upload or an export.
+
+    Files are kept in the database rather than on the disk of the worker
+    that received or wrote them, so any worker can run the job or serve the
+    file. `seq` orders the pieces of a file.
+    """
+
+    __tablename__ = "job_file_chunks"
+    job_id: uuid.UUID = Field(
+        foreign_key="job.id", primary_key=True, ondelete="CASCADE"
+    )
+    seq: int = Field(primary_key=True)
+    data: bytes = Field(sa_type=LargeBinary)
@@ -1,9 +1,12 @@
 import uuid
 from enum import Enum
 
+from pydantic import AwareDatetime
+from sqlalchemy import Index, text
+from sqlalchemy.sql import func
+from sqlalchemy.types import DateTime
 from sqlmodel import JSON, Column, Field, Relationship, SQLModel
 
-from app.models.mixins.timestamp_mixin import TimestampMixin
 from app.models.user import User
 
 
@@ -19,17 +22,85 @@ class NotificationChannel(str, Enum):
     SMS = "sms"
 
 
-class Notification(SQLModel, TimestampMixin, table=True):
+class NotificationMessage(SQLModel, table=True):
+    """
+    The body of a notification, stored once however many users receive it.
+    """
+
+    __tablename__ = "notification_messages"
+
     id: int = Field(default=None, primary_key=True)
     type: NotificationType = Field(default=NotificationType.INFO)
     channel: NotificationChannel = Field(default=NotificationChannel.WEB)
     message: str
     meta_data: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    created_at: AwareDatetime = Field(
+        sa_type=DateTime(timezone=True), default=func.now(), nullable=False
+    )
+
+
+class Notification(SQLModel, table=True):
+    """
+    A user's copy of a notification, carrying only its read state.
+
+    The body is shared through `message_id`, broadcasts store it once.
+    `message`, `type`, `channel` and `meta_data` read through to it, so the
+    notification serializes as before; it is joined into every load.
+
+    The table is partitioned by month of `created_at`, which is therefore
+    part of the primary key; see `maintain_notification_partitions`.
+    """
+
+    # Serves a user's unread listing, newest first, and the mark-read updates
+    __table_args__ = (
+        Index(
+            "ix_notification_user_id_created_at_unread",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_where=text("NOT is_read"),
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # Still generated by the database, the composite key hides that
+    id: int = Field(
+        default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}
+    )
+    message_id: int = Field(
+        foreign_key="notification_messages.id", ondelete="CASCADE", index=True
+    )
     user_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
     is_read: bool = False
+    created_at: AwareDatetime = Field(
+        sa_type=DateTime(timezone=True),
+        default=func.now(),
+        primary_key=True,
+        nullable=False,
+        index=True,
+    )
 
+    body: NotificationMessage = Relationship(
+        sa_relationship_kwargs={"lazy": "joined", "innerjoin": True}
+    )
     user: User = Relationship(back_populates="notifications")
 
+    @property
+    def message(self) -> str:
+        return self.body.message
+
+    @property
+    def type(self) -> NotificationType:
+        return self.body.type
+
+    @property
+    def channel(self) -> NotificationChannel:
+        return self.body.channel
+
+    @property
+    def meta_data(self) -> dict:
+        return self.body.meta_data
+
     @classmethod
     def create(
         cls,
@@ -40,7 +111,7 @@ class Notification(SQLModel, TimestampMixin, table=True):
         meta_data: dict | None = None,
     ) -> list["Notification"]:
         """
-        Create notification(s) for one or multiple users.
+        Create notification(s) for one or multiple users, sharing one body.
 
         Args:
             user_ids: Single user_id or list of user_ids
@@ -59,15 +130,7 @@ class Notification(SQLModel, TimestampMixin, table=True):
         if not isinstance(user_ids, list):
             user_ids = [user_ids]
 
-        notifications = []
-        for user_id in user_ids:
-            notification = cls(
-                user_id=user_id,
-                message=message,
-                type=type,
-                channel=channel,
-                meta_data=meta_data,
-            )
-            notifications.append(notification)
-
-        return notifications
+        body = NotificationMessage(
+            message=message, type=type, channel=channel, meta_data=meta_data
+        )
+        return [cls(user_id=user_id, body=body) for user_id in user_ids]
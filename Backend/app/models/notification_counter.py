@@ -0,0 +1,27 @@
+import uuid
+
+from pydantic import AwareDatetime
+from sqlalchemy import BigInteger
+from sqlalchemy.sql import func
+from sqlalchemy.types import DateTime
+from sqlmodel import Field, SQLModel
+
+
+class NotificationCounter(SQLModel, table=True):
+    """
+    Unread notifications per user.
+
+    Kept current by triggers on `notification`, see the notification
+    counters migration, and reconciled by `reconcile_notification_counters`.
+    """
+
+    __tablename__ = "notification_counters"
+    user_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    unread: int = Field(default=0, sa_type=BigInteger)
+    updated_at: AwareDatetime = Field(
+        sa_type=DateTime(timezone=True),
+        default=func.now(),
+        nullable=False,
+    )
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime, timedelta, timezone
 
 from pydantic import AwareDatetime
-from sqlalchemy import DateTime
+from sqlalchemy import DateTime, Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from app.core.config import config
@@ -12,8 +12,13 @@ from app.models.user import User
 
 class PasswordReset(SQLModel, TimestampMixin, table=True):
     __tablename__ = "password_reset"
+    # Serves the lookup of a user's active reset
+    __table_args__ = (
+        Index("ix_password_reset_user_id_expires_at", "user_id", "expires_at"),
+    )
+
     id: int = Field(default=None, primary_key=True)
-    token: uuid.UUID = Field(default_factory=uuid.uuid4)
+    token: uuid.UUID = Field(default_factory=uuid.uuid4, unique=True, index=True)
     user_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
     expires_at: AwareDatetime = Field(
         sa_type=DateTime(timezone=True),
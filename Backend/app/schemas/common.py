@@ -12,15 +12,29 @@ class BaseFilterParams(SQLModel):
 
 T = TypeVar("T", bound=BaseFilterParams)
 
+CountStrategy = Literal["exact", "cached", "estimated"]
 
-class BaseDataTableRequest(SQLModel, Generic[T]):
-    """Base request body for datatable operations"""
 
-    offset: int = 0
+class CursorPageParams(SQLModel):
+    """Page size and ordering of a keyset paginated list"""
+
     limit: int = Field(default=10, le=100, gt=0)
-    search: str = ""
+    # Pass back the `next_cursor` or `prev_cursor` of a response
+    cursor: str | None = None
     order_by: str = "created_at"
     order: Literal["asc", "desc"] = "desc"
+
+
+class BaseDataTableRequest(CursorPageParams, Generic[T]):
+    """Base request body for datatable operations"""
+
+    offset: int = 0
+    # "cursor" pages by keyset instead of offset, `offset` is then ignored
+    pagination: Literal["offset", "cursor"] = "offset"
+    # "cached" reuses recent totals for the same search and filters, and
+    # "estimated" takes Postgres statistics instead of counting
+    count_mode: CountStrategy = "exact"
+    search: str = ""
     filters: T
 
 
@@ -38,8 +52,30 @@ class Token(SQLModel):
 # Contents of JWT token
 class TokenPayload(SQLModel):
     sub: str | None = None
+    su: bool | None = None  # is_superuser
+    st: str | None = None  # user status
+    ep: int | None = None  # token epoch
+
+    @property
+    def has_claims(self) -> bool:
+        """Whether the token carries the claims needed for stateless checks."""
+        return None not in (self.sub, self.su, self.st, self.ep)
 
 
 class NewPassword(SQLModel):
     token: str
     new_password: str = Field(min_length=8, max_length=40)
+
+
+class TimingSummary(SQLModel):
+    count: int = 0
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+
+
+# Per-worker in-process metrics
+class MetricsSnapshot(SQLModel):
+    counters: dict[str, int] = {}
+    timings: dict[str, TimingSummary] = {}
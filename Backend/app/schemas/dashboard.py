@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlmodel import SQLModel
+
+from app.schemas.invitation import InvitationTypeCount
+from app.schemas.user import UserStatusCount
+
+
+class DashboardSummary(SQLModel):
+    users: UserStatusCount
+    invitations: InvitationTypeCount
+    active_groups: int = 0
+    registered: int = 0
+    # Most recent counter change, None before anything was counted
+    updated_at: datetime | None = None
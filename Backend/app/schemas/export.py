@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime
+from typing import Any, Literal
+
+from sqlmodel import SQLModel
+
+from app.models.job import Job, JobStatus
+
+ExportResource = Literal["users", "groups", "invitations", "transactions"]
+ExportFormat = Literal["csv", "ndjson"]
+
+
+class ExportFilters(SQLModel):
+    """Filters of the group, invitation and transaction exports."""
+
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+
+
+class ExportCreate(SQLModel):
+    resource: ExportResource
+    format: ExportFormat = "csv"
+    # UsersExportParams for users, ExportFilters for everything else
+    filters: dict[str, Any] = {}
+
+
+class ExportRead(SQLModel):
+    id: uuid.UUID
+    resource: ExportResource
+    format: ExportFormat
+    status: JobStatus
+    progress: int
+    total: int | None = None
+    error: str | None = None
+    file_name: str | None = None
+    file_size: int | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    @classmethod
+    def from_job(cls, job: Job) -> "ExportRead":
+        return cls(
+            id=job.id,
+            resource=job.params["resource"],
+            format=job.params["format"],
+            status=job.status,
+            progress=job.progress,
+            total=job.total,
+            error=job.error,
+            file_name=job.result.get("file_name"),
+            file_size=job.result.get("file_size"),
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
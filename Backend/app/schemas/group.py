@@ -1,11 +1,17 @@
 from collections.abc import Sequence
 from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
 from pydantic import BaseModel, Field
 from sqlmodel import SQLModel
 
-from app.schemas.common import BaseDataTableRequest, BaseFilterParams
+from app.schemas.common import (
+    BaseDataTableRequest,
+    BaseFilterParams,
+    CountStrategy,
+    CursorPageParams,
+)
 
 from .user import UserMinimalRead
 
@@ -71,3 +77,28 @@ class GroupsDataTable(BaseModel):
 
     data: Sequence[GroupRead]
     count: int
+    count_strategy: CountStrategy = "exact"
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+class GroupMembersParams(CursorPageParams):
+    """Query parameters of the group members list."""
+
+    search: str = ""
+    # Member ids are read straight from the `(group_id, user_id)` index,
+    # other orders sort the group's members first
+    order_by: Literal["id", "created_at", "first_name", "last_name", "email"] = "id"
+    order: Literal["asc", "desc"] = "asc"
+
+
+class GroupMemberRead(UserMinimalRead):
+    joined_at: datetime
+
+
+class GroupMembersPage(SQLModel):
+    data: list[GroupMemberRead]
+    # All members of the group, regardless of `search`
+    count: int = 0
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
@@ -3,9 +3,11 @@ from typing import Literal
 from uuid import UUID
 
 from pydantic import AwareDatetime, EmailStr, field_validator
-from sqlmodel import Field, SQLModel
+from sqlmodel import SQLModel
 
 from app.models.invitation import InvitationType
+from app.models.job import Job, JobStatus
+from app.schemas.common import BaseDataTableRequest, BaseFilterParams, CountStrategy
 from app.schemas.user import UserMinimalRead
 
 
@@ -68,22 +70,20 @@ class InvitationTokenRead(SQLModel):
 class InvitationsRead(SQLModel):
     data: list[InvitationRead]
     count: int
+    count_strategy: CountStrategy = "exact"
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 
-class InvitationsFilterParams(SQLModel):
+class InvitationsFilterParams(BaseFilterParams):
     type: InvitationType | Literal["all", ""] = "all"
     status: Literal["active", "inactive", "registered", "all", ""] = "all"
     created_by_user_id: UUID | None = None
     created_at: list[datetime | None] = [None, None]
 
 
-class ReadInvitationsRequestBody(SQLModel):
-    offset: int = 0
-    limit: int = Field(default=10, le=100, gt=0)
-    search: str = ""
+class ReadInvitationsRequestBody(BaseDataTableRequest[InvitationsFilterParams]):
     filters: InvitationsFilterParams = InvitationsFilterParams()
-    order_by: str = "created_at"
-    order: Literal["asc", "desc"] = "desc"
 
 
 class InvitationTypeCount(SQLModel):
@@ -93,3 +93,35 @@ class InvitationTypeCount(SQLModel):
     active_total: int = 0
     inactive_total: int = 0
     total: int = 0
+
+
+class InvitationUploadRead(SQLModel):
+    id: UUID
+    status: JobStatus
+    # Rows of the file processed so far, out of `total`
+    progress: int
+    total: int | None = None
+    error: str | None = None
+    created: int = 0
+    existing: int = 0
+    invalid: int = 0
+    emails_queued: int = 0
+    # Line numbers of the first rows that were not valid email addresses
+    invalid_lines: list[int] = []
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    @classmethod
+    def from_job(cls, job: Job) -> "InvitationUploadRead":
+        return cls(
+            id=job.id,
+            status=job.status,
+            progress=job.progress,
+            total=job.total,
+            error=job.error,
+            **job.result,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
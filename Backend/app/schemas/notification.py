@@ -1,9 +1,14 @@
 from datetime import datetime
+from typing import Literal
 from uuid import UUID
 
-from sqlmodel import SQLModel
+from pydantic import model_validator
+from sqlmodel import Field, SQLModel
+from typing_extensions import Self
 
+from app.models.job import Job, JobStatus
 from app.models.notification import NotificationChannel, NotificationType
+from app.schemas.user import UsersFilterParams
 
 
 class NotificationBase(SQLModel):
@@ -35,3 +40,69 @@ class NotificationPublic(NotificationBase):
 class NotificationList(SQLModel):
     data: list[NotificationPublic]
     count: int
+
+
+class UnreadNotificationCount(SQLModel):
+    count: int
+
+
+class NotificationMarkRead(SQLModel):
+    ids: list[int] = Field(min_length=1, max_length=10_000)
+
+
+class NotificationsMarkedRead(SQLModel):
+    success: bool = True
+    # Notifications that were unread
+    count: int
+
+
+class NotificationAudience(SQLModel):
+    """
+    Recipients of a fan-out: the `user_ids`, the members of `group_id`, or
+    the users matching the datatable `search` and `filters`; empty filters
+    select everyone.
+    """
+
+    user_ids: list[UUID] | None = Field(default=None, max_length=100_000)
+    group_id: int | None = None
+    search: str = ""
+    search_mode: Literal["contains", "fulltext"] = "contains"
+    filters: UsersFilterParams | None = None
+
+    @model_validator(mode="after")
+    def _check_selection(self) -> Self:
+        selections = (self.user_ids, self.group_id, self.filters)
+        if sum(selection is not None for selection in selections) != 1:
+            raise ValueError(
+                "Select recipients by either user_ids, group_id or filters"
+            )
+        return self
+
+
+class NotificationFanoutCreate(NotificationBase):
+    audience: NotificationAudience
+
+
+class NotificationFanoutRead(SQLModel):
+    id: UUID
+    status: JobStatus
+    # Notifications created so far, out of `total` recipients
+    progress: int
+    total: int | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    @classmethod
+    def from_job(cls, job: Job) -> "NotificationFanoutRead":
+        return cls(
+            id=job.id,
+            status=job.status,
+            progress=job.progress,
+            total=job.total,
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
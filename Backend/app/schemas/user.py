@@ -3,13 +3,14 @@ from collections.abc import Sequence
 from datetime import datetime
 from typing import Literal
 
-from pydantic import EmailStr, field_validator
+from pydantic import EmailStr, field_validator, model_validator
 from sqlmodel import Field, SQLModel
+from typing_extensions import Self
 
 from app.core.config import config
 from app.models.invitation import InvitationType
 from app.models.user import UserStatus
-from app.schemas.common import BaseDataTableRequest, BaseFilterParams
+from app.schemas.common import BaseDataTableRequest, BaseFilterParams, CountStrategy
 
 
 class UserMinimal(SQLModel):
@@ -113,6 +114,9 @@ class UserDetail(UserPublic):
 class UsersDataTable(SQLModel):
     data: list[UserPublic]
     count: int = 0
+    count_strategy: CountStrategy = "exact"
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 
 class UsersMinimalPublic(SQLModel):
@@ -130,6 +134,35 @@ class UsersFilterParams(BaseFilterParams):
 
 class ReadUsersRequestBody(BaseDataTableRequest[UsersFilterParams]):
     filters: UsersFilterParams = UsersFilterParams()
+    # "fulltext" matches word prefixes and orders results by relevance
+    search_mode: Literal["contains", "fulltext"] = "contains"
+
+
+class UsersExportParams(SQLModel):
+    """Query parameters of the users CSV export, the datatable filters flattened."""
+
+    search: str = ""
+    search_mode: Literal["contains", "fulltext"] = "contains"
+    # Only active users unless asked otherwise, as before filters existed
+    status: UserStatus | Literal["all", ""] = UserStatus.ACTIVE
+    role: Literal["all", "user", "superuser", ""] = ""
+    group: int | Literal["all", ""] = ""
+    exclude_group: int | None = None
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    order_by: str = "created_at"
+    order: Literal["asc", "desc"] = "desc"
+    gzip: bool = False
+
+    @property
+    def filters(self) -> UsersFilterParams:
+        return UsersFilterParams(
+            status=self.status,
+            role=self.role,
+            group=self.group,
+            exclude_group=self.exclude_group,
+            created_at=[self.created_from, self.created_to],
+        )
 
 
 class UserStatusCount(SQLModel):
@@ -154,3 +187,57 @@ class UserStatusUpdate(SQLModel):
 
 class UserStatusResponse(SQLModel):
     status: UserStatus
+
+
+class UserBulkUpdate(SQLModel):
+    """
+    Changes applied by `POST /users/bulk`.
+
+    Users are selected either by `user_ids` or by the datatable `search` and
+    `filters`; empty filters select everyone.
+    """
+
+    user_ids: list[uuid.UUID] | None = Field(default=None, max_length=10_000)
+    search: str = ""
+    search_mode: Literal["contains", "fulltext"] = "contains"
+    filters: UsersFilterParams | None = None
+
+    status: UserStatus | None = None
+    is_superuser: bool | None = None
+    add_to_group: int | None = None
+    remove_from_group: int | None = None
+
+    @field_validator("status")
+    def validate_status(cls, v: UserStatus | None) -> UserStatus | None:
+        if v not in [None, UserStatus.ACTIVE, UserStatus.DEACTIVATED]:
+            raise ValueError("Status must be either active or deactivated")
+        return v
+
+    @model_validator(mode="after")
+    def _check_selection_and_changes(self) -> Self:
+        if (self.user_ids is None) == (self.filters is None):
+            raise ValueError("Select users by either user_ids or filters")
+        if (
+            self.status is None
+            and self.is_superuser is None
+            and (self.add_to_group is None and self.remove_from_group is None)
+        ):
+            raise ValueError("No changes given")
+        if (
+            self.add_to_group is not None
+            and self.add_to_group == self.remove_from_group
+        ):
+            raise ValueError("Cannot add to and remove from the same group")
+        return self
+
+
+class UserBulkUpdateResult(SQLModel):
+    # Users found by the selection; the current user is left out of status
+    # and role changes
+    matched: int = 0
+    updated: int = 0
+    added_to_group: int = 0
+    removed_from_group: int = 0
+    # False when the update stopped part way; the counts are of what was
+    # applied before it did
+    complete: bool = True
@@ -0,0 +1,74 @@
+from sqlalchemy import String, cast, func, literal, select, union_all
+from sqlalchemy.sql import Select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import DashboardCounter, Group, Invitation, InvitationRegistration, User
+from app.schemas.invitation import InvitationTypeCount
+from app.schemas.user import UserStatusCount
+
+
+def counted_rows_query() -> Select:
+    """
+    Count the rows behind every dashboard counter, as `(name, value)` rows.
+
+    Mirrors the counter names the triggers of the dashboard counters
+    migration maintain; counters without rows are left out.
+    """
+    return union_all(
+        select(
+            literal("users.") + func.lower(cast(User.status, String)), func.count()
+        ).group_by(User.status),
+        select(
+            literal("invitations.") + func.lower(cast(Invitation.type, String)),
+            func.count(),
+        ).group_by(Invitation.type),
+        select(literal("registrations"), func.count()).select_from(
+            InvitationRegistration
+        ),
+        select(literal("groups.active"), func.count())
+        .select_from(Group)
+        .where(Group.is_active),
+    )
+
+
+async def read_counters(session: AsyncSession) -> dict[str, int]:
+    result = await session.exec(select(DashboardCounter.name, DashboardCounter.value))
+    return dict(result.all())
+
+
+def user_status_counts(counters: dict[str, int]) -> UserStatusCount:
+    counts = {
+        name.removeprefix("users."): value
+        for name, value in counters.items()
+        if name.startswith("users.")
+    }
+    return UserStatusCount(**counts, total=sum(counts.values()))
+
+
+async def invitation_type_counts(
+    session: AsyncSession, counters: dict[str, int]
+) -> InvitationTypeCount:
+    """
+    Invitation counts by type and state.
+
+    Invitations become inactive by expiring, which no write reports, so the
+    active ones are counted here. They are the few with a future
+    `expires_at`, found through its index.
+    """
+    result = await session.exec(
+        select(Invitation.type, func.count())
+        .where(Invitation.expires_at > func.now())
+        .group_by(Invitation.type)
+    )
+    active = {type.value: count for type, count in result.all()}
+    total = sum(
+        value for name, value in counters.items() if name.startswith("invitations.")
+    )
+    active_total = sum(active.values())
+    return InvitationTypeCount(
+        **active,
+        active_total=active_total,
+        inactive_total=total - active_total,
+        total=total,
+        registered=counters.get("registrations", 0),
+    )
@@ -0,0 +1,150 @@
+import hashlib
+import json
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import ClauseElement, Executable, Table, func, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import Select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.schemas.common import BaseDataTableRequest, CountStrategy
+
+# Request fields that don't change which rows match, left out of cache keys
+_PAGE_FIELDS = {
+    "offset",
+    "limit",
+    "order_by",
+    "order",
+    "pagination",
+    "cursor",
+    "count_mode",
+}
+
+
+class Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON)` of a statement, keeping its bound parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select) -> None:
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def exact_count(session: AsyncSession, query: Select) -> int:
+    count_query = select(func.count()).select_from(query.subquery())
+    return await session.scalar(count_query) or 0
+
+
+def _unfiltered_table(query: Select) -> Table | None:
+    """The only table `query` reads when it has no conditions or joins."""
+    froms = query.get_final_froms()
+    if query.whereclause is None and len(froms) == 1 and isinstance(froms[0], Table):
+        return froms[0]
+    return None
+
+
+async def estimated_count(session: AsyncSession, query: Select) -> int:
+    """
+    Estimate the rows matched by `query` without executing it.
+
+    An unfiltered query over one table returns the row count the last
+    VACUUM/ANALYZE stored in pg_class. Otherwise, or when the table was
+    never analyzed, the planner's row estimate for `query` is returned.
+    Both can be off by a wide margin on skewed filters.
+    """
+    table = _unfiltered_table(query)
+    if table is not None:
+        reltuples = await session.scalar(
+            text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)"),
+            params={"table": f'"{table.name}"'},
+        )
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
+
+    plan = (await session.execute(Explain(query))).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _version_key(scope: str) -> str:
+    return redis_key("count", scope, "version")
+
+
+def _filter_digest(body: BaseDataTableRequest) -> str:
+    """Hash of the fields of `body` that decide which rows match."""
+    data = body.model_dump(mode="json", exclude=_PAGE_FIELDS)
+    # Every datatable search is case-insensitive and splits on whitespace
+    data["search"] = " ".join(body.search.lower().split())
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+async def _cached_count(
+    session: AsyncSession, query: Select, body: BaseDataTableRequest, scope: str
+) -> tuple[int, CountStrategy]:
+    redis = get_redis()
+    try:
+        version = int(await redis.get(_version_key(scope)) or 0)
+        key = redis_key("count", scope, version, _filter_digest(body))
+        cached = await redis.get(key)
+    except REDIS_ERRORS as e:
+        metrics.increment("datatable_count.redis.error")
+        logger.debug(f"Count cache unavailable, counting exactly: {e}")
+        return await exact_count(session, query), "exact"
+
+    if cached is not None:
+        metrics.increment(f"datatable_count.{scope}.hit")
+        return int(cached), "cached"
+
+    metrics.increment(f"datatable_count.{scope}.miss")
+    count = await exact_count(session, query)
+    try:
+        await redis.set(key, count, ex=config.DATATABLE_COUNT_CACHE_TTL_IN_SECONDS)
+    except REDIS_ERRORS as e:
+        metrics.increment("datatable_count.redis.error")
+        logger.debug(f"Failed to cache count: {e}")
+    return count, "exact"
+
+
+async def count_rows(
+    session: AsyncSession,
+    query: Select,
+    body: BaseDataTableRequest,
+    scope: str,
+) -> tuple[int, CountStrategy]:
+    """
+    Count the rows of a datatable query with the strategy requested by `body`.
+
+    Returns the count and the strategy that actually produced it: a cached
+    request falls back to an exact count on a miss or without Redis.
+    `scope` names the cached counts that `invalidate_counts` drops.
+    """
+    if body.count_mode == "estimated":
+        return await estimated_count(session, query), "estimated"
+    if body.count_mode == "cached" and config.CACHE_ENABLED:
+        return await _cached_count(session, query, body, scope)
+    return await exact_count(session, query), "exact"
+
+
+async def invalidate_counts(*scopes: str) -> None:
+    """Drop the cached datatable counts of `scopes` after a write."""
+    if not config.CACHE_ENABLED or not scopes:
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for scope in scopes:
+                pipe.incr(_version_key(scope))
+            await pipe.execute()
+    except REDIS_ERRORS as e:
+        metrics.increment("datatable_count.redis.error")
+        logger.warning(f"Failed to invalidate cached counts of {scopes}: {e}")
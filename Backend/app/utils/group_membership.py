@@ -0,0 +1,219 @@
+import uuid
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from loguru import logger
+from redis.commands.core import AsyncScript
+from sqlalchemy.sql import Select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.models.group import UserGroup
+
+# Redis sets mirroring `user_groups`: one per group holding its member ids and
+# one per user holding their group ids. A set is only complete while it holds
+# the `_LOADED` member, which ids never equal; missing or partial sets are
+# (re)loaded from the database on first use.
+_LOADED = "*"
+# Bumped by every membership write, a load that raced a write is discarded
+_VERSION_KEY = redis_key("membership", "version")
+
+# KEYS: the version key and the set; ARGV: the version read before querying
+# the database, the TTL, then the members including `_LOADED`.
+# Returns 1 when the set was replaced, 0 when a write happened meanwhile.
+LOAD_SET_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+for i = 3, #ARGV, 1000 do
+    redis.call('SADD', KEYS[2], unpack(ARGV, i, math.min(i + 999, #ARGV)))
+end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# KEYS: the version key, then a group set and a user set per change; ARGV:
+# the command, group id and user id of each change. Only complete sets are
+# written, absent ones will be loaded with the change already committed.
+APPLY_CHANGES_SCRIPT = """
+redis.call('INCR', KEYS[1])
+for i = 1, (#KEYS - 1) / 2 do
+    local command, group_id, user_id = ARGV[i * 3 - 2], ARGV[i * 3 - 1], ARGV[i * 3]
+    if redis.call('SISMEMBER', KEYS[i * 2], '*') == 1 then
+        redis.call(command, KEYS[i * 2], user_id)
+    end
+    if redis.call('SISMEMBER', KEYS[i * 2 + 1], '*') == 1 then
+        redis.call(command, KEYS[i * 2 + 1], group_id)
+    end
+end
+return 0
+"""
+
+# Changes sent per script call
+_CHANGES_BATCH_SIZE = 1000
+
+_scripts: dict[str, AsyncScript] = {}
+
+
+def _get_script(source: str) -> AsyncScript:
+    redis = get_redis()
+    script = _scripts.get(source)
+    if script is None or script.registered_client is not redis:
+        script = _scripts[source] = redis.register_script(source)
+    return script
+
+
+def _group_key(group_id: int) -> str:
+    return redis_key("membership", "group", group_id)
+
+
+def _user_key(user_id: uuid.UUID | str) -> str:
+    return redis_key("membership", "user", user_id)
+
+
+def _group_set(group_id: int) -> tuple[str, Select]:
+    query = select(UserGroup.user_id).where(UserGroup.group_id == group_id)
+    return _group_key(group_id), query
+
+
+def _user_set(user_id: uuid.UUID) -> tuple[str, Select]:
+    query = select(UserGroup.group_id).where(UserGroup.user_id == user_id)
+    return _user_key(user_id), query
+
+
+async def _load(session: AsyncSession, key: str, query: Select) -> bool:
+    redis = get_redis()
+    # Read before the query, a write committed after it changes the version
+    version = int(await redis.get(_VERSION_KEY) or 0)
+    ids = (await session.exec(query)).all()
+    loaded = await _get_script(LOAD_SET_SCRIPT)(
+        keys=[_VERSION_KEY, key],
+        args=[
+            version,
+            config.GROUP_MEMBERSHIP_INDEX_TTL_IN_SECONDS,
+            _LOADED,
+            *map(str, ids),
+        ],
+    )
+    if not loaded:
+        metrics.increment("group_membership.load_conflict")
+    return bool(loaded)
+
+
+async def _combine(
+    session: AsyncSession, command: str, sets: Sequence[tuple[str, Select]]
+) -> set[bytes] | None:
+    """
+    Run the set `command` over `sets`, loading the ones not in Redis first.
+
+    Completeness is checked in the same transaction as the command, so a set
+    expiring in between is noticed. None means the index is unavailable.
+    """
+    keys = [key for key, _ in sets]
+    for attempt in range(2):
+        async with get_redis().pipeline(transaction=True) as pipe:
+            for key in keys:
+                pipe.sismember(key, _LOADED)
+            getattr(pipe, command)(keys)
+            *complete, members = await pipe.execute()
+
+        missing = [entry for entry, ok in zip(sets, complete, strict=True) if not ok]
+        if not missing:
+            metrics.increment("group_membership.hit")
+            members.discard(_LOADED.encode())
+            return members
+        if attempt:
+            break
+        metrics.increment("group_membership.miss", len(missing))
+        for key, query in missing:
+            if not await _load(session, key, query):
+                return None
+    return None
+
+
+async def _read(
+    session: AsyncSession, command: str, sets: Sequence[tuple[str, Select]]
+) -> set[bytes] | None:
+    if not config.CACHE_ENABLED:
+        return None
+    try:
+        return await _combine(session, command, sets)
+    except REDIS_ERRORS as e:
+        metrics.increment("group_membership.redis.error")
+        logger.debug(f"Membership index unavailable, querying user_groups: {e}")
+        return None
+
+
+async def group_members(session: AsyncSession, group_id: int) -> set[uuid.UUID] | None:
+    """The ids of the group's members, or None without the index."""
+    members = await _read(session, "sunion", [_group_set(group_id)])
+    return None if members is None else {uuid.UUID(m.decode()) for m in members}
+
+
+async def user_groups(session: AsyncSession, user_id: uuid.UUID) -> set[int] | None:
+    """The ids of the groups the user belongs to, or None without the index."""
+    groups = await _read(session, "sunion", [_user_set(user_id)])
+    return None if groups is None else {int(group) for group in groups}
+
+
+async def common_members(
+    session: AsyncSession, group_ids: Sequence[int]
+) -> set[uuid.UUID] | None:
+    """The ids of the users in every one of `group_ids`, or None without the index."""
+    sets = [_group_set(group_id) for group_id in dict.fromkeys(group_ids)]
+    members = await _read(session, "sinter", sets)
+    return None if members is None else {uuid.UUID(m.decode()) for m in members}
+
+
+async def members_excluding(
+    session: AsyncSession, group_id: int, excluded_group_ids: Sequence[int]
+) -> set[uuid.UUID] | None:
+    """
+    The ids of the group's members in none of `excluded_group_ids`, or None
+    without the index.
+    """
+    sets = [_group_set(group_id), *map(_group_set, excluded_group_ids)]
+    members = await _read(session, "sdiff", sets)
+    return None if members is None else {uuid.UUID(m.decode()) for m in members}
+
+
+async def _apply_changes(changes: Iterable[tuple[str, int, uuid.UUID]]) -> None:
+    if not config.CACHE_ENABLED:
+        return
+    changes = list(changes)
+    try:
+        for start in range(0, len(changes), _CHANGES_BATCH_SIZE):
+            batch = changes[start : start + _CHANGES_BATCH_SIZE]
+            keys: list[str] = [_VERSION_KEY]
+            args: list[Any] = []
+            for command, group_id, user_id in batch:
+                keys += [_group_key(group_id), _user_key(user_id)]
+                args += [command, group_id, str(user_id)]
+            await _get_script(APPLY_CHANGES_SCRIPT)(keys=keys, args=args)
+    except REDIS_ERRORS as e:
+        # Sets missing a write filter wrongly until they expire
+        metrics.increment("group_membership.redis.error")
+        logger.error(f"Failed to update the membership index: {e}")
+
+
+async def record_membership_changes(
+    group_id: int,
+    added: Iterable[uuid.UUID] = (),
+    removed: Iterable[uuid.UUID] = (),
+) -> None:
+    """Mirror committed membership writes of a group into the index."""
+    await _apply_changes(
+        [
+            *(("SADD", group_id, user_id) for user_id in added),
+            *(("SREM", group_id, user_id) for user_id in removed),
+        ]
+    )
+
+
+async def record_user_left_groups(user_id: uuid.UUID, group_ids: Iterable[int]) -> None:
+    """Mirror the committed removal of a user from `group_ids` into the index."""
+    await _apply_changes(("SREM", group_id, user_id) for group_id in group_ids)
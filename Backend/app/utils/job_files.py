@@ -0,0 +1,78 @@
+import uuid
+from collections.abc import AsyncIterator, Callable
+
+from sqlalchemy import delete, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.models.job import JobFileChunk
+from app.utils.csv_export import stream_rows
+from app.utils.sql import any_of
+
+
+class JobFileWriter:
+    """
+    Stores a job's file in `job_file_chunks`, JOB_FILE_CHUNK_SIZE_IN_BYTES
+    per row.
+
+    Rows are inserted through `session` without committing, the caller
+    decides when the file is complete.
+    """
+
+    def __init__(self, session: AsyncSession, job_id: uuid.UUID) -> None:
+        self.session = session
+        self.job_id = job_id
+        self.size = 0
+        self._seq = 0
+        self._buffer = bytearray()
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= config.JOB_FILE_CHUNK_SIZE_IN_BYTES:
+            chunk = self._buffer[: config.JOB_FILE_CHUNK_SIZE_IN_BYTES]
+            del self._buffer[: config.JOB_FILE_CHUNK_SIZE_IN_BYTES]
+            await self._insert(bytes(chunk))
+
+    async def close(self) -> None:
+        """Store what is left of the file."""
+        if self._buffer:
+            await self._insert(bytes(self._buffer))
+            self._buffer.clear()
+
+    async def _insert(self, chunk: bytes) -> None:
+        await self.session.execute(
+            insert(JobFileChunk).values(job_id=self.job_id, seq=self._seq, data=chunk)
+        )
+        self._seq += 1
+
+
+async def read_job_file(
+    job_id: uuid.UUID,
+    session_factory: Callable[[], AsyncSession] | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Yield the file of `job_id` a chunk at a time, nothing if it has none.
+
+    Chunks are read through a server-side cursor in a session opened here,
+    so a streaming response can outlive the request's dependencies.
+    """
+    statement = (
+        select(JobFileChunk.data)
+        .where(JobFileChunk.job_id == job_id)
+        .order_by(JobFileChunk.seq)
+    )
+    async for rows in stream_rows(
+        statement, batch_size=1, session_factory=session_factory
+    ):
+        for row in rows:
+            yield row.data
+
+
+async def delete_job_files(session: AsyncSession, *job_ids: uuid.UUID) -> None:
+    """Delete the files of `job_ids`, without committing."""
+    if job_ids:
+        await session.execute(
+            delete(JobFileChunk).where(any_of(JobFileChunk.job_id, job_ids))
+        )
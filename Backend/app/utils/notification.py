@@ -1,12 +1,24 @@
 import uuid
+from collections.abc import Sequence
+from datetime import datetime
 
 from loguru import logger
+from sqlalchemy import insert, update
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.models.notification import Notification, NotificationChannel, NotificationType
+from app.models.notification import (
+    Notification,
+    NotificationChannel,
+    NotificationMessage,
+    NotificationType,
+)
 from app.models.user import User
 from app.utils.decorators import with_async_db_session
+from app.utils.notification_counter import invalidate_unread_counts
+from app.utils.notification_stream import publish_notifications, publish_read
+from app.utils.sql import any_of
 
 
 @with_async_db_session
@@ -34,20 +46,19 @@ async def create_notification(
         Single Notification object or list of created Notification objects,
         depending on the input type of user_id
     """
+    body = NotificationMessage(
+        message=message, type=type, channel=channel, meta_data=meta_data or {}
+    )
     try:
         # Handle single user_id case
         if isinstance(user_id, uuid.UUID):
             try:
-                notification = Notification(
-                    user_id=user_id,
-                    message=message,
-                    type=type,
-                    channel=channel,
-                    meta_data=meta_data or {},
-                )
+                notification = Notification(user_id=user_id, body=body)
                 session.add(notification)
                 await session.commit()
+                await invalidate_unread_counts(user_id)
                 await session.refresh(notification)
+                await publish_notifications([notification])
                 return notification
             except Exception as e:
                 logger.error(
@@ -59,30 +70,25 @@ async def create_notification(
         # Handle multiple user_ids case
         else:
             try:
-                # Create notification objects
-                notifications = Notification.create(
-                    user_ids=user_id,
-                    message=message,
-                    type=type,
-                    channel=channel,
-                    meta_data=meta_data,
+                if not user_id:
+                    return []
+                # The body once, then one INSERT returning the rows with
+                # their ids, no re-select
+                session.add(body)
+                await session.flush()
+                result = await session.scalars(
+                    insert(Notification).returning(Notification),
+                    [
+                        {"user_id": recipient, "message_id": body.id}
+                        for recipient in user_id
+                    ],
                 )
-
-                # Add to session and commit
-                session.add_all(notifications)
+                notifications = list(result.all())
+                for notification in notifications:
+                    set_committed_value(notification, "body", body)
                 await session.commit()
-
-                # Refresh to get the generated IDs
-                notification_ids = [
-                    notif.id for notif in notifications if notif.id is not None
-                ]
-                if notification_ids:
-                    refreshed = await session.exec(
-                        select(Notification).where(
-                            Notification.id.in_(notification_ids)
-                        )
-                    )
-                    notifications = refreshed.all()
+                await invalidate_unread_counts(*user_id)
+                await publish_notifications(notifications)
 
                 return notifications
             except Exception as e:
@@ -146,3 +152,38 @@ async def send_notification_to_admins(
     except Exception as e:
         logger.error(f"Failed to send notifications to admin users: {str(e)}")
         raise
+
+
+async def mark_notifications_read(
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    *,
+    ids: Sequence[int] | None = None,
+    before: datetime | None = None,
+) -> list[int]:
+    """
+    Mark unread notifications of `user_id` read in a single UPDATE.
+
+    All of them by default, narrowed to `ids` and/or to the ones created
+    before `before`. Ids of other users' notifications are ignored. Returns
+    the ids of the notifications that were unread.
+    """
+    conditions = [Notification.user_id == user_id, ~Notification.is_read]
+    if ids is not None:
+        conditions.append(any_of(Notification.id, ids))
+    if before is not None:
+        conditions.append(Notification.created_at < before)
+
+    result = await session.execute(
+        update(Notification)
+        .where(*conditions)
+        .values(is_read=True)
+        .returning(Notification.id)
+        .execution_options(synchronize_session=False)
+    )
+    marked = list(result.scalars().all())
+    await session.commit()
+    if marked:
+        await invalidate_unread_counts(user_id)
+        await publish_read(user_id, marked)
+    return marked
@@ -0,0 +1,89 @@
+import uuid
+
+from loguru import logger
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.models.notification_counter import NotificationCounter
+
+
+def _key(user_id: uuid.UUID | str) -> str:
+    return redis_key("notification_unread", user_id)
+
+
+# Bumped to drop every cached count at once, e.g. after a fan-out; cached
+# counts are stored as "<epoch>:<count>" and ignored once the epoch moved
+_EPOCH_KEY = redis_key("notification_unread_epoch")
+
+
+async def _read_counter(session: AsyncSession, user_id: uuid.UUID) -> int:
+    unread = await session.scalar(
+        select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id)
+    )
+    return unread or 0
+
+
+async def unread_count(session: AsyncSession, user_id: uuid.UUID) -> int:
+    """
+    The number of unread notifications of `user_id`.
+
+    Served from Redis when CACHE_ENABLED and cached, otherwise from the
+    user's counter, which triggers keep exact.
+    """
+    if not config.CACHE_ENABLED:
+        return await _read_counter(session, user_id)
+
+    redis = get_redis()
+    try:
+        epoch, cached = await redis.mget(_EPOCH_KEY, _key(user_id))
+    except REDIS_ERRORS as e:
+        metrics.increment("notification_counter.redis.error")
+        logger.debug(f"Unread count cache unavailable, reading the counter: {e}")
+        return await _read_counter(session, user_id)
+
+    epoch = (epoch or b"0").decode()
+    if cached is not None:
+        cached_epoch, _, unread = cached.decode().partition(":")
+        if cached_epoch == epoch:
+            metrics.increment("notification_counter.hit")
+            return int(unread)
+
+    metrics.increment("notification_counter.miss")
+    unread = await _read_counter(session, user_id)
+    try:
+        await redis.set(
+            _key(user_id),
+            f"{epoch}:{unread}",
+            ex=config.NOTIFICATION_UNREAD_CACHE_TTL_IN_SECONDS,
+        )
+    except REDIS_ERRORS as e:
+        metrics.increment("notification_counter.redis.error")
+        logger.debug(f"Failed to cache unread count: {e}")
+    return unread
+
+
+async def invalidate_unread_counts(*user_ids: uuid.UUID | str) -> None:
+    """Drop the cached unread counts of `user_ids` after their notifications changed."""
+    if not config.CACHE_ENABLED or not user_ids:
+        return
+
+    try:
+        await get_redis().delete(*(_key(user_id) for user_id in user_ids))
+    except REDIS_ERRORS as e:
+        metrics.increment("notification_counter.redis.error")
+        logger.warning(f"Unread count cache invalidation failed: {e}")
+
+
+async def invalidate_all_unread_counts() -> None:
+    """Drop every cached unread count, for writes touching too many users to list."""
+    if not config.CACHE_ENABLED:
+        return
+
+    try:
+        await get_redis().incr(_EPOCH_KEY)
+    except REDIS_ERRORS as e:
+        metrics.increment("notification_counter.redis.error")
+        logger.warning(f"Unread count cache invalidation failed: {e}")
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import uuid
+from collections import deque
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager, suppress
+from dataclasses import asdict, dataclass
+
+from loguru import logger
+from redis.asyncio.client import PubSub
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.models.notification import Notification
+from app.schemas.notification import NotificationPublic
+from app.utils.decorators import with_async_db_session
+from app.utils.sql import any_of
+
+# Events buffered per stream; a stream falling further behind is closed and
+# its client resumes from the database with Last-Event-ID
+_QUEUE_SIZE = 100
+# Longest a listener waits on Redis before checking whether it should stop
+_LISTEN_TIMEOUT_IN_SECONDS = 1.0
+
+
+class StreamLimitReached(Exception):
+    """The worker already serves NOTIFICATION_STREAM_MAX_CONNECTIONS streams."""
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """A server-sent event; `id` is the notification id, when there is one."""
+
+    event: str
+    data: str
+    id: int | None = None
+
+    def encode(self) -> str:
+        lines = [f"id: {self.id}"] if self.id is not None else []
+        lines += [f"event: {self.event}", f"data: {self.data}"]
+        return "\n".join(lines) + "\n\n"
+
+
+# Put in a stream's queue to end it, e.g. when Redis went away
+_CLOSED = StreamEvent(event="closed", data="")
+
+
+def _channel(user_id: uuid.UUID | str) -> str:
+    return redis_key("notifications", user_id)
+
+
+def _user_id(channel: str) -> uuid.UUID:
+    return uuid.UUID(channel.rpartition(":")[2])
+
+
+# Fan-outs announce the id range of each chunk they commit here, rather than
+# publishing every notification; every worker subscribes to it
+_FANOUT_CHANNEL = redis_key("notifications", "fanout")
+
+
+def _notification_event(notification: Notification) -> StreamEvent:
+    return StreamEvent(
+        event="notification",
+        data=NotificationPublic.model_validate(notification).model_dump_json(),
+        id=notification.id,
+    )
+
+
+class NotificationHub:
+    """
+    Fans the Redis notification channels out to this worker's streams.
+
+    The worker holds one pub/sub connection, subscribed to the channel of
+    every user with an open stream; one listener task reads it and puts the
+    events in the queues of that user's streams.
+    """
+
+    def __init__(self) -> None:
+        self._queues: dict[str, set[asyncio.Queue[StreamEvent]]] = {}
+        self._pubsub: PubSub | None = None
+        self._listener: asyncio.Task | None = None
+        # Serializes SUBSCRIBE/UNSUBSCRIBE on the shared connection
+        self._lock = asyncio.Lock()
+
+    @property
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._queues.values())
+
+    @asynccontextmanager
+    async def subscribe(
+        self, user_id: uuid.UUID
+    ) -> AsyncIterator[asyncio.Queue[StreamEvent]]:
+        """The queue of a new stream of `user_id`, receiving their events."""
+        if self.connections >= config.NOTIFICATION_STREAM_MAX_CONNECTIONS:
+            raise StreamLimitReached
+        channel = _channel(user_id)
+        queue: asyncio.Queue[StreamEvent] = asyncio.Queue(maxsize=_QUEUE_SIZE)
+        self._queues.setdefault(channel, set()).add(queue)
+        metrics.increment("notification_stream.opened")
+        try:
+            async with self._lock:
+                if self._pubsub is None:
+                    self._pubsub = get_redis().pubsub()
+                # A new connection also joins the fan-out channel
+                channels = [channel] if self._listener else [channel, _FANOUT_CHANNEL]
+                try:
+                    await self._pubsub.subscribe(*channels)
+                except REDIS_ERRORS:
+                    # Without a listener nothing else would drop it
+                    if self._listener is None:
+                        self._pubsub = None
+                    raise
+                if self._listener is None:
+                    self._listener = asyncio.create_task(self._listen(self._pubsub))
+            yield queue
+        finally:
+            queues = self._queues.get(channel, set())
+            queues.discard(queue)
+            if not queues:
+                self._queues.pop(channel, None)
+                async with self._lock:
+                    if self._pubsub is not None and channel not in self._queues:
+                        with suppress(*REDIS_ERRORS):
+                            await self._pubsub.unsubscribe(channel)
+            metrics.increment("notification_stream.closed")
+
+    async def _listen(self, pubsub: PubSub) -> None:
+        try:
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=_LISTEN_TIMEOUT_IN_SECONDS
+                )
+                if message is None:
+                    continue
+                channel, data = message["channel"].decode(), json.loads(message["data"])
+                if channel == _FANOUT_CHANNEL:
+                    # Inline, so chunks reach the streams in order
+                    await self._deliver_fanout(**data)
+                else:
+                    self._dispatch(channel, StreamEvent(**data))
+        except REDIS_ERRORS as e:
+            metrics.increment("notification_stream.redis.error")
+            logger.error(f"Notification stream listener failed: {e}")
+        finally:
+            # The next stream opens a new connection; these ones reconnect
+            # and resume from the database
+            if self._pubsub is pubsub:
+                self._pubsub = None
+                self._listener = None
+            self._close_streams()
+            with suppress(*REDIS_ERRORS):
+                await pubsub.reset()
+
+    def _dispatch(self, channel: str, event: StreamEvent) -> None:
+        for queue in list(self._queues.get(channel, ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                metrics.increment("notification_stream.overflow")
+                self._close_stream(queue)
+
+    async def _deliver_fanout(self, first_id: int, last_id: int) -> None:
+        """Queue the notifications of a fan-out chunk for the open streams."""
+        user_ids = [_user_id(channel) for channel in self._queues]
+        if not user_ids:
+            return
+        try:
+            notifications = await _fanout_notifications(first_id, last_id, user_ids)
+        except Exception as e:
+            # The streams' clients see them on their next listing
+            metrics.increment("notification_stream.fanout.error")
+            logger.warning(f"Failed to load fan-out notifications: {e}")
+            return
+        for notification in notifications:
+            self._dispatch(
+                _channel(notification.user_id), _notification_event(notification)
+            )
+
+    @staticmethod
+    def _close_stream(queue: asyncio.Queue[StreamEvent]) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_CLOSED)
+
+    def _close_streams(self) -> None:
+        for queues in self._queues.values():
+            for queue in queues:
+                self._close_stream(queue)
+
+    async def close(self) -> None:
+        """Stop listening and end every stream, e.g. on shutdown."""
+        listener = self._listener
+        if listener is not None:
+            listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await listener
+        self._close_streams()
+
+
+notification_hub = NotificationHub()
+
+
+async def _publish(events: Sequence[tuple[uuid.UUID, StreamEvent]]) -> None:
+    if not config.CACHE_ENABLED or not events:
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for user_id, event in events:
+                pipe.publish(_channel(user_id), json.dumps(asdict(event)))
+            await pipe.execute()
+    except REDIS_ERRORS as e:
+        # Open streams miss the events, polling clients don't
+        metrics.increment("notification_stream.redis.error")
+        logger.warning(f"Failed to publish notification events: {e}")
+
+
+async def publish_notifications(notifications: Sequence[Notification]) -> None:
+    """Push committed notifications to their users' open streams."""
+    await _publish([(n.user_id, _notification_event(n)) for n in notifications])
+
+
+async def publish_read(user_id: uuid.UUID, ids: Sequence[int]) -> None:
+    """Tell the user's open streams that notifications were marked read."""
+    if ids:
+        event = StreamEvent(event="read", data=json.dumps({"ids": list(ids)}))
+        await _publish([(user_id, event)])
+
+
+async def publish_fanout(first_id: int, last_id: int) -> None:
+    """Push the notifications a fan-out committed, `first_id` to `last_id`."""
+    if not config.CACHE_ENABLED:
+        return
+    try:
+        await get_redis().publish(
+            _FANOUT_CHANNEL, json.dumps({"first_id": first_id, "last_id": last_id})
+        )
+    except REDIS_ERRORS as e:
+        metrics.increment("notification_stream.redis.error")
+        logger.warning(f"Failed to publish fan-out notifications: {e}")
+
+
+@with_async_db_session
+async def _fanout_notifications(
+    first_id: int, last_id: int, user_ids: Sequence[uuid.UUID], session: AsyncSession
+) -> Sequence[Notification]:
+    result = await session.exec(
+        select(Notification)
+        .where(
+            any_of(Notification.user_id, user_ids),
+            Notification.id.between(first_id, last_id),
+            ~Notification.is_read,
+        )
+        .order_by(Notification.id)
+    )
+    return result.all()
+
+
+@with_async_db_session
+async def _missed_notifications(
+    user_id: uuid.UUID, last_event_id: int, session: AsyncSession
+) -> Sequence[Notification]:
+    result = await session.exec(
+        select(Notification)
+        .where(
+            Notification.user_id == user_id,
+            Notification.id > last_event_id,
+            ~Notification.is_read,
+        )
+        .order_by(Notification.id)
+        .limit(config.NOTIFICATION_STREAM_RESUME_MAX_EVENTS)
+    )
+    return result.all()
+
+
+async def notification_events(
+    user_id: uuid.UUID, last_event_id: int | None = None
+) -> AsyncIterator[str]:
+    """
+    The server-sent events of a notification stream of `user_id`.
+
+    Resuming after `last_event_id` first replays the unread notifications
+    created since, at most NOTIFICATION_STREAM_RESUME_MAX_EVENTS. A comment
+    is sent after NOTIFICATION_STREAM_HEARTBEAT_IN_SECONDS without events so
+    proxies keep the connection open. Ends when the worker can't deliver
+    events anymore; the client reconnects.
+    """
+    try:
+        async with notification_hub.subscribe(user_id) as queue:
+            yield f"retry: {config.NOTIFICATION_STREAM_RETRY_IN_MILLISECONDS}\n\n"
+
+            # Subscribed first, so notifications committed meanwhile are
+            # either replayed or queued. A notification can also be both
+            # published and in a fan-out's id range; the ones recently sent
+            # are skipped below
+            sent: deque[int] = deque(
+                maxlen=_QUEUE_SIZE + config.NOTIFICATION_STREAM_RESUME_MAX_EVENTS
+            )
+            if last_event_id is not None:
+                for notification in await _missed_notifications(user_id, last_event_id):
+                    sent.append(notification.id)
+                    yield _notification_event(notification).encode()
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), config.NOTIFICATION_STREAM_HEARTBEAT_IN_SECONDS
+                    )
+                except TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is _CLOSED:
+                    return
+                if event.id is not None:
+                    if event.id in sent:
+                        continue
+                    sent.append(event.id)
+                yield event.encode()
+    except StreamLimitReached:
+        # Raced past the endpoint's check; the client retries later
+        metrics.increment("notification_stream.rejected")
+    except REDIS_ERRORS as e:
+        metrics.increment("notification_stream.redis.error")
+        logger.warning(f"Failed to open a notification stream: {e}")
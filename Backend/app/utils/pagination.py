@@ -0,0 +1,188 @@
+import base64
+import binascii
+import json
+import uuid
+from collections.abc import Callable, Sequence
+from datetime import datetime
+from enum import Enum
+from typing import Any, Literal, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy import ColumnElement, tuple_
+from sqlalchemy.sql import Select
+
+from app.schemas.common import CursorPageParams
+
+Row = TypeVar("Row")
+Query = TypeVar("Query", bound=Select)
+
+CursorDirection = Literal["next", "prev"]
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _load_value(column: Any, value: Any) -> Any:
+    """Turn a JSON cursor value back into the Python type of `column`."""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if issubclass(python_type, uuid.UUID | Enum | int):
+        return python_type(value)
+    return value
+
+
+def encode_cursor(
+    order_by: str, order: str, value: Any, id: Any, direction: CursorDirection
+) -> str:
+    payload = {
+        "k": order_by,
+        "o": order,
+        "v": _dump_value(value),
+        "id": _dump_value(id),
+        "d": direction,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(payload, dict) or payload.keys() != {"k", "o", "v", "id", "d"}:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return payload
+
+
+def cursor_column(model: Any, order_by: str, columns: Sequence[str]) -> Any:
+    """
+    Resolve `order_by` to a column of `model` that supports cursor pagination.
+
+    Only non-nullable columns with a matching `(column, id)` index are listed
+    in `columns`; anything else would either scan or skip NULL rows.
+    """
+    if order_by not in columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cursor pagination does not support ordering by {order_by}",
+        )
+    return getattr(model, order_by)
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) pagination over a sort column plus a unique tiebreaker.
+
+    Pages are fetched with a row comparison such as
+    `(created_at, id) < (:created_at, :id)` so every page costs the same as
+    the first one, unlike OFFSET which reads and discards all skipped rows.
+    Cursors are opaque to clients and only valid for the ordering that
+    produced them.
+    """
+
+    def __init__(
+        self,
+        body: CursorPageParams,
+        sort_column: Any,
+        tiebreaker: Any,
+    ) -> None:
+        self.body = body
+        self.sort_column = sort_column
+        self.tiebreaker = tiebreaker
+        self.direction: CursorDirection = "next"
+        self.after: tuple[Any, Any] | None = None
+
+        if body.cursor:
+            payload = decode_cursor(body.cursor)
+            if payload["k"] != body.order_by or payload["o"] != body.order:
+                raise HTTPException(
+                    status_code=400, detail="Cursor does not match the requested order"
+                )
+            try:
+                self.after = (
+                    _load_value(sort_column, payload["v"]),
+                    _load_value(tiebreaker, payload["id"]),
+                )
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            self.direction = "prev" if payload["d"] == "prev" else "next"
+
+    @property
+    def _descending(self) -> bool:
+        # Walking backwards flips the scan direction
+        return (self.body.order == "desc") != (self.direction == "prev")
+
+    def apply(self, query: Query) -> Query:
+        """Add the keyset condition, ordering and limit to `query`."""
+        # A unique sort column is its own tiebreaker
+        unique = self.sort_column is self.tiebreaker
+        if self.after is not None:
+            if unique:
+                key, after = self.sort_column, self.after[1]
+            else:
+                key, after = (
+                    tuple_(self.sort_column, self.tiebreaker),
+                    tuple_(*self.after),
+                )
+            condition: ColumnElement[bool] = (
+                key < after if self._descending else key > after
+            )
+            query = query.where(condition)
+
+        columns = [self.sort_column] if unique else [self.sort_column, self.tiebreaker]
+        if self._descending:
+            query = query.order_by(*(column.desc() for column in columns))
+        else:
+            query = query.order_by(*(column.asc() for column in columns))
+        # One extra row tells whether another page follows
+        return query.limit(self.body.limit + 1)
+
+    def page(
+        self, rows: Sequence[Row], entity: Callable[[Row], Any] = lambda row: row
+    ) -> tuple[list[Row], str | None, str | None]:
+        """
+        Trim the extra row and build the cursors for the fetched `rows`.
+
+        `entity` extracts the model instance from a row when the query selects
+        more than the model itself.
+        """
+        has_more = len(rows) > self.body.limit
+        rows = list(rows[: self.body.limit])
+        if self.direction == "prev":
+            rows.reverse()
+
+        def cursor(row: Row, direction: CursorDirection) -> str:
+            instance = entity(row)
+            return encode_cursor(
+                self.body.order_by,
+                self.body.order,
+                getattr(instance, self.sort_column.key),
+                getattr(instance, self.tiebreaker.key),
+                direction,
+            )
+
+        if not rows:
+            return rows, None, None
+
+        if self.direction == "next":
+            next_cursor = cursor(rows[-1], "next") if has_more else None
+            prev_cursor = cursor(rows[0], "prev") if self.after is not None else None
+        else:
+            next_cursor = cursor(rows[-1], "next")
+            prev_cursor = cursor(rows[0], "prev") if has_more else None
+        return rows, next_cursor, prev_cursor
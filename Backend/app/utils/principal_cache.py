@@ -0,0 +1,141 @@
+import json
+import uuid
+from datetime import datetime
+from typing import Any
+
+from loguru import logger
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.models.user import User, UserStatus
+from app.utils.cache import TTLCache
+from app.utils.user_detail_cache import invalidate_user_details
+
+# User fields needed to authorize a request and to render UserPublic
+PRINCIPAL_FIELDS = (
+    "id",
+    "first_name",
+    "last_name",
+    "email",
+    "status",
+    "is_superuser",
+    "created_at",
+    "updated_at",
+    "last_login",
+)
+DATETIME_FIELDS = ("created_at", "updated_at", "last_login")
+
+_local_cache: TTLCache[str, dict[str, Any]] = TTLCache(
+    maxsize=config.PRINCIPAL_CACHE_LOCAL_MAX_SIZE,
+    ttl=config.PRINCIPAL_CACHE_LOCAL_TTL_IN_SECONDS,
+)
+
+
+def _key(user_id: uuid.UUID | str) -> str:
+    return redis_key("principal", user_id)
+
+
+def _serialize(user: User) -> dict[str, Any]:
+    data = {}
+    for field in PRINCIPAL_FIELDS:
+        value = getattr(user, field)
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, UserStatus):
+            value = value.value
+        data[field] = value
+    return data
+
+
+def _deserialize(data: dict[str, Any]) -> User:
+    """Build a detached User holding only the principal fields."""
+    values = dict(data)
+    values["id"] = uuid.UUID(values["id"])
+    values["status"] = UserStatus(values["status"])
+    for field in DATETIME_FIELDS:
+        if values.get(field):
+            values[field] = datetime.fromisoformat(values[field])
+    return User(**values, email_verification_token=None)
+
+
+async def get_principal(user_id: uuid.UUID | str) -> User | None:
+    """Return the cached principal for `user_id`, or None on a miss."""
+    if not config.PRINCIPAL_CACHE_ENABLED:
+        return None
+
+    key = str(user_id)
+    data = _local_cache.get(key)
+    if data is not None:
+        metrics.increment("principal_cache.local.hit")
+        return _deserialize(data)
+    metrics.increment("principal_cache.local.miss")
+
+    if not config.CACHE_ENABLED:
+        return None
+
+    try:
+        raw = await get_redis().get(_key(key))
+    except REDIS_ERRORS as e:
+        metrics.increment("principal_cache.redis.error")
+        logger.debug(f"Principal cache read failed: {e}")
+        return None
+
+    if raw is None:
+        metrics.increment("principal_cache.redis.miss")
+        return None
+
+    metrics.increment("principal_cache.redis.hit")
+    data = json.loads(raw)
+    _local_cache.set(key, data)
+    return _deserialize(data)
+
+
+async def set_principal(user: User) -> None:
+    if not config.PRINCIPAL_CACHE_ENABLED:
+        return
+
+    data = _serialize(user)
+    _local_cache.set(data["id"], data)
+
+    if not config.CACHE_ENABLED:
+        return
+
+    try:
+        await get_redis().set(
+            _key(data["id"]),
+            json.dumps(data),
+            ex=config.PRINCIPAL_CACHE_TTL_IN_SECONDS,
+        )
+    except REDIS_ERRORS as e:
+        metrics.increment("principal_cache.redis.error")
+        logger.debug(f"Principal cache write failed: {e}")
+
+
+async def invalidate_principals(*user_ids: uuid.UUID | str) -> None:
+    """
+    Drop cached principals after their user rows change.
+
+    Other workers keep their local copy for at most
+    PRINCIPAL_CACHE_LOCAL_TTL_IN_SECONDS.
+    """
+    if not user_ids:
+        return
+
+    for user_id in user_ids:
+        _local_cache.pop(str(user_id))
+    metrics.increment("principal_cache.invalidations", len(user_ids))
+
+    if not config.CACHE_ENABLED:
+        return
+
+    try:
+        await get_redis().delete(*(_key(user_id) for user_id in user_ids))
+    except REDIS_ERRORS as e:
+        metrics.increment("principal_cache.redis.error")
+        logger.warning(f"Principal cache invalidation failed: {e}")
+
+    # User details embed the same row
+    await invalidate_user_details(*user_ids)
@@ -0,0 +1,201 @@
+import hashlib
+import math
+import threading
+import time
+from typing import NamedTuple
+
+from fastapi import HTTPException, Request
+from loguru import logger
+from redis.commands.core import AsyncScript
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.utils.cache import TTLCache
+
+# Token buckets are checked and consumed atomically: when any bucket is empty
+# nothing is consumed and the longest wait is returned, so a rejected request
+# never drains the global bucket on behalf of a single abusive client.
+#
+# KEYS: bucket keys; ARGV: capacity and refill rate per second for each key.
+# Returns the number of seconds to wait (as a string), "0" when allowed.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local levels = {}
+local retry_after = 0
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        retry_after = math.max(retry_after, (1 - tokens) / rate)
+    end
+end
+
+if retry_after > 0 then
+    return tostring(retry_after)
+end
+
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return '0'
+"""
+
+
+class BucketLimit(NamedTuple):
+    capacity: int
+    refill_per_second: float
+
+    @classmethod
+    def per_minute(cls, rate: int, burst: int) -> "BucketLimit":
+        return cls(capacity=burst, refill_per_second=rate / 60)
+
+
+class LocalTokenBuckets:
+    """
+    In-process token buckets used when Redis is unavailable.
+
+    Limits are enforced per worker, so the effective limit is multiplied by
+    the number of workers while Redis is down.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        # Idle buckets expire once they would have refilled completely
+        self._buckets: TTLCache[str, tuple[float, float]] = TTLCache(
+            maxsize=maxsize, ttl=3600
+        )
+        self._lock = threading.Lock()
+
+    def acquire(self, buckets: list[tuple[str, BucketLimit]]) -> float:
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            retry_after = 0.0
+            for key, limit in buckets:
+                tokens, ts = self._buckets.get(key) or (limit.capacity, now)
+                tokens = min(
+                    limit.capacity,
+                    tokens + max(0.0, now - ts) * limit.refill_per_second,
+                )
+                levels.append(tokens)
+                if tokens < 1:
+                    retry_after = max(
+                        retry_after, (1 - tokens) / limit.refill_per_second
+                    )
+
+            if retry_after > 0:
+                return retry_after
+
+            for (key, limit), tokens in zip(buckets, levels, strict=True):
+                self._buckets.set(
+                    key,
+                    (tokens - 1, now),
+                    ttl=limit.capacity / limit.refill_per_second + 1,
+                )
+            return 0.0
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+local_buckets = LocalTokenBuckets(maxsize=config.AUTH_THROTTLE_LOCAL_MAX_SIZE)
+
+_script: AsyncScript | None = None
+
+
+def _get_script() -> AsyncScript:
+    global _script
+    redis = get_redis()
+    if _script is None or _script.registered_client is not redis:
+        _script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
+
+
+async def acquire(buckets: list[tuple[str, BucketLimit]]) -> float:
+    """
+    Take one token from every bucket, or none if any of them is empty.
+
+    Returns 0 when the request is allowed, otherwise the seconds to wait.
+    """
+    if config.CACHE_ENABLED:
+        args: list[float] = []
+        for _, limit in buckets:
+            args.extend(limit)
+        try:
+            result = await _get_script()(
+                keys=[redis_key("rate_limit", key) for key, _ in buckets], args=args
+            )
+            return float(result)
+        except REDIS_ERRORS as e:
+            metrics.increment("rate_limit.redis.error")
+            logger.debug(f"Rate limiter falling back to local buckets: {e}")
+
+    return local_buckets.acquire(buckets)
+
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def _email_digest(email: str) -> str:
+    # Keys carry a digest rather than the address itself
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+
+async def throttle_auth(request: Request, scope: str, email: str | None = None) -> None:
+    """
+    Reject bursts against password endpoints before any bcrypt work runs.
+
+    Applies a per-IP, a per-email (when given) and a global token bucket.
+    Raises a 429 with Retry-After when any of them is empty.
+    """
+    if not config.AUTH_THROTTLE_ENABLED:
+        return
+
+    buckets = [
+        (
+            f"ip:{_client_ip(request)}",
+            BucketLimit.per_minute(
+                config.AUTH_THROTTLE_IP_PER_MINUTE, config.AUTH_THROTTLE_IP_BURST
+            ),
+        ),
+        (
+            "global",
+            BucketLimit(
+                config.AUTH_THROTTLE_GLOBAL_BURST,
+                config.AUTH_THROTTLE_GLOBAL_PER_SECOND,
+            ),
+        ),
+    ]
+    if email:
+        buckets.append(
+            (
+                f"email:{_email_digest(email)}",
+                BucketLimit.per_minute(
+                    config.AUTH_THROTTLE_EMAIL_PER_MINUTE,
+                    config.AUTH_THROTTLE_EMAIL_BURST,
+                ),
+            )
+        )
+
+    retry_after = await acquire(buckets)
+    if retry_after <= 0:
+        metrics.increment(f"rate_limit.{scope}.allowed")
+        return
+
+    metrics.increment(f"rate_limit.{scope}.rejected")
+    raise HTTPException(
+        status_code=429,
+        detail="Too many attempts, please try again later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
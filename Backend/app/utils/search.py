@@ -0,0 +1,69 @@
+import re
+
+from sqlalchemy import ColumnElement, func, literal_column
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.models.user import User
+
+# The expressions below must stay identical to the ones indexed by the
+# `add user search indexes` migration, otherwise Postgres can't use them.
+# Separators are inlined as SQL literals because bound parameters never
+# match an index expression.
+SEARCH_CONFIG = literal_column("'simple'")
+_SPACE = literal_column("' '")
+
+
+def user_search_text() -> ColumnElement[str]:
+    """Names and email as one string, backed by a pg_trgm GIN index."""
+    return User.first_name + _SPACE + User.last_name + _SPACE + User.email
+
+
+def user_search_document() -> ColumnElement:
+    """
+    Full-text document for a user, backed by a GIN index.
+
+    The email is added both whole and split on punctuation so that the local
+    part and the domain can be matched on their own.
+    """
+    email_words = func.translate(
+        User.email, literal_column("'@.-_+'"), literal_column("'     '")
+    )
+    return func.to_tsvector(SEARCH_CONFIG, user_search_text() + _SPACE + email_words)
+
+
+def build_prefix_tsquery(search: str) -> str | None:
+    """
+    Turn free text into a tsquery where every word is a prefix match.
+
+    "jo smi" becomes "jo:* & smi:*". Everything but letters and digits is
+    dropped, so the result is always valid tsquery syntax.
+    """
+    words = re.findall(r"[^\W_]+", search.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def apply_user_search(
+    query: SelectOfScalar[User], search: str, mode: str
+) -> tuple[SelectOfScalar[User], ColumnElement[float] | None]:
+    """
+    Filter `query` by the datatable search string.
+
+    `contains` keeps the substring semantics of the original search, each
+    term has to appear somewhere in the names or email. `fulltext` matches
+    word prefixes and also returns a rank expression to order by.
+    """
+    if mode == "fulltext":
+        tsquery_text = build_prefix_tsquery(search)
+        if tsquery_text is None:
+            return query, None
+        tsquery = func.to_tsquery(SEARCH_CONFIG, tsquery_text)
+        document = user_search_document()
+        query = query.where(document.op("@@")(tsquery))
+        return query, func.ts_rank(document, tsquery)
+
+    text = user_search_text()
+    for term in search.split():
+        query = query.where(text.ilike(f"%{term}%"))
+    return query, None
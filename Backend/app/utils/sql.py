@@ -0,0 +1,24 @@
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import ColumnElement, all_, any_, func, literal
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+def _array(column: ColumnElement, values: Sequence[Any]) -> ColumnElement:
+    return literal(list(values), ARRAY(column.type))
+
+
+def any_of(column: ColumnElement, values: Sequence[Any]) -> ColumnElement[bool]:
+    """`column = ANY(:values)`, a single array parameter however many values."""
+    return column == any_(_array(column, values))
+
+
+def none_of(column: ColumnElement, values: Sequence[Any]) -> ColumnElement[bool]:
+    """`column <> ALL(:values)`, true for every row when `values` is empty."""
+    return column != all_(_array(column, values))
+
+
+def unnest(column: ColumnElement, values: Sequence[Any]) -> Any:
+    """`values` as a one-column table, typed like `column`, with column `value`."""
+    return func.unnest(_array(column, values)).table_valued("value").render_derived()
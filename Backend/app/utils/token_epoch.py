@@ -0,0 +1,137 @@
+import secrets
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from loguru import logger
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.utils.cache import TTLCache
+
+# Per-user values embedded in access tokens as the `ep` claim. Replacing a
+# user's epoch rejects every token issued before. Epochs are random rather
+# than counters, so an epoch lost with Redis (eviction, flush) is never
+# handed out again to tokens issued before the loss.
+_local_cache: TTLCache[str, int] = TTLCache(
+    maxsize=config.PRINCIPAL_CACHE_LOCAL_MAX_SIZE,
+    ttl=config.TOKEN_EPOCH_LOCAL_TTL_IN_SECONDS,
+)
+
+
+class TokenRevocationError(Exception):
+    """The epoch store couldn't be updated, tokens may still be accepted."""
+
+
+def _key(user_id: uuid.UUID | str) -> str:
+    return redis_key("token_epoch", user_id)
+
+
+def _new_epoch() -> int:
+    return secrets.randbits(62)
+
+
+async def get_epoch(user_id: uuid.UUID | str) -> int | None:
+    """
+    Return the current token epoch for `user_id`.
+
+    Returns None when it is unknown, the epoch store is unavailable or holds
+    no epoch for the user, in which case callers must authorize against the
+    database instead of trusting token claims.
+    """
+    if not config.CACHE_ENABLED:
+        return None
+
+    key = str(user_id)
+    epoch = _local_cache.get(key)
+    if epoch is not None:
+        return epoch
+
+    try:
+        raw = await get_redis().get(_key(key))
+    except REDIS_ERRORS as e:
+        metrics.increment("token_epoch.redis.error")
+        logger.debug(f"Token epoch read failed: {e}")
+        return None
+
+    if raw is None:
+        metrics.increment("token_epoch.missing")
+        return None
+    epoch = int(raw)
+    _local_cache.set(key, epoch)
+    return epoch
+
+
+async def issue_epoch(user_id: uuid.UUID | str) -> int | None:
+    """
+    Return the epoch to embed in a new token for `user_id`.
+
+    Stores a new one when the user has none, so tokens are only ever issued
+    with an epoch the store holds. Returns None when the store is
+    unavailable; the token then carries no claims to trust.
+    """
+    if not config.CACHE_ENABLED:
+        return None
+
+    try:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.set(_key(user_id), _new_epoch(), nx=True)
+            pipe.get(_key(user_id))
+            _, raw = await pipe.execute()
+    except REDIS_ERRORS as e:
+        metrics.increment("token_epoch.redis.error")
+        logger.warning(f"Token epoch issue failed: {e}")
+        return None
+    return int(raw)
+
+
+async def revoke_tokens(*user_ids: uuid.UUID | str) -> None:
+    """
+    Replace the token epoch of each user so previously issued tokens are
+    rejected.
+
+    Raises TokenRevocationError when the epoch store can't be updated. Other
+    workers may accept an old token for up to TOKEN_EPOCH_LOCAL_TTL_IN_SECONDS
+    while their local copy expires.
+    """
+    if not user_ids:
+        return
+
+    for user_id in user_ids:
+        _local_cache.pop(str(user_id))
+    metrics.increment("token_epoch.revocations", len(user_ids))
+
+    if not config.CACHE_ENABLED:
+        return
+
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.set(_key(user_id), _new_epoch())
+            await pipe.execute()
+    except REDIS_ERRORS as e:
+        metrics.increment("token_epoch.redis.error")
+        logger.error(f"Token epoch update failed: {e}")
+        raise TokenRevocationError(str(e)) from e
+
+
+@asynccontextmanager
+async def revoking_tokens(*user_ids: uuid.UUID | str) -> AsyncIterator[None]:
+    """
+    Revoke the tokens of `user_ids` around the commit of a change to them.
+
+    Revoking before the commit fails the change when tokens can't be
+    revoked, rather than leaving old claims trusted. Revoking again after it
+    rejects tokens issued while the change was committing, with the old
+    claims; that one is only logged, the change is done by then.
+    """
+    await revoke_tokens(*user_ids)
+    yield
+    try:
+        await revoke_tokens(*user_ids)
+    except TokenRevocationError:
+        logger.warning(
+            f"Tokens issued while committing changes to {len(user_ids)} users "
+            f"may keep their old claims"
+        )
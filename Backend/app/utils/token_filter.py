@@ -0,0 +1,191 @@
+import asyncio
+import time
+import uuid
+from collections.abc import Callable, Iterable
+from datetime import datetime, timezone
+from typing import Literal
+
+from loguru import logger
+from sqlalchemy import func
+from sqlalchemy.sql import Select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.models.invitation import Invitation
+from app.models.password_reset import PasswordReset
+from app.models.user import User
+from app.utils.cache import BloomFilter
+from app.utils.decorators import with_async_db_session
+
+# The public endpoints look tokens up without authentication, so guesses are
+# answered here rather than by Postgres: a per-worker Bloom filter holds the
+# tokens present at its last rebuild, a Redis sorted set the tokens created
+# since (scored by creation time), and short-lived Redis keys the tokens that
+# passed the filter but matched no row.
+TokenKind = Literal["invitation", "password_reset", "email_verification"]
+
+_SOURCES: dict[TokenKind, Callable[[], Select]] = {
+    "invitation": lambda: select(Invitation.token),
+    "password_reset": lambda: select(PasswordReset.token).where(
+        PasswordReset.expires_at > datetime.now(timezone.utc)
+    ),
+    "email_verification": lambda: select(User.email_verification_token).where(
+        User.email_verification_token.is_not(None)
+    ),
+}
+
+# Tokens streamed per round trip while rebuilding
+_REBUILD_CHUNK_SIZE = 10_000
+# Filters are sized for twice the tokens present, leaving room for new ones
+_MIN_CAPACITY = 1024
+
+# Each filter with the wall-clock time its rebuild started
+_filters: dict[TokenKind, tuple[BloomFilter, float]] = {}
+
+
+def _recent_window() -> float:
+    """Seconds tokens stay in the recent set, and filters are trusted."""
+    return config.TOKEN_FILTER_REBUILD_INTERVAL_IN_MINUTES * 60 * 3
+
+
+def _recent_key(kind: TokenKind) -> str:
+    return redis_key("token_filter", kind, "recent")
+
+
+def _missing_key(kind: TokenKind, token: uuid.UUID) -> str:
+    return redis_key("token_filter", kind, "missing", token)
+
+
+def parse_token(token: uuid.UUID | str) -> uuid.UUID | None:
+    if isinstance(token, uuid.UUID):
+        return token
+    try:
+        return uuid.UUID(token)
+    except ValueError:
+        return None
+
+
+def _in_filter(kind: TokenKind, token: uuid.UUID) -> bool | None:
+    """Whether the worker's filter may hold `token`, None when it can't tell."""
+    entry = _filters.get(kind)
+    if entry is None:
+        return None
+    bloom, built_at = entry
+    if time.time() - built_at >= _recent_window():
+        return None
+    return token.bytes in bloom
+
+
+async def might_exist(kind: TokenKind, token: uuid.UUID | str) -> bool:
+    """
+    False when `token` is certainly not a stored token of `kind`, so the
+    lookup can be skipped. True means it has to be looked up.
+    """
+    parsed = parse_token(token)
+    if parsed is None:
+        return False
+    if not config.CACHE_ENABLED:
+        return True
+
+    in_filter = _in_filter(kind, parsed)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.exists(_missing_key(kind, parsed))
+            if in_filter is False:
+                pipe.zscore(_recent_key(kind), str(parsed))
+            missing, *recent = await pipe.execute()
+    except REDIS_ERRORS as e:
+        metrics.increment("token_filter.redis.error")
+        logger.debug(f"Token filter unavailable, querying {kind}: {e}")
+        return True
+
+    if missing:
+        metrics.increment(f"token_filter.{kind}.negative_hit")
+        return False
+    if in_filter is False and recent[0] is None:
+        metrics.increment(f"token_filter.{kind}.rejected")
+        return False
+    return True
+
+
+async def remember_missing(kind: TokenKind, token: uuid.UUID | str) -> None:
+    """Reject `token` without a lookup for TOKEN_NEGATIVE_CACHE_TTL_IN_SECONDS."""
+    parsed = parse_token(token)
+    if parsed is None or not config.CACHE_ENABLED:
+        return
+    try:
+        await get_redis().set(
+            _missing_key(kind, parsed),
+            1,
+            ex=config.TOKEN_NEGATIVE_CACHE_TTL_IN_SECONDS,
+        )
+    except REDIS_ERRORS as e:
+        metrics.increment("token_filter.redis.error")
+        logger.debug(f"Failed to cache missing {kind} token: {e}")
+
+
+async def record_tokens(kind: TokenKind, tokens: Iterable[uuid.UUID]) -> None:
+    """
+    Make committed tokens pass every worker's filter.
+
+    Must be awaited before the tokens are handed out; a token that could not
+    be recorded is rejected by other workers until their next rebuild.
+    """
+    tokens = list(tokens)
+    if not tokens or not config.CACHE_ENABLED:
+        return
+
+    entry = _filters.get(kind)
+    if entry is not None:
+        entry[0].update(token.bytes for token in tokens)
+
+    now = time.time()
+    key = _recent_key(kind)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {str(token): now for token in tokens})
+            pipe.zremrangebyscore(key, "-inf", now - _recent_window())
+            pipe.expire(key, int(_recent_window()))
+            pipe.delete(*(_missing_key(kind, token) for token in tokens))
+            await pipe.execute()
+    except REDIS_ERRORS as e:
+        metrics.increment("token_filter.redis.error")
+        logger.error(f"Failed to record new {kind} tokens: {e}")
+
+
+@with_async_db_session
+async def rebuild_token_filters(session: AsyncSession) -> None:
+    """
+    Rebuild this worker's filters from the database.
+
+    Tokens committed after a rebuild started are covered by the recent set,
+    expired and consumed ones drop out. Filters are only used with Redis.
+    """
+    if not config.CACHE_ENABLED:
+        return
+
+    for kind, source in _SOURCES.items():
+        start = time.perf_counter()
+        built_at = time.time()
+        query = source()
+        count = await session.scalar(select(func.count()).select_from(query.subquery()))
+        bloom = BloomFilter(
+            capacity=max((count or 0) * 2, _MIN_CAPACITY),
+            error_rate=config.TOKEN_FILTER_FALSE_POSITIVE_RATE,
+        )
+        result = await session.stream_scalars(
+            query.execution_options(yield_per=_REBUILD_CHUNK_SIZE)
+        )
+        async for tokens in result.partitions():
+            # Hashing a chunk takes a while, keep it off the event loop
+            await asyncio.to_thread(bloom.update, [token.bytes for token in tokens])
+        await session.commit()
+
+        _filters[kind] = (bloom, built_at)
+        metrics.observe(
+            f"token_filter.{kind}.rebuild.duration", time.perf_counter() - start
+        )
+        logger.debug(f"Rebuilt the {kind} token filter with {count} tokens")
@@ -0,0 +1,111 @@
+import uuid
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.redis import REDIS_ERRORS, get_redis, redis_key
+from app.schemas.user import UserDetail
+
+
+class _CachedUserDetail(BaseModel):
+    detail: UserDetail
+    # Versions of `detail.groups` when it was cached, in the same order
+    group_versions: list[int]
+
+
+def _key(user_id: uuid.UUID | str) -> str:
+    return redis_key("user_detail", user_id)
+
+
+def _group_key(group_id: int) -> str:
+    return redis_key("user_detail", "group_version", group_id)
+
+
+async def _group_versions(detail: UserDetail) -> list[int]:
+    if not detail.groups:
+        return []
+    raw = await get_redis().mget([_group_key(group.id) for group in detail.groups])
+    return [int(version or 0) for version in raw]
+
+
+async def get_cached_user_detail(user_id: uuid.UUID | str) -> UserDetail | None:
+    """
+    Return the cached detail of `user_id`, or None on a miss or without Redis.
+
+    Details that include a group changed since they were cached are misses.
+    """
+    if not config.CACHE_ENABLED:
+        return None
+
+    try:
+        raw = await get_redis().get(_key(user_id))
+        if raw is None:
+            return None
+        try:
+            cached = _CachedUserDetail.model_validate_json(raw)
+        except ValidationError:
+            # Written by a version with a different schema
+            return None
+        if await _group_versions(cached.detail) != cached.group_versions:
+            metrics.increment("user_detail_cache.stale")
+            return None
+    except REDIS_ERRORS as e:
+        metrics.increment("user_detail_cache.redis.error")
+        logger.debug(f"User detail cache read failed: {e}")
+        return None
+    return cached.detail
+
+
+async def cache_user_detail(detail: UserDetail) -> None:
+    if not config.CACHE_ENABLED:
+        return
+
+    try:
+        cached = _CachedUserDetail(
+            detail=detail, group_versions=await _group_versions(detail)
+        )
+        await get_redis().set(
+            _key(detail.id),
+            cached.model_dump_json(),
+            ex=config.USER_DETAIL_CACHE_TTL_IN_SECONDS,
+        )
+    except REDIS_ERRORS as e:
+        metrics.increment("user_detail_cache.redis.error")
+        logger.debug(f"User detail cache write failed: {e}")
+
+
+async def invalidate_user_details(*user_ids: uuid.UUID | str) -> None:
+    """
+    Drop cached user details after something they include changes.
+
+    User rows are covered by `invalidate_principals`, group renames and
+    deletions by `invalidate_group_details`; membership changes have to call
+    this for the users involved.
+    """
+    if not config.CACHE_ENABLED or not user_ids:
+        return
+
+    try:
+        await get_redis().delete(*(_key(user_id) for user_id in user_ids))
+    except REDIS_ERRORS as e:
+        metrics.increment("user_detail_cache.redis.error")
+        logger.warning(f"User detail cache invalidation failed: {e}")
+
+
+async def invalidate_group_details(group_id: int) -> None:
+    """
+    Drop the cached details of every member of `group_id`.
+
+    Bumps the version of the group, whatever its size; details cached with
+    an older one are misses from then on.
+    """
+    if not config.CACHE_ENABLED:
+        return
+
+    try:
+        await get_redis().incr(_group_key(group_id))
+    except REDIS_ERRORS as e:
+        metrics.increment("user_detail_cache.redis.error")
+        logger.warning(f"User detail cache invalidation failed: {e}")
@@ -5,6 +5,7 @@ from rich.console import Console
 from rich.panel import Panel
 
 from cli.app_commands import app_cmd
+from cli.bench_commands import bench_app
 from cli.db_commands import db_app
 from cli.server_commands import server_app
 from cli.user_commands import user_app
@@ -40,6 +41,7 @@ app.add_typer(server_app, name="server", no_args_is_help=True)
 app.add_typer(user_app, name="user", no_args_is_help=True)
 app.add_typer(data_app, name="data", no_args_is_help=True)
 app.add_typer(app_cmd, name="app", no_args_is_help=True)
+app.add_typer(bench_app, name="bench", no_args_is_help=True)
 
 if __name__ == "__main__":
     app()
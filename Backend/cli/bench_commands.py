@@ -0,0 +1,1162 @@
+"""
+Performance benchmark commands.
+
+Benchmarks run against a live server (or the configured database) and print
+latency percentiles so changes can be compared before and after.
+"""
+
+import asyncio
+import csv
+import io
+import resource
+import statistics
+import time
+import uuid
+from collections import Counter
+from typing import Annotated, Any
+
+import httpx
+import typer
+from rich.table import Table
+from sqlalchemy import Connection, NullPool, Select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from sqlmodel import func, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.keystone.utils.user import (
+    USER_EXPORT_FIELDS,
+    build_users_export_query,
+    get_user_detail,
+)
+from app.core.config import config
+from app.core.db import engine
+from app.models import (
+    Group,
+    Invitation,
+    InvitationRegistration,
+    Notification,
+    User,
+    UserGroup,
+)
+from app.schemas.user import (
+    UserDetail,
+    UserGroupRead,
+    UserInvitationRead,
+    UsersExportParams,
+)
+from app.utils.csv_export import stream_csv
+from app.utils.search import apply_user_search
+from app.utils.user_detail_cache import invalidate_user_details
+from cli.common import console
+
+bench_app = typer.Typer(help="Performance benchmark commands")
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percentile / 100 * len(values)) - 1))
+    return values[index]
+
+
+def _latency_row(name: str, samples: list[float], errors: int = 0) -> list[str]:
+    return [
+        name,
+        str(len(samples)),
+        str(errors),
+        f"{_percentile(samples, 50) * 1000:.1f}",
+        f"{_percentile(samples, 95) * 1000:.1f}",
+        f"{_percentile(samples, 99) * 1000:.1f}",
+        f"{(max(samples) if samples else 0) * 1000:.1f}",
+    ]
+
+
+def _latency_table(title: str) -> Table:
+    return Table(
+        "Series",
+        "Requests",
+        "Errors",
+        "p50 (ms)",
+        "p95 (ms)",
+        "p99 (ms)",
+        "max (ms)",
+        title=title,
+    )
+
+
+async def _probe(
+    client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float
+) -> tuple[list[float], int]:
+    """Hit a cheap endpoint repeatedly until `stop` is set."""
+    samples: list[float] = []
+    errors = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 400:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return samples, errors
+
+
+async def _run_login_benchmark(
+    base_url: str,
+    email: str,
+    password: str,
+    concurrency: int,
+    total: int,
+    probe_path: str,
+) -> None:
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        # Idle baseline for the unrelated endpoint
+        idle_stop = asyncio.Event()
+        idle_task = asyncio.create_task(_probe(client, probe_path, idle_stop, 0.02))
+        await asyncio.sleep(2)
+        idle_stop.set()
+        idle_samples, idle_errors = await idle_task
+
+        login_samples: list[float] = []
+        login_errors = 0
+        remaining = total
+        lock = asyncio.Lock()
+
+        async def login_worker() -> None:
+            nonlocal remaining, login_errors
+            while True:
+                async with lock:
+                    if remaining <= 0:
+                        return
+                    remaining -= 1
+                start = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/login/access-token",
+                        data={"username": email, "password": password},
+                    )
+                    if response.status_code != 200:
+                        login_errors += 1
+                except httpx.HTTPError:
+                    login_errors += 1
+                login_samples.append(time.perf_counter() - start)
+
+        load_stop = asyncio.Event()
+        probe_task = asyncio.create_task(_probe(client, probe_path, load_stop, 0.02))
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        load_stop.set()
+        load_samples, load_errors = await probe_task
+
+    table = _latency_table(f"Login load: {total} logins, concurrency {concurrency}")
+    table.add_row(*_latency_row(f"{probe_path} (idle)", idle_samples, idle_errors))
+    table.add_row(*_latency_row("/login/access-token", login_samples, login_errors))
+    table.add_row(
+        *_latency_row(f"{probe_path} (under load)", load_samples, load_errors)
+    )
+    console.print(table)
+    console.print(
+        f"Throughput: [bold]{total / elapsed:.1f}[/] logins/s over {elapsed:.1f}s",
+        end="\n\n",
+    )
+
+
+@bench_app.command("login")
+def bench_login(
+    email: Annotated[str, typer.Option(prompt=True, help="Login email")],
+    password: Annotated[
+        str, typer.Option(prompt=True, hide_input=True, help="Login password")
+    ],
+    base_url: Annotated[
+        str, typer.Option(help="Server base URL")
+    ] = "http://localhost:8000",
+    concurrency: Annotated[int, typer.Option(help="Concurrent logins")] = 20,
+    total: Annotated[int, typer.Option(help="Total login requests")] = 200,
+    probe_path: Annotated[
+        str, typer.Option(help="Unrelated endpoint sampled during the load")
+    ] = "/utils/health-check/",
+) -> None:
+    """
+    Measure login p99 and the p99 of an unrelated endpoint under login load.
+    """
+    asyncio.run(
+        _run_login_benchmark(
+            base_url=base_url,
+            email=email,
+            password=password,
+            concurrency=concurrency,
+            total=total,
+            probe_path=probe_path,
+        )
+    )
+
+
+async def _run_auth_flood_benchmark(
+    base_url: str,
+    email: str | None,
+    rate: float,
+    concurrency: int,
+    duration: float,
+    probe_path: str,
+) -> None:
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        idle_stop = asyncio.Event()
+        idle_task = asyncio.create_task(_probe(client, probe_path, idle_stop, 0.02))
+        await asyncio.sleep(2)
+        idle_stop.set()
+        idle_samples, idle_errors = await idle_task
+
+        statuses: Counter[int] = Counter()
+        rejected_samples: list[float] = []
+        checked_samples: list[float] = []
+        stop = asyncio.Event()
+        in_flight = asyncio.Semaphore(concurrency)
+
+        async def attempt() -> None:
+            # Unknown emails skip bcrypt; a real account makes every attempt
+            # that gets past the throttle pay for a hash check
+            data = {
+                "username": email or f"{uuid.uuid4().hex}@example.com",
+                "password": "wrong-password",
+            }
+            async with in_flight:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/login/access-token", data=data)
+                except httpx.HTTPError:
+                    statuses[0] += 1
+                    return
+            statuses[response.status_code] += 1
+            samples = (
+                rejected_samples if response.status_code == 429 else checked_samples
+            )
+            samples.append(time.perf_counter() - start)
+
+        # Open loop: attempts arrive at a fixed rate however fast the server
+        # answers, like an external attacker would
+        probe_task = asyncio.create_task(_probe(client, probe_path, stop, 0.02))
+        attempts = []
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            attempts.append(asyncio.create_task(attempt()))
+            await asyncio.sleep(1 / rate)
+        stop.set()
+        load_samples, load_errors = await probe_task
+        await asyncio.gather(*attempts)
+
+    table = _latency_table(
+        f"Credential stuffing: {rate:.0f} attempts/s for {duration:.0f}s"
+    )
+    table.add_row(*_latency_row(f"{probe_path} (idle)", idle_samples, idle_errors))
+    table.add_row(*_latency_row("login (throttled, 429)", rejected_samples))
+    table.add_row(*_latency_row("login (password checked)", checked_samples))
+    table.add_row(
+        *_latency_row(f"{probe_path} (under attack)", load_samples, load_errors)
+    )
+    console.print(table)
+    console.print(
+        "Responses: "
+        + ", ".join(f"{code or 'error'}: {n}" for code, n in sorted(statuses.items())),
+        end="\n\n",
+    )
+
+
+@bench_app.command("auth-flood")
+def bench_auth_flood(
+    base_url: Annotated[
+        str, typer.Option(help="Server base URL")
+    ] = "http://localhost:8000",
+    email: Annotated[
+        str | None, typer.Option(help="Existing account to attack (default: random)")
+    ] = None,
+    rate: Annotated[float, typer.Option(help="Login attempts per second")] = 50,
+    concurrency: Annotated[int, typer.Option(help="Max attempts in flight")] = 50,
+    duration: Annotated[float, typer.Option(help="Attack duration in seconds")] = 15,
+    probe_path: Annotated[
+        str, typer.Option(help="Unrelated endpoint sampled during the attack")
+    ] = "/utils/health-check/",
+) -> None:
+    """
+    Flood the login endpoint with bad credentials and compare the p99 of an
+    unrelated endpoint before and during the attack.
+    """
+    asyncio.run(
+        _run_auth_flood_benchmark(
+            base_url=base_url,
+            email=email,
+            rate=rate,
+            concurrency=concurrency,
+            duration=duration,
+            probe_path=probe_path,
+        )
+    )
+
+
+# ==== Database benchmarks ====
+# Synthetic tables live in their own schema and mirror the indexes of the real
+# tables, so queries built by the application run unchanged against them.
+BENCH_SCHEMA = "bench"
+
+FIRST_NAMES = [
+    "james", "mary", "john", "patricia", "robert", "jennifer", "michael",
+    "linda", "william", "elizabeth", "david", "barbara", "richard", "susan",
+    "joseph", "jessica", "thomas", "sarah", "charles", "karen", "christopher",
+    "nancy", "daniel", "lisa", "matthew", "betty", "anthony", "margaret",
+    "mark", "sandra", "donald", "ashley", "steven", "kimberly", "paul",
+    "emily", "andrew", "donna", "joshua", "michelle",
+]  # fmt: skip
+LAST_NAMES = [
+    "smith", "johnson", "williams", "brown", "jones", "garcia", "miller",
+    "davis", "rodriguez", "martinez", "hernandez", "lopez", "gonzalez",
+    "wilson", "anderson", "thomas", "taylor", "moore", "jackson", "martin",
+    "lee", "perez", "thompson", "white", "harris", "sanchez", "clark",
+    "ramirez", "lewis", "robinson", "walker", "young", "allen", "king",
+    "wright", "scott", "torres", "nguyen", "hill", "flores",
+]  # fmt: skip
+# Domains email-validator accepts, synthetic users go through UserDetail
+EMAIL_DOMAINS = [
+    "example.com",
+    "mail.example.org",
+    "corp.example.net",
+    "school.example.edu",
+]
+
+
+def _create_synthetic_users(conn: Connection, rows: int) -> None:
+    """Create `bench."user"` with `rows` users and the indexes of `user`."""
+    conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    conn.exec_driver_sql(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    conn.exec_driver_sql(
+        f'CREATE TABLE {BENCH_SCHEMA}."user" (LIKE public."user" INCLUDING DEFAULTS)'
+    )
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {BENCH_SCHEMA}."user" (
+                id, first_name, last_name, email, hashed_password, status,
+                is_superuser, created_at, updated_at, last_login
+            )
+            SELECT
+                gen_random_uuid(), f, l, f || '.' || l || i || '@' || d, 'x',
+                (ARRAY['ACTIVE', 'ACTIVE', 'ACTIVE', 'DEACTIVATED',
+                       'PENDING_EMAIL_VERIFICATION'])[1 + i % 5]::userstatus,
+                i % 500 = 0,
+                now() - i * interval '1 minute',
+                now(),
+                now() - (i % 1000) * interval '1 hour'
+            FROM generate_series(1, :rows) AS i,
+            LATERAL (
+                SELECT
+                    (CAST(:first AS text[]))[
+                        1 + abs(hashtext(i || 'f')) % cardinality(CAST(:first AS text[]))
+                    ] AS f,
+                    (CAST(:last AS text[]))[
+                        1 + abs(hashtext(i || 'l')) % cardinality(CAST(:last AS text[]))
+                    ] AS l,
+                    (CAST(:domains AS text[]))[
+                        1 + i % cardinality(CAST(:domains AS text[]))
+                    ] AS d
+            ) AS names
+            """
+        ),
+        {
+            "rows": rows,
+            "first": FIRST_NAMES,
+            "last": LAST_NAMES,
+            "domains": EMAIL_DOMAINS,
+        },
+    )
+    _copy_indexes(conn, "user")
+    conn.exec_driver_sql(f'ANALYZE {BENCH_SCHEMA}."user"')
+
+
+def _copy_indexes(conn: Connection, table: str) -> None:
+    """Create the indexes of `public.<table>` on its synthetic copy."""
+    index_definitions = conn.execute(
+        text(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = 'public' AND tablename = :table"
+        ),
+        {"table": table},
+    ).scalars()
+    for definition in index_definitions:
+        # pg_indexes only quotes names that need it, e.g. "user" and "group",
+        # and lists the indexes of partitioned tables ON ONLY them
+        for name in (f'"{table}"', table):
+            for on in (" ON ONLY ", " ON "):
+                definition = definition.replace(
+                    f"{on}public.{name} ", f' ON {BENCH_SCHEMA}."{table}" '
+                )
+        conn.exec_driver_sql(definition)
+
+
+def _collect_indexes(plan: dict[str, Any]) -> set[str]:
+    indexes = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        indexes |= _collect_indexes(child)
+    return indexes
+
+
+def _explain(conn: Connection, statement: Select, repeat: int) -> tuple[float, str]:
+    """Return the median execution time (ms) and the indexes the plan used."""
+    sql = str(
+        statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    timings = []
+    for _ in range(repeat):
+        result = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+        explain = result.scalar()[0]
+        timings.append(explain["Execution Time"])
+    indexes = _collect_indexes(explain["Plan"])
+    return statistics.median(timings), ", ".join(sorted(indexes)) or "seq scan"
+
+
+def _legacy_user_search(search: str) -> Select:
+    """The per-column ILIKE search used by the users datatable before indexing."""
+    query = select(User)
+    for term in search.split():
+        query = query.where(
+            or_(
+                User.first_name.ilike(f"%{term}%"),
+                User.last_name.ilike(f"%{term}%"),
+                User.email.ilike(f"%{term}%"),
+            )
+        )
+    return query
+
+
+@bench_app.command("user-search")
+def bench_user_search(
+    rows: Annotated[int, typer.Option(help="Synthetic users to create")] = 1_000_000,
+    search: Annotated[
+        list[str] | None, typer.Option(help="Search strings to compare")
+    ] = None,
+    repeat: Annotated[int, typer.Option(help="Runs per query")] = 5,
+    keep: Annotated[
+        bool, typer.Option(help="Keep the synthetic schema for later runs")
+    ] = False,
+    reuse: Annotated[
+        bool, typer.Option(help="Reuse an existing synthetic schema")
+    ] = False,
+) -> None:
+    """
+    Compare users datatable search plans on a synthetic user table.
+
+    Uses the `bench` schema of the configured database; real tables are
+    never touched.
+    """
+    searches = search or ["jo", "john smi", "example.com", "zzz"]
+    table = Table(
+        "Mode",
+        "Search",
+        "Matches",
+        "Count (ms)",
+        "Page (ms)",
+        "Indexes used",
+        title=f"User search on {rows:,} synthetic users",
+    )
+
+    with engine.connect() as conn:
+        if not reuse:
+            with console.status(f"Creating {rows:,} synthetic users..."):
+                started = time.perf_counter()
+                _create_synthetic_users(conn, rows)
+                conn.commit()
+            console.print(f"Created in {time.perf_counter() - started:.1f}s")
+
+        conn.exec_driver_sql(f"SET search_path TO {BENCH_SCHEMA}, public")
+        for term in searches:
+            for mode in ("legacy", "contains", "fulltext"):
+                rank = None
+                if mode == "legacy":
+                    query = _legacy_user_search(term)
+                else:
+                    query, rank = apply_user_search(select(User), term, mode)
+
+                count_query = select(func.count()).select_from(query.subquery())
+                matches = conn.execute(count_query).scalar_one()
+                count_ms, indexes = _explain(conn, count_query, repeat)
+                # Same rule as the users datatable
+                if rank is not None and matches <= config.USER_SEARCH_RANK_MAX_ROWS:
+                    query = query.order_by(rank.desc())
+                page_ms, _ = _explain(
+                    conn, query.order_by(User.created_at.desc()).limit(10), repeat
+                )
+                table.add_row(
+                    mode,
+                    term,
+                    f"{matches:,}",
+                    f"{count_ms:.1f}",
+                    f"{page_ms:.1f}",
+                    indexes,
+                )
+
+        if not keep:
+            conn.exec_driver_sql(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE")
+        conn.commit()
+
+    console.print(table)
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and only ever grows
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _stream_export(
+    session_factory: async_sessionmaker[AsyncSession], compress: bool
+) -> tuple[float, float, int]:
+    """Consume the streaming export; returns first-rows and total seconds, bytes."""
+    query = build_users_export_query(UsersExportParams(status="all"))
+    started = time.perf_counter()
+    first_rows = 0.0
+    size = 0
+    chunks = stream_csv(
+        query,
+        header=USER_EXPORT_FIELDS,
+        compress=compress,
+        batch_size=config.USER_EXPORT_BATCH_SIZE,
+        session_factory=session_factory,
+    )
+    async for chunk in chunks:
+        # The first chunk is only the header, the next one carries rows
+        if size and not first_rows:
+            first_rows = time.perf_counter() - started
+        size += len(chunk)
+    return first_rows, time.perf_counter() - started, size
+
+
+async def _legacy_export(session_factory: async_sessionmaker[AsyncSession]) -> int:
+    """The previous export: load every user, then write the whole file."""
+    async with session_factory() as session:
+        users = (
+            await session.scalars(select(User).order_by(User.created_at.desc()))
+        ).all()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(USER_EXPORT_FIELDS)
+        for user in users:
+            writer.writerow([getattr(user, field) for field in USER_EXPORT_FIELDS])
+        return len(buffer.getvalue().encode())
+
+
+async def _run_user_export_benchmark(legacy: bool) -> Table:
+    bench_engine = create_async_engine(
+        config.SQLALCHEMY_DATABASE_URI_ASYNC,
+        poolclass=NullPool,
+        connect_args={"server_settings": {"search_path": f"{BENCH_SCHEMA}, public"}},
+    )
+    session_factory = async_sessionmaker(
+        bench_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    table = Table(
+        "Export",
+        "First rows (ms)",
+        "Total (s)",
+        "Size (MB)",
+        "Peak RSS growth (MB)",
+        title="Users CSV export",
+    )
+    try:
+        # Streaming runs first: peak RSS only grows, so the legacy run has to
+        # come last for both growth figures to be meaningful
+        for compress in (False, True):
+            rss_before = _max_rss_mb()
+            first_rows, total, size = await _stream_export(session_factory, compress)
+            table.add_row(
+                "streaming" + (" (gzip)" if compress else ""),
+                f"{first_rows * 1000:.1f}",
+                f"{total:.1f}",
+                f"{size / 1024 / 1024:.1f}",
+                f"{_max_rss_mb() - rss_before:.1f}",
+            )
+
+        if legacy:
+            rss_before = _max_rss_mb()
+            started = time.perf_counter()
+            size = await _legacy_export(session_factory)
+            total = time.perf_counter() - started
+            # Nothing reached the client before the file was complete
+            table.add_row(
+                "legacy (materialized)",
+                f"{total * 1000:.1f}",
+                f"{total:.1f}",
+                f"{size / 1024 / 1024:.1f}",
+                f"{_max_rss_mb() - rss_before:.1f}",
+            )
+    finally:
+        await bench_engine.dispose()
+    return table
+
+
+@bench_app.command("user-export")
+def bench_user_export(
+    rows: Annotated[int, typer.Option(help="Synthetic users to create")] = 1_000_000,
+    legacy: Annotated[
+        bool, typer.Option(help="Also run the previous materializing export")
+    ] = True,
+    keep: Annotated[
+        bool, typer.Option(help="Keep the synthetic schema for later runs")
+    ] = False,
+    reuse: Annotated[
+        bool, typer.Option(help="Reuse an existing synthetic schema")
+    ] = False,
+) -> None:
+    """
+    Measure time to first rows and memory of the users CSV export.
+
+    Runs the export in-process against the `bench` schema of the configured
+    database; real tables are never touched.
+    """
+    with engine.connect() as conn:
+        if not reuse:
+            with console.status(f"Creating {rows:,} synthetic users..."):
+                started = time.perf_counter()
+                _create_synthetic_users(conn, rows)
+                conn.commit()
+            console.print(f"Created in {time.perf_counter() - started:.1f}s")
+
+    try:
+        table = asyncio.run(_run_user_export_benchmark(legacy))
+    finally:
+        if not keep:
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE")
+                conn.commit()
+
+    console.print(table)
+
+
+def _create_synthetic_memberships(conn: Connection, groups: int) -> None:
+    """
+    Add groups, memberships and invitations for the synthetic users.
+
+    Every user belongs to up to three of `groups` groups, a tenth of which are
+    inactive, and every tenth user registered through an invitation.
+    """
+    for table in ("group", "user_groups", "invitation", "invitation_registrations"):
+        conn.exec_driver_sql(
+            f'CREATE TABLE {BENCH_SCHEMA}."{table}" '
+            f'(LIKE public."{table}" INCLUDING DEFAULTS)'
+        )
+    # Ids are given explicitly so the real sequences are left alone
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {BENCH_SCHEMA}."group" (
+                id, name, description, created_by_user_id, is_active,
+                created_at, updated_at
+            )
+            SELECT i, 'Group ' || i, 'Synthetic group ' || i,
+                   (SELECT id FROM {BENCH_SCHEMA}."user" LIMIT 1),
+                   i % 10 <> 0, now(), now()
+            FROM generate_series(1, :groups) AS i
+            """
+        ),
+        {"groups": groups},
+    )
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {BENCH_SCHEMA}.user_groups (user_id, group_id, created_at)
+            SELECT DISTINCT u.id, 1 + abs(hashtext(u.id::text || k)) % :groups, now()
+            FROM {BENCH_SCHEMA}."user" AS u, generate_series(1, 3) AS k
+            """
+        ),
+        {"groups": groups},
+    )
+    conn.exec_driver_sql(
+        f"""
+        WITH invited AS (
+            SELECT id AS user_id, row_number() OVER () AS invitation_id
+            FROM {BENCH_SCHEMA}."user"
+            TABLESAMPLE SYSTEM (10)
+        ),
+        invitations AS (
+            INSERT INTO {BENCH_SCHEMA}.invitation (
+                id, type, token, created_by_user_id, expires_at,
+                created_at, updated_at
+            )
+            SELECT invitation_id, 'LINK', gen_random_uuid(),
+                   (SELECT id FROM {BENCH_SCHEMA}."user" LIMIT 1),
+                   now() + interval '1 day', now(), now()
+            FROM invited
+        )
+        INSERT INTO {BENCH_SCHEMA}.invitation_registrations (invitation_id, user_id)
+        SELECT invitation_id, user_id FROM invited
+        """
+    )
+    for table in ("group", "user_groups", "invitation", "invitation_registrations"):
+        _copy_indexes(conn, table)
+        conn.exec_driver_sql(f'ANALYZE {BENCH_SCHEMA}."{table}"')
+
+
+async def _legacy_user_detail(
+    session: AsyncSession, user_id: uuid.UUID
+) -> UserDetail | None:
+    """
+    The sequential queries GET /users/{id} made before.
+
+    The invitation creator has to be loaded eagerly, an extra round trip.
+    """
+    user = await session.get(User, user_id)
+    if not user:
+        return None
+    groups = await session.exec(
+        select(Group)
+        .join(UserGroup)
+        .where(UserGroup.user_id == user.id, Group.is_active)
+    )
+    invitation = await session.exec(
+        select(Invitation)
+        .options(selectinload(Invitation.created_by_user))
+        .join(InvitationRegistration)
+        .where(InvitationRegistration.user_id == user.id)
+        .limit(1)
+    )
+    invitation = invitation.first()
+    return UserDetail(
+        id=user.id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email=user.email,
+        status=user.status,
+        is_superuser=user.is_superuser,
+        created_at=user.created_at,
+        groups=[UserGroupRead.model_validate(group) for group in groups],
+        invitation=UserInvitationRead.model_validate(invitation)
+        if invitation
+        else None,
+        is_active=user.is_active,
+        updated_at=user.updated_at,
+        last_login=user.last_login,
+    )
+
+
+async def _run_user_detail_benchmark(lookups: int) -> Table:
+    bench_engine = create_async_engine(
+        config.SQLALCHEMY_DATABASE_URI_ASYNC,
+        connect_args={"server_settings": {"search_path": f"{BENCH_SCHEMA}, public"}},
+    )
+    session_factory = async_sessionmaker(
+        bench_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def loader(session: AsyncSession, user_id: uuid.UUID) -> UserDetail | None:
+        return await get_user_detail(session=session, user_id=user_id)
+
+    series = [
+        ("sequential queries", _legacy_user_detail, False),
+        ("single statement", loader, False),
+    ]
+    if config.CACHE_ENABLED:
+        series.append(("single statement, cached", loader, True))
+
+    table = _latency_table(f"User detail, {lookups:,} lookups of random users")
+    cache_enabled = config.CACHE_ENABLED
+    user_ids: list[uuid.UUID] = []
+    try:
+        async with session_factory() as session:
+            result = await session.exec(
+                select(User.id).order_by(func.random()).limit(lookups)
+            )
+            user_ids = list(result.all())
+
+        for name, load, cached in series:
+            config.CACHE_ENABLED = cached
+            # One pass to warm connections and statement caches (and the cache)
+            for _ in range(2):
+                samples = []
+                for user_id in user_ids:
+                    async with session_factory() as session:
+                        started = time.perf_counter()
+                        await load(session, user_id)
+                        samples.append(time.perf_counter() - started)
+            table.add_row(*_latency_row(name, samples))
+    finally:
+        config.CACHE_ENABLED = cache_enabled
+        if cache_enabled:
+            await invalidate_user_details(*user_ids)
+        await bench_engine.dispose()
+    return table
+
+
+@bench_app.command("user-detail")
+def bench_user_detail(
+    rows: Annotated[int, typer.Option(help="Synthetic users to create")] = 100_000,
+    groups: Annotated[int, typer.Option(help="Synthetic groups to create")] = 1_000,
+    lookups: Annotated[int, typer.Option(help="User details to load")] = 2_000,
+    keep: Annotated[
+        bool, typer.Option(help="Keep the synthetic schema for later runs")
+    ] = False,
+    reuse: Annotated[
+        bool, typer.Option(help="Reuse an existing synthetic schema")
+    ] = False,
+) -> None:
+    """
+    Compare p50/p99 latency of loading GET /users/{id} details.
+
+    Runs the loaders in-process against the `bench` schema of the configured
+    database; real tables are never touched. The cached series only runs
+    with CACHE_ENABLED.
+    """
+    with engine.connect() as conn:
+        if not reuse:
+            with console.status(f"Creating {rows:,} synthetic users..."):
+                started = time.perf_counter()
+                _create_synthetic_users(conn, rows)
+                _create_synthetic_memberships(conn, groups)
+                conn.commit()
+            console.print(f"Created in {time.perf_counter() - started:.1f}s")
+
+    try:
+        table = asyncio.run(_run_user_detail_benchmark(lookups))
+    finally:
+        if not keep:
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE")
+                conn.commit()
+
+    console.print(table)
+
+
+def _create_synthetic_notifications(conn: Connection) -> None:
+    """
+    Create empty copies of `notification_messages`, `notification` and
+    `notification_counters`.
+
+    The notification copy gets the unread counter triggers, their function
+    finds the counters through the search path. Copies with an id get a
+    sequence of their own so the real ones are left alone.
+    """
+    for table in ("notification_messages", "notification", "notification_counters"):
+        conn.exec_driver_sql(
+            f"CREATE TABLE {BENCH_SCHEMA}.{table} "
+            f"(LIKE public.{table} INCLUDING DEFAULTS)"
+        )
+        _copy_indexes(conn, table)
+    for table in ("notification_messages", "notification"):
+        conn.exec_driver_sql(
+            f"CREATE SEQUENCE {BENCH_SCHEMA}.{table}_id_seq "
+            f"OWNED BY {BENCH_SCHEMA}.{table}.id"
+        )
+        conn.exec_driver_sql(
+            f"ALTER TABLE {BENCH_SCHEMA}.{table} ALTER COLUMN id "
+            f"SET DEFAULT nextval('{BENCH_SCHEMA}.{table}_id_seq')"
+        )
+    for event, transition in (
+        ("INSERT", "NEW TABLE AS new_rows"),
+        ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ("DELETE", "OLD TABLE AS old_rows"),
+    ):
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER notification_count_{event.lower()} "
+            f"AFTER {event} ON {BENCH_SCHEMA}.notification "
+            f"REFERENCING {transition} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION notification_count_unread()"
+        )
+
+
+async def _legacy_fanout(
+    session_factory: async_sessionmaker[AsyncSession], recipients: int
+) -> int:
+    """The previous fan-out: ORM objects added, committed and selected again."""
+    async with session_factory() as session:
+        result = await session.exec(select(User.id).limit(recipients))
+        notifications = Notification.create(
+            user_ids=list(result.all()), message="Benchmark"
+        )
+        session.add_all(notifications)
+        await session.commit()
+        ids = [notification.id for notification in notifications]
+        refreshed = await session.exec(
+            select(Notification).where(Notification.id.in_(ids))
+        )
+        return len(refreshed.all())
+
+
+async def _run_notification_fanout_benchmark(legacy_recipients: int) -> Table:
+    # Deferred: jobs bind the app's session factory when imported, and the
+    # test suite imports the CLI before replacing it
+    from app.jobs.notification_fanouts import insert_notification_chunks
+
+    bench_engine = create_async_engine(
+        config.SQLALCHEMY_DATABASE_URI_ASYNC,
+        poolclass=NullPool,
+        connect_args={"server_settings": {"search_path": f"{BENCH_SCHEMA}, public"}},
+    )
+    session_factory = async_sessionmaker(
+        bench_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    table = Table(
+        "Fan-out",
+        "Recipients",
+        "Total (s)",
+        "Rows/s",
+        "Peak RSS growth (MB)",
+        title="Notification fan-out",
+    )
+
+    def add_row(name: str, created: int, total: float, rss_before: float) -> None:
+        table.add_row(
+            name,
+            f"{created:,}",
+            f"{total:.1f}",
+            f"{created / total:,.0f}",
+            f"{_max_rss_mb() - rss_before:.1f}",
+        )
+
+    try:
+        # Chunked inserts run first: peak RSS only grows, so the legacy run
+        # has to come last for both growth figures to be meaningful
+        rss_before = _max_rss_mb()
+        started = time.perf_counter()
+        created = 0
+        async with session_factory() as session:
+            chunks = insert_notification_chunks(
+                session, select(User.id), message="Benchmark"
+            )
+            async for chunk in chunks:
+                await session.commit()
+                created += chunk.created
+        add_row(
+            f"INSERT ... SELECT, {config.NOTIFICATION_FANOUT_CHUNK_SIZE:,} per chunk",
+            created,
+            time.perf_counter() - started,
+            rss_before,
+        )
+
+        if legacy_recipients:
+            rss_before = _max_rss_mb()
+            started = time.perf_counter()
+            created = await _legacy_fanout(session_factory, legacy_recipients)
+            add_row(
+                "ORM add_all + re-select",
+                created,
+                time.perf_counter() - started,
+                rss_before,
+            )
+    finally:
+        await bench_engine.dispose()
+    return table
+
+
+@bench_app.command("notification-fanout")
+def bench_notification_fanout(
+    rows: Annotated[int, typer.Option(help="Synthetic users to notify")] = 1_000_000,
+    legacy_recipients: Annotated[
+        int,
+        typer.Option(
+            help="Users notified through the previous ORM path afterwards, 0 skips it"
+        ),
+    ] = 20_000,
+    keep: Annotated[
+        bool, typer.Option(help="Keep the synthetic schema for later runs")
+    ] = False,
+    reuse: Annotated[
+        bool, typer.Option(help="Reuse an existing synthetic schema")
+    ] = False,
+) -> None:
+    """
+    Measure rows/s of notifying every user with the fan-out's chunked inserts.
+
+    Runs in-process against the `bench` schema of the configured database;
+    real tables are never touched. The previous path re-selects the rows by
+    id in one statement, so keep its recipients under the 32767 parameters
+    a query can take.
+    """
+    with engine.connect() as conn:
+        if reuse:
+            conn.exec_driver_sql(
+                f"TRUNCATE {BENCH_SCHEMA}.notification, "
+                f"{BENCH_SCHEMA}.notification_messages, "
+                f"{BENCH_SCHEMA}.notification_counters"
+            )
+        else:
+            with console.status(f"Creating {rows:,} synthetic users..."):
+                started = time.perf_counter()
+                _create_synthetic_users(conn, rows)
+                _create_synthetic_notifications(conn)
+            console.print(f"Created in {time.perf_counter() - started:.1f}s")
+        conn.commit()
+
+    try:
+        table = asyncio.run(_run_notification_fanout_benchmark(legacy_recipients))
+    finally:
+        if not keep:
+            with engine.connect() as conn:
+                conn.exec_driver_sql(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE")
+                conn.commit()
+
+    console.print(table)
+
+
+# The notification table before bodies were shared: every recipient's row
+# carried the body, and rows had an updated_at of their own
+_LEGACY_NOTIFICATION_DDL = f"""
+CREATE TABLE {BENCH_SCHEMA}.legacy_notification (
+    id serial PRIMARY KEY,
+    type notificationtype NOT NULL,
+    channel notificationchannel NOT NULL,
+    message varchar NOT NULL,
+    meta_data json,
+    user_id uuid NOT NULL,
+    is_read boolean NOT NULL,
+    created_at timestamptz NOT NULL,
+    updated_at timestamptz NOT NULL
+);
+CREATE INDEX ON {BENCH_SCHEMA}.legacy_notification (created_at);
+CREATE INDEX ON {BENCH_SCHEMA}.legacy_notification (updated_at);
+CREATE INDEX ON {BENCH_SCHEMA}.legacy_notification (user_id, created_at, id)
+    WHERE NOT is_read
+"""
+
+# A campaign report notification, bodies differ between broadcasts
+_BENCH_MESSAGE = (
+    "format('Campaign #%s finished: %s calls placed, "
+    "open the report for the outcome of every call.', b, b * 7)"
+)
+_BENCH_META_DATA = (
+    "json_build_object('campaign_id', b, 'link', '/campaigns/' || b || '/report', "
+    "'priority', 'normal')"
+)
+
+
+def _fill_notification_layouts(conn: Connection, rows: int, fanout: int) -> None:
+    """
+    Store `rows` notifications sent `fanout` recipients at a time, in both
+    layouts. A third of them is read, the partial index covers the rest. Ids
+    are explicit, the copies' defaults would draw from the real sequences.
+    """
+    conn.exec_driver_sql(
+        f"TRUNCATE {BENCH_SCHEMA}.legacy_notification, "
+        f"{BENCH_SCHEMA}.notification, {BENCH_SCHEMA}.notification_messages "
+        f"RESTART IDENTITY"
+    )
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {BENCH_SCHEMA}.legacy_notification (
+                type, channel, message, meta_data, user_id, is_read,
+                created_at, updated_at
+            )
+            SELECT 'INFO', 'WEB', {_BENCH_MESSAGE}, {_BENCH_META_DATA},
+                gen_random_uuid(), i % 3 = 0, now(), now()
+            FROM generate_series(0, :rows - 1) AS i,
+            LATERAL (SELECT i / :fanout AS b) AS body
+            """
+        ),
+        {"rows": rows, "fanout": fanout},
+    )
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {BENCH_SCHEMA}.notification_messages (
+                id, type, channel, message, meta_data, created_at
+            )
+            SELECT b + 1, 'INFO', 'WEB', {_BENCH_MESSAGE}, {_BENCH_META_DATA}, now()
+            FROM generate_series(0, (:rows - 1) / :fanout) AS b
+            """
+        ),
+        {"rows": rows, "fanout": fanout},
+    )
+    conn.execute(
+        text(
+            f"""
+            INSERT INTO {BENCH_SCHEMA}.notification (
+                id, message_id, user_id, is_read, created_at
+            )
+            SELECT i + 1, i / :fanout + 1, gen_random_uuid(), i % 3 = 0, now()
+            FROM generate_series(0, :rows - 1) AS i
+            """
+        ),
+        {"rows": rows, "fanout": fanout},
+    )
+    conn.exec_driver_sql(
+        f"ANALYZE {BENCH_SCHEMA}.legacy_notification, "
+        f"{BENCH_SCHEMA}.notification, {BENCH_SCHEMA}.notification_messages"
+    )
+
+
+def _total_size_mb(conn: Connection, *tables: str) -> float:
+    """Heap, TOAST and indexes of `tables`, in MB."""
+    return sum(
+        conn.execute(
+            text("SELECT pg_total_relation_size(CAST(:table AS regclass))"),
+            {"table": f"{BENCH_SCHEMA}.{table}"},
+        ).scalar_one()
+        for table in tables
+    ) / (1024 * 1024)
+
+
+@bench_app.command("notification-storage")
+def bench_notification_storage(
+    rows: Annotated[int, typer.Option(help="Notifications stored per run")] = 1_000_000,
+    fanouts: Annotated[
+        list[int] | None,
+        typer.Option("--fanout", help="Recipients per broadcast, repeatable"),
+    ] = None,
+) -> None:
+    """
+    Compare the disk size of notifications with and without shared bodies.
+
+    For every fan-out size, `rows` notifications are stored in the previous
+    one-row-per-recipient layout and in the `notification_messages` layout;
+    sizes include TOAST and indexes. Runs against the `bench` schema of the
+    configured database, which is dropped afterwards.
+    """
+    fanouts = fanouts or [1, 10, 100, 1_000, 10_000]
+    table = Table(
+        "Recipients per broadcast",
+        "Per-recipient bodies (MB)",
+        "Shared bodies (MB)",
+        "Saved",
+        title=f"Storage of {rows:,} notifications",
+    )
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        conn.exec_driver_sql(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        try:
+            conn.exec_driver_sql(_LEGACY_NOTIFICATION_DDL)
+            for name in ("notification_messages", "notification"):
+                conn.exec_driver_sql(
+                    f"CREATE TABLE {BENCH_SCHEMA}.{name} "
+                    f"(LIKE public.{name} INCLUDING DEFAULTS)"
+                )
+                _copy_indexes(conn, name)
+            conn.commit()
+
+            for fanout in fanouts:
+                with console.status(
+                    f"Storing {rows:,} notifications, {fanout:,} per broadcast..."
+                ):
+                    _fill_notification_layouts(conn, rows, fanout)
+                    conn.commit()
+                legacy = _total_size_mb(conn, "legacy_notification")
+                shared = _total_size_mb(conn, "notification", "notification_messages")
+                table.add_row(
+                    f"{fanout:,}",
+                    f"{legacy:,.1f}",
+                    f"{shared:,.1f}",
+                    f"{1 - shared / legacy:.0%}",
+                )
+        finally:
+            conn.rollback()
+            conn.exec_driver_sql(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE")
+            conn.commit()
+
+    console.print(table)
@@ -26,6 +26,7 @@ from .migration_commands import (
     show_revision,
     upgrade_db,
 )
+from .partition_commands import notification_partitions
 
 # Create the Typer app for database commands
 db_app = typer.Typer(help="Database management commands")
@@ -47,6 +48,11 @@ db_app.command("downgrade", rich_help_panel="Migration Commands")(downgrade_db)
 db_app.command("show-revision", rich_help_panel="Migration Commands")(show_revision)
 db_app.command("migration-status", rich_help_panel="Migration Commands")(show_current)
 
+# Register maintenance commands
+db_app.command("notification-partitions", rich_help_panel="Maintenance Commands")(
+    notification_partitions
+)
+
 # Register backup commands under backup namespace with enhanced options
 backup_app.command("list", help="List available backups")(list_backups)
 backup_app.command("create", help="Create a backup of the database")(db_backup)
@@ -0,0 +1,63 @@
+"""
+Partition maintenance commands.
+"""
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from rich.table import Table
+from sqlalchemy import NullPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import config
+from cli.common import console
+
+if TYPE_CHECKING:
+    from app.jobs.notification_partitions import PartitionMaintenance
+
+
+async def _maintain_notification_partitions() -> "PartitionMaintenance":
+    # Deferred: jobs bind the app's session factory when imported, and the
+    # test suite imports the CLI before replacing it
+    from app.jobs.notification_partitions import maintain_notification_partitions
+
+    engine = create_async_engine(
+        config.SQLALCHEMY_DATABASE_URI_ASYNC, poolclass=NullPool
+    )
+    try:
+        async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+            return await maintain_notification_partitions(session=session)
+    finally:
+        await engine.dispose()
+
+
+def notification_partitions() -> None:
+    """
+    Create upcoming notification partitions and drop expired ones now.
+
+    Runs the job the server runs daily: partitions are created
+    NOTIFICATION_PARTITION_MONTHS_AHEAD months ahead, and months that ended
+    NOTIFICATION_RETENTION_IN_DAYS ago are dropped, their unread
+    notifications moved to the default partition until read.
+    """
+    with console.status("[bold blue]Maintaining notification partitions...[/]"):
+        maintenance = asyncio.run(_maintain_notification_partitions())
+
+    table = Table("Partition", "Action", title="Notification partitions")
+    for action, style, names in (
+        ("created", "green", maintenance.created),
+        ("dropped", "yellow", maintenance.dropped),
+        ("failed, see the log", "red", maintenance.failed),
+    ):
+        for name in names:
+            table.add_row(name, f"[{style}]{action}[/]")
+    if table.row_count:
+        console.print(table)
+    else:
+        console.print("[bold green]✓[/] Notification partitions are up to date")
+    if maintenance.moved or maintenance.purged:
+        console.print(
+            f"Moved {maintenance.moved} unread notifications of dropped months to "
+            f"the default partition, purged {maintenance.purged} read ones from it"
+        )
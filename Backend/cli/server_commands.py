@@ -1,10 +1,13 @@
 import os
+import statistics
 import sys
+import time
 from typing import Annotated
 
 import typer
 import uvicorn
 from dotenv import find_dotenv, set_key
+from passlib.hash import bcrypt
 from pydantic import ValidationError
 from rich.panel import Panel
 from rich.table import Table
@@ -81,6 +84,60 @@ def set_config(
     )
 
 
+@server_app.command("calibrate-bcrypt")
+def calibrate_bcrypt(
+    target_ms: Annotated[
+        float, typer.Option(help="Latency budget for one password check")
+    ] = 50,
+    min_rounds: Annotated[
+        int, typer.Option(help="Lowest cost allowed, whatever the budget")
+    ] = config.BCRYPT_MIN_ROUNDS,
+    max_rounds: Annotated[int, typer.Option(help="Highest cost to try")] = 16,
+    samples: Annotated[int, typer.Option(help="Hashes timed per cost")] = 5,
+    apply: Annotated[
+        bool, typer.Option(help="Save BCRYPT_ROUNDS to .env.local")
+    ] = False,
+) -> None:
+    """
+    Benchmark bcrypt on this host and pick the highest cost within a budget.
+
+    New hashes use the chosen cost. Existing ones are only rehashed on login
+    when below BCRYPT_MIN_ROUNDS, which every host shares, so hosts
+    calibrated to different costs keep each other's hashes.
+    """
+    table = Table("Rounds", "Median (ms)", "Fits budget", title="bcrypt cost")
+    chosen: int | None = None
+
+    for rounds in range(min_rounds, max_rounds + 1):
+        hasher = bcrypt.using(rounds=rounds)
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.hash("calibration-password")
+            timings.append(time.perf_counter() - start)
+        median_ms = statistics.median(timings) * 1000
+        fits = median_ms <= target_ms
+        table.add_row(str(rounds), f"{median_ms:.1f}", "✅" if fits else "❌")
+        if not fits:
+            # Each extra round doubles the cost, so stop at the first miss
+            break
+        chosen = rounds
+
+    console.print(table)
+    if chosen is None:
+        chosen = min_rounds
+        console.print(
+            f"[yellow]Even {min_rounds} rounds exceed the budget on this host.[/]"
+        )
+    console.print(
+        f"Recommended [bold]BCRYPT_ROUNDS={chosen}[/] "
+        f"(currently {config.BCRYPT_ROUNDS}, budget {target_ms:.0f} ms)"
+    )
+
+    if apply and chosen != config.BCRYPT_ROUNDS:
+        set_config("BCRYPT_ROUNDS", str(chosen))
+
+
 @server_app.command("run")
 def run_server(
     host: Annotated[str, typer.Option(help="Host to bind")] = "0.0.0.0",
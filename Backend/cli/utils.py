@@ -4,7 +4,7 @@ from pathlib import Path
 
 from sqlmodel import Session, select
 
-from app.api.keystone.utils.user import get_password_hash
+from app.core.security import get_password_hash
 from app.models.user import User, UserStatus
 
 
@@ -1,31 +1,45 @@
 import random
 from typing import Any
 
-from factory.declarations import LazyFunction
+from factory.declarations import LazyFunction, SubFactory
 from loguru import logger
 
-from app.models.notification import Notification, NotificationChannel, NotificationType
+from app.models.notification import (
+    Notification,
+    NotificationChannel,
+    NotificationMessage,
+    NotificationType,
+)
 from app.models.user import User, UserStatus
 from data_pipeline.decorators import seeder
 from data_pipeline.seeders.sqlmodel_factory import SQLModelFactory
 from data_pipeline.seeders.utils import seed_data
 
 
-class NotificationFactory(SQLModelFactory):
-    """Factory for creating Notification instances with fake data."""
+class NotificationMessageFactory(SQLModelFactory):
+    """Factory for creating NotificationMessage instances with fake data."""
 
     class Meta:
-        model = Notification
+        model = NotificationMessage
 
     message = LazyFunction(lambda: f"Test notification {random.randint(1, 1000)}")
     type = LazyFunction(lambda: random.choice(list(NotificationType)))
     channel = LazyFunction(lambda: random.choice(list(NotificationChannel)))
-    is_read = LazyFunction(lambda: random.choice([True, False]))
     meta_data = LazyFunction(
         lambda: {"test_key": f"test_value_{random.randint(1, 1000)}"}
     )
 
 
+class NotificationFactory(SQLModelFactory):
+    """Factory for creating Notification instances with fake data."""
+
+    class Meta:
+        model = Notification
+
+    body = SubFactory(NotificationMessageFactory)
+    is_read = LazyFunction(lambda: random.choice([True, False]))
+
+
 def seed_notifications(
     count: int = 10,
     attributes: dict[str, Any] | None = None,
@@ -1,14 +1,25 @@
 import uuid
+from collections.abc import Generator
 from datetime import datetime, timedelta, timezone
 
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
 from sqlmodel import Session, select
 
-from app.core.security import get_password_hash, verify_password
+from app.core import redis as core_redis
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.security import (
+    create_access_token,
+    get_password_hash,
+    password_needs_rehash,
+    verify_password,
+)
 from app.models.invitation import Invitation, InvitationRegistration, InvitationType
 from app.models.user import User, UserStatus
+from app.utils import rate_limit, token_epoch
 from data_pipeline.seeders.user_seeder import UserFactory
 
 
@@ -482,6 +493,16 @@ def test_reset_password_invalid_token(unauthorized_client: TestClient):
     assert "Invalid token" in data["detail"]
 
 
+def test_reset_password_malformed_token(unauthorized_client: TestClient):
+    """Test that a token that isn't a UUID is rejected without a lookup."""
+    response = unauthorized_client.post(
+        "/reset-password",
+        json={"token": "not-a-token", "new_password": "newpassword123"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Invalid token"
+
+
 def test_reset_password_expired_token(
     unauthorized_client: TestClient,
     test_db: Session,
@@ -763,3 +784,220 @@ def test_deactivate_self(
     test_db.refresh(test_normal_user)
 
     assert test_normal_user.status == UserStatus.DEACTIVATED
+
+
+def test_get_me_after_update_user_me(authorized_client: TestClient):
+    """Test that updating the current user invalidates the cached principal."""
+    response = authorized_client.get("/me")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = authorized_client.patch("/me", json={"first_name": "Cached"})
+    assert response.status_code == status.HTTP_200_OK
+
+    response = authorized_client.get("/me")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["first_name"] == "Cached"
+
+
+def test_deactivated_user_token_rejected(authorized_client: TestClient):
+    """Test that a cached principal is dropped once the user deactivates."""
+    response = authorized_client.get("/me")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = authorized_client.patch("/me/deactivate")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = authorized_client.get("/me")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == "Inactive user"
+
+
+def _claims_token(user_id: uuid.UUID, *, is_superuser: bool, epoch: int) -> str:
+    return create_access_token(
+        user_id,
+        expires_delta=timedelta(minutes=5),
+        is_superuser=is_superuser,
+        status=UserStatus.ACTIVE.value,
+        epoch=epoch,
+    )
+
+
+def test_superuser_claims_authorize_without_user_lookup(
+    unauthorized_client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    """Test that a token with a current epoch is trusted without a user row."""
+
+    async def get_epoch(_):
+        return 3
+
+    monkeypatch.setattr(token_epoch, "get_epoch", get_epoch)
+    # No user with this id exists, so only the claims can authorize it
+    token = _claims_token(uuid.uuid4(), is_superuser=True, epoch=3)
+
+    response = unauthorized_client.get(
+        "/utils/metrics/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_revoked_token_epoch_rejected(
+    unauthorized_client: TestClient,
+    test_superuser: User,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test that tokens issued before the last epoch bump are rejected."""
+
+    async def get_epoch(_):
+        return 3
+
+    monkeypatch.setattr(token_epoch, "get_epoch", get_epoch)
+    token = _claims_token(test_superuser.id, is_superuser=True, epoch=2)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = unauthorized_client.get("/utils/metrics/", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == "Token has been revoked"
+
+    response = unauthorized_client.get("/me", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_claims_ignored_without_epoch_store(
+    unauthorized_client: TestClient, test_normal_user: User
+):
+    """Test that claims are not trusted when the epoch store is unavailable."""
+    # Forged superuser claim for a normal user; the user row wins
+    token = _claims_token(test_normal_user.id, is_superuser=True, epoch=0)
+
+    response = unauthorized_client.get(
+        "/utils/metrics/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.fixture
+def token_epoch_redis(
+    unauthorized_client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> Generator[None, None, None]:
+    """Keep token epochs in the local Redis, skipping without one."""
+    monkeypatch.setattr(config, "CACHE_ENABLED", True)
+    # A client of its own, on the test client's event loop
+    monkeypatch.setattr(core_redis, "_redis", None)
+    token_epoch._local_cache.clear()
+    portal = unauthorized_client.portal
+
+    async def ping() -> bool:
+        try:
+            return await core_redis.get_redis().ping()
+        except core_redis.REDIS_ERRORS:
+            return False
+
+    try:
+        if not portal.call(ping):
+            pytest.skip("Needs a local Redis")
+        yield
+    finally:
+        token_epoch._local_cache.clear()
+        portal.call(core_redis.close_redis)
+
+
+@pytest.mark.usefixtures("token_epoch_redis")
+def test_missing_token_epoch_falls_back_to_user(
+    unauthorized_client: TestClient, test_normal_user: User
+):
+    """Test that claims aren't trusted once the stored epoch is gone."""
+    portal = unauthorized_client.portal
+    epoch = portal.call(token_epoch.issue_epoch, test_normal_user.id)
+    assert epoch is not None
+    assert portal.call(token_epoch.issue_epoch, test_normal_user.id) == epoch
+
+    # Forged superuser claim, with the epoch the store held before a flush
+    token = _claims_token(test_normal_user.id, is_superuser=True, epoch=epoch)
+    portal.call(core_redis.get_redis().delete, token_epoch._key(test_normal_user.id))
+
+    response = unauthorized_client.get(
+        "/utils/metrics/", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    # Seeding again never brings the lost epoch back
+    assert portal.call(token_epoch.issue_epoch, test_normal_user.id) != epoch
+
+
+def test_failed_token_revocation_fails_change(
+    superuser_client: TestClient,
+    test_normal_user: User,
+    test_db: Session,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test that a status change isn't committed when tokens can't be revoked."""
+
+    async def revoke_tokens(*_):
+        raise token_epoch.TokenRevocationError("Connection refused")
+
+    monkeypatch.setattr(token_epoch, "revoke_tokens", revoke_tokens)
+
+    response = superuser_client.patch(
+        f"/users/{test_normal_user.id}/status", json={"status": "deactivated"}
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    test_db.refresh(test_normal_user)
+    assert test_normal_user.status == UserStatus.ACTIVE
+
+
+@pytest.fixture(scope="function")
+def auth_throttle(monkeypatch: pytest.MonkeyPatch):
+    """Enable the auth throttle with a small per-IP burst."""
+    monkeypatch.setattr(config, "AUTH_THROTTLE_ENABLED", True)
+    monkeypatch.setattr(config, "AUTH_THROTTLE_IP_BURST", 2)
+    rate_limit.local_buckets.clear()
+    yield
+    rate_limit.local_buckets.clear()
+
+
+@pytest.mark.usefixtures("auth_throttle")
+def test_login_throttled_before_password_check(unauthorized_client: TestClient):
+    """Test that a login burst gets a 429 without running bcrypt."""
+    login_data = {"username": "nobody@example.com", "password": "wrongpassword"}
+    for _ in range(2):
+        response = unauthorized_client.post("/login/access-token", data=login_data)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    verify_calls = metrics.get_counter("password_hasher.verify.calls")
+    response = unauthorized_client.post("/login/access-token", data=login_data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) >= 1
+    assert metrics.get_counter("password_hasher.verify.calls") == verify_calls
+    assert metrics.get_counter("rate_limit.login.rejected") >= 1
+
+
+def test_throttle_buckets_are_all_or_nothing():
+    """Test that a rejected request does not consume from other buckets."""
+    buckets = rate_limit.LocalTokenBuckets(maxsize=10)
+    small = rate_limit.BucketLimit(capacity=1, refill_per_second=0.01)
+    large = rate_limit.BucketLimit(capacity=2, refill_per_second=0.01)
+
+    assert buckets.acquire([("ip:a", small), ("global", large)]) == 0
+    assert buckets.acquire([("ip:a", small), ("global", large)]) > 0
+    # The global bucket still has its second token
+    assert buckets.acquire([("ip:b", small), ("global", large)]) == 0
+    assert buckets.acquire([("ip:c", small), ("global", large)]) > 0
+
+
+def test_login_rehashes_outdated_password_hash(
+    unauthorized_client: TestClient, test_normal_user: User, test_db: Session
+):
+    """Test that a hash with an old bcrypt cost is replaced after login."""
+    test_normal_user.hashed_password = bcrypt.using(rounds=4).hash("password")
+    test_db.add(test_normal_user)
+    test_db.commit()
+
+    response = unauthorized_client.post(
+        "/login/access-token",
+        data={"username": test_normal_user.email, "password": "password"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    test_db.refresh(test_normal_user)
+    assert not password_needs_rehash(test_normal_user.hashed_password)
+    assert verify_password("password", test_normal_user.hashed_password)
@@ -0,0 +1,107 @@
+import uuid
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import func, text
+from sqlmodel import Session, select
+
+from app.core import db
+from app.models.group import Group
+from app.models.invitation import Invitation, InvitationRegistration
+from app.models.user import User, UserStatus
+from data_pipeline.seeders.group_seeder import GroupFactory
+from data_pipeline.seeders.user_seeder import UserFactory
+
+
+def _summary(client: TestClient) -> dict:
+    response = client.get("/dashboard/summary")
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_dashboard_summary_matches_tables(
+    superuser_client: TestClient, test_db: Session
+):
+    summary = _summary(superuser_client)
+
+    status_counts = dict(
+        test_db.exec(select(User.status, func.count()).group_by(User.status)).all()
+    )
+    for user_status in UserStatus:
+        assert summary["users"][user_status.value] == status_counts.get(user_status, 0)
+    assert summary["users"]["total"] == sum(status_counts.values())
+
+    invitations = test_db.exec(select(Invitation)).all()
+    assert summary["invitations"]["total"] == len(invitations)
+    assert summary["invitations"]["active_total"] == sum(
+        invitation.active for invitation in invitations
+    )
+    registered = test_db.exec(
+        select(func.count()).select_from(InvitationRegistration)
+    ).one()
+    assert summary["registered"] == summary["invitations"]["registered"] == registered
+    active_groups = test_db.exec(
+        select(func.count()).select_from(Group).where(Group.is_active)
+    ).one()
+    assert summary["active_groups"] == active_groups
+
+
+def test_dashboard_counters_follow_writes(
+    superuser_client: TestClient, test_db: Session
+):
+    before = _summary(superuser_client)["users"]
+
+    user = UserFactory.build(
+        email=f"counted{uuid.uuid4().hex[:8]}@example.com", status=UserStatus.ACTIVE
+    )
+    test_db.add(user)
+    test_db.commit()
+    after_insert = _summary(superuser_client)["users"]
+    assert after_insert["active"] == before["active"] + 1
+    assert after_insert["total"] == before["total"] + 1
+
+    user.status = UserStatus.DEACTIVATED
+    test_db.add(user)
+    test_db.commit()
+    after_update = _summary(superuser_client)["users"]
+    assert after_update["active"] == before["active"]
+    assert after_update["deactivated"] == before["deactivated"] + 1
+
+    test_db.delete(user)
+    test_db.commit()
+    assert _summary(superuser_client)["users"] == before
+
+
+def test_reconcile_dashboard_counters(
+    superuser_client: TestClient, test_superuser: User, test_db: Session
+):
+    """Counters changed behind the triggers' back are corrected."""
+    from app.jobs.dashboard_counters import reconcile_dashboard_counters
+
+    test_db.add(GroupFactory.build(created_by_user_id=test_superuser.id))
+    test_db.commit()
+    before = _summary(superuser_client)
+    test_db.execute(
+        text(
+            "UPDATE dashboard_counters SET value = value + 5 "
+            "WHERE name = 'users.active'"
+        )
+    )
+    test_db.execute(text("DELETE FROM dashboard_counters WHERE name = 'groups.active'"))
+    test_db.commit()
+    assert (
+        _summary(superuser_client)["users"]["active"] == before["users"]["active"] + 5
+    )
+
+    async def reconcile():
+        async with db.AsyncSessionLocal() as session:
+            return await reconcile_dashboard_counters(session=session)
+
+    assert sorted(superuser_client.portal.call(reconcile)) == [
+        "groups.active",
+        "users.active",
+    ]
+    assert superuser_client.portal.call(reconcile) == []
+    after = _summary(superuser_client)
+    assert after["users"] == before["users"]
+    assert after["active_groups"] == before["active_groups"]
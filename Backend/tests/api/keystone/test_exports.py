@@ -0,0 +1,148 @@
+import csv
+import gzip
+import io
+import json
+import uuid
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from app.core import db
+from app.core.config import config
+from app.models.group import Group
+from app.models.job import Job, JobFileChunk, JobStatus
+from app.models.user import User
+from data_pipeline.seeders.group_seeder import GroupFactory
+
+
+def _run_export(client: TestClient, test_db: Session, export_id: str) -> None:
+    """Claim and run an export the way the dispatcher would."""
+    from app.jobs.exports import run_export
+
+    job = test_db.get(Job, export_id)
+    job.status = JobStatus.RUNNING
+    test_db.add(job)
+    test_db.commit()
+    # On the app's event loop, where the scheduler would run it
+    client.portal.call(run_export, job.id, db.AsyncSessionLocal)
+
+
+def _file_chunk_count(test_db: Session, export_id: str) -> int:
+    return test_db.exec(
+        select(func.count())
+        .select_from(JobFileChunk)
+        .where(JobFileChunk.job_id == uuid.UUID(export_id))
+    ).one()
+
+
+def test_export_groups_to_ndjson(
+    superuser_client: TestClient,
+    test_superuser: User,
+    test_db: Session,
+    monkeypatch,
+):
+    """An export job stores the matching rows as a gzipped file."""
+    # Spreads the file over several chunks
+    monkeypatch.setattr(config, "JOB_FILE_CHUNK_SIZE_IN_BYTES", 64)
+    groups = [
+        GroupFactory.build(
+            name=f"Export Group {i}", created_by_user_id=test_superuser.id
+        )
+        for i in range(3)
+    ]
+    test_db.add_all(groups)
+    test_db.commit()
+
+    response = superuser_client.post(
+        "/exports/", json={"resource": "groups", "format": "ndjson"}
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    export = response.json()
+    assert export["status"] == "pending"
+
+    # Not ready yet
+    response = superuser_client.get(f"/exports/{export['id']}/download")
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    _run_export(superuser_client, test_db, export["id"])
+
+    response = superuser_client.get(f"/exports/{export['id']}")
+    assert response.status_code == status.HTTP_200_OK
+    export = response.json()
+    group_count = test_db.query(Group).count()
+    assert export["status"] == "completed"
+    assert export["progress"] == export["total"] == group_count
+    assert _file_chunk_count(test_db, export["id"]) > 1
+
+    response = superuser_client.get(f"/exports/{export['id']}/download")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/gzip"
+    rows = [json.loads(line) for line in gzip.decompress(response.content).splitlines()]
+    assert len(rows) == group_count
+    assert {"Export Group 0", "Export Group 1", "Export Group 2"} <= {
+        row["name"] for row in rows
+    }
+
+    # Past retention the file is removed and the export reported expired
+    monkeypatch.setattr(config, "EXPORT_RETENTION_IN_HOURS", 0)
+
+    from app.jobs.exports import purge_expired_exports
+
+    async def purge():
+        async with db.AsyncSessionLocal() as session:
+            await purge_expired_exports(session=session)
+
+    superuser_client.portal.call(purge)
+    assert _file_chunk_count(test_db, export["id"]) == 0
+    response = superuser_client.get(f"/exports/{export['id']}")
+    assert response.json()["status"] == "expired"
+    response = superuser_client.get(f"/exports/{export['id']}/download")
+    assert response.status_code == status.HTTP_410_GONE
+
+
+def test_export_users_to_csv_with_filters(
+    superuser_client: TestClient,
+    test_superuser: User,
+    test_db: Session,
+):
+    response = superuser_client.post(
+        "/exports/",
+        json={
+            "resource": "users",
+            "filters": {"search": test_superuser.email, "status": "all"},
+        },
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    export_id = response.json()["id"]
+
+    _run_export(superuser_client, test_db, export_id)
+
+    response = superuser_client.get(f"/exports/{export_id}/download")
+    assert response.status_code == status.HTTP_200_OK
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert rows[0] == ["id", "first_name", "last_name", "email", "created_at"]
+    assert [row[3] for row in rows[1:]] == [test_superuser.email]
+
+
+def test_regular_user_cannot_export(authorized_client: TestClient):
+    response = authorized_client.post("/exports/", json={"resource": "users"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_create_export_validation(superuser_client: TestClient):
+    response = superuser_client.post("/exports/", json={"resource": "passwords"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = superuser_client.post(
+        "/exports/", json={"resource": "users", "filters": {"status": "unknown"}}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = superuser_client.post(
+        "/exports/", json={"resource": "users", "filters": {"order_by": "password"}}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = superuser_client.get("/exports/00000000-0000-0000-0000-000000000000")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -1,11 +1,17 @@
+import uuid
+from collections.abc import Generator
+
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 from sqlmodel import Session, select
 
+from app.core import redis as core_redis
+from app.core.config import config
 from app.models.group import Group, UserGroup
 from app.models.user import User
 from data_pipeline.seeders.group_seeder import GroupFactory
+from data_pipeline.seeders.user_seeder import UserFactory
 
 
 @pytest.fixture(scope="function")
@@ -94,6 +100,47 @@ def test_read_groups_with_datatable(superuser_client: TestClient):
         assert isinstance(group["user_count"], int)
 
 
+def test_read_groups_with_cursor_pagination(
+    superuser_client: TestClient, test_superuser: User, test_db: Session
+):
+    """Test paging through groups by cursor in name order."""
+    groups = [
+        GroupFactory.build(
+            name=f"Cursor Group {i}", created_by_user_id=test_superuser.id
+        )
+        for i in range(3)
+    ]
+    test_db.add_all(groups)
+    test_db.commit()
+
+    request_body = {
+        "limit": 2,
+        "search": "Cursor Group",
+        "order_by": "name",
+        "order": "asc",
+        "filters": {"user_id": None},
+        "pagination": "cursor",
+    }
+    response = superuser_client.post("/groups/datatable", json=request_body)
+    assert response.status_code == 200
+    first = response.json()
+    assert [g["name"] for g in first["data"]] == ["Cursor Group 0", "Cursor Group 1"]
+    assert first["prev_cursor"] is None
+
+    response = superuser_client.post(
+        "/groups/datatable", json={**request_body, "cursor": first["next_cursor"]}
+    )
+    second = response.json()
+    assert [g["name"] for g in second["data"]] == ["Cursor Group 2"]
+    assert second["next_cursor"] is None
+    assert second["data"][0]["user_count"] == 0
+
+    response = superuser_client.post(
+        "/groups/datatable", json={**request_body, "cursor": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+
+
 def test_create_group(superuser_client: TestClient, test_group_data):
     """Test creating a new group."""
     response = superuser_client.post("/groups/", json=test_group_data)
@@ -191,6 +238,58 @@ def test_update_group(superuser_client: TestClient, test_group: Group):
     assert updated_group["description"] == update_data["description"]
 
 
+@pytest.fixture
+def user_detail_redis(
+    superuser_client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> Generator[None, None, None]:
+    """Cache user details in the local Redis, skipping without one."""
+    monkeypatch.setattr(config, "CACHE_ENABLED", True)
+    # A client of its own, on the test client's event loop
+    monkeypatch.setattr(core_redis, "_redis", None)
+    portal = superuser_client.portal
+
+    async def ping() -> bool:
+        try:
+            return await core_redis.get_redis().ping()
+        except core_redis.REDIS_ERRORS:
+            return False
+
+    try:
+        if not portal.call(ping):
+            pytest.skip("Needs a local Redis")
+        yield
+    finally:
+        portal.call(core_redis.close_redis)
+
+
+@pytest.mark.usefixtures("user_detail_redis")
+def test_update_group_refreshes_cached_user_details(
+    superuser_client: TestClient, test_group: Group, test_normal_user: User
+):
+    """Test that renaming a group drops its members' cached details."""
+    response = superuser_client.post(
+        f"/groups/{test_group.id}/users", json={"user_ids": [str(test_normal_user.id)]}
+    )
+    assert response.status_code == 200
+
+    def group_names() -> list[str]:
+        response = superuser_client.get(f"/users/{test_normal_user.id}")
+        return [group["name"] for group in response.json()["groups"]]
+
+    # Cached by the first read
+    assert group_names() == group_names() == [test_group.name]
+
+    response = superuser_client.patch(
+        f"/groups/{test_group.id}", json={"name": "Renamed Group"}
+    )
+    assert response.status_code == 200
+    assert group_names() == ["Renamed Group"]
+
+    response = superuser_client.delete(f"/groups/{test_group.id}")
+    assert response.status_code == 200
+    assert group_names() == []
+
+
 def test_update_nonexistent_group(superuser_client: TestClient):
     """Test updating a non-existent group."""
     non_existent_id = 9999
@@ -380,3 +479,142 @@ def test_update_all_group_users(
         f"/groups/{test_group.id}/users/{test_superuser.id}"
     )
     assert response.status_code == 400  # User not in group
+
+
+def test_replace_group_users_writes_difference(
+    superuser_client: TestClient, test_group: Group, test_db: Session
+):
+    """Memberships are diffed in SQL and the member count follows them."""
+    users = [
+        UserFactory.build(email=f"member{i}{uuid.uuid4().hex[:8]}@example.com")
+        for i in range(4)
+    ]
+    test_db.add_all(users)
+    test_db.commit()
+    user_ids = [str(user.id) for user in users]
+
+    def member_ids() -> set[str]:
+        rows = test_db.exec(
+            select(UserGroup.user_id).where(UserGroup.group_id == test_group.id)
+        ).all()
+        return {str(user_id) for user_id in rows}
+
+    response = superuser_client.post(
+        f"/groups/{test_group.id}/users", json={"user_ids": user_ids[:3]}
+    )
+    assert response.status_code == 200
+    assert response.json()["user_count"] == 3
+
+    # Keeps users 1 and 2, drops 0 and adds 3; duplicates are ignored
+    response = superuser_client.post(
+        f"/groups/{test_group.id}/users",
+        json={"user_ids": [*user_ids[1:], user_ids[3]]},
+    )
+    assert response.status_code == 200
+    assert response.json()["user_count"] == 3
+    assert {user["id"] for user in response.json()["users"]} == set(user_ids[1:])
+    assert member_ids() == set(user_ids[1:])
+
+    response = superuser_client.post(
+        "/groups/datatable",
+        json={"search": test_group.name, "filters": {"user_id": user_ids[1]}},
+    )
+    assert [group["user_count"] for group in response.json()["data"]] == [3]
+
+    response = superuser_client.post(
+        f"/groups/{test_group.id}/users",
+        json={"user_ids": [user_ids[0], str(uuid.uuid4())]},
+    )
+    assert response.status_code == 400
+    assert member_ids() == set(user_ids[1:])
+
+    response = superuser_client.post(
+        f"/groups/{test_group.id}/users", json={"user_ids": []}
+    )
+    assert response.json()["user_count"] == 0
+    assert response.json()["users"] == []
+    assert member_ids() == set()
+    test_db.refresh(test_group)
+    assert test_group.member_count == 0
+
+
+def test_read_group_members_pages_by_cursor(
+    superuser_client: TestClient, test_group: Group, test_db: Session
+):
+    tag = uuid.uuid4().hex[:8]
+    users = [
+        UserFactory.build(email=f"{letter}member{tag}@example.com")
+        for letter in "edcba"
+    ]
+    test_db.add_all(users)
+    test_db.commit()
+    test_db.add_all(
+        UserGroup(user_id=user.id, group_id=test_group.id) for user in users
+    )
+    test_db.commit()
+    url = f"/groups/{test_group.id}/members"
+
+    first = superuser_client.get(url, params={"limit": 2}).json()
+    assert first["count"] == 5
+    assert first["prev_cursor"] is None
+    seen = [member["id"] for member in first["data"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = superuser_client.get(url, params={"limit": 2, "cursor": cursor}).json()
+        seen += [member["id"] for member in page["data"]]
+        cursor = page["next_cursor"]
+    assert seen == sorted(str(user.id) for user in users)
+
+    second = superuser_client.get(
+        url, params={"limit": 2, "cursor": first["next_cursor"]}
+    ).json()
+    back = superuser_client.get(
+        url, params={"limit": 2, "cursor": second["prev_cursor"]}
+    ).json()
+    assert back["data"] == first["data"]
+
+    response = superuser_client.get(
+        url, params={"order_by": "email", "order": "desc", "limit": 10}
+    )
+    emails = [member["email"] for member in response.json()["data"]]
+    assert emails == sorted((user.email for user in users), reverse=True)
+    assert all(member["joined_at"] for member in response.json()["data"])
+
+    response = superuser_client.get(url, params={"search": f"bmember{tag}"})
+    assert [member["email"] for member in response.json()["data"]] == [
+        f"bmember{tag}@example.com"
+    ]
+    assert response.json()["count"] == 5
+
+    response = superuser_client.get(url, params={"order_by": "password"})
+    assert response.status_code == 422
+    response = superuser_client.get("/groups/999999/members")
+    assert response.status_code == 404
+
+
+def test_add_single_user_to_group(
+    superuser_client: TestClient,
+    test_group: Group,
+    test_normal_user: User,
+    test_db: Session,
+):
+    url = f"/groups/{test_group.id}/users/{test_normal_user.id}"
+    response = superuser_client.put(url)
+    assert response.status_code == 200
+    assert response.json()["message"] == "User added to group successfully"
+
+    response = superuser_client.put(url)
+    assert response.status_code == 200
+    assert response.json()["message"] == "User is already in this group"
+    test_db.refresh(test_group)
+    assert test_group.member_count == 1
+
+    response = superuser_client.put(f"/groups/{test_group.id}/users/{uuid.uuid4()}")
+    assert response.status_code == 404
+    response = superuser_client.delete(f"/groups/{test_group.id}/users/{uuid.uuid4()}")
+    assert response.status_code == 404
+
+    response = superuser_client.delete(url)
+    assert response.status_code == 200
+    test_db.refresh(test_group)
+    assert test_group.member_count == 0
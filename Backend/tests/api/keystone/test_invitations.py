@@ -1,11 +1,21 @@
+import asyncio
+import json
+import uuid
 from datetime import datetime, timedelta, timezone
 
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 from freezegun import freeze_time
+from sqlmodel import select
 
-from app.models.invitation import Invitation, InvitationType
+from app.core import db
+from app.core.config import config
+from app.models.invitation import Invitation, InvitationRegistration, InvitationType
+from app.models.job import Job, JobFileChunk, JobStatus, JobType
+from app.models.password_reset import PasswordReset
+from app.models.transaction import Model, Transaction
+from app.utils.sql import any_of
 
 
 @pytest.fixture(scope="function")
@@ -487,3 +497,223 @@ def test_create_invitation_expiry(superuser_client: TestClient):
                         pytest.fail(
                             "Could not find the created invitation in the datatable response"
                         )
+
+
+def _run_invitation_upload(client: TestClient, test_db, upload_id: str) -> None:
+    """Claim and run an upload the way the dispatcher would."""
+    from app.jobs.invitation_uploads import run_invitation_upload
+
+    job = test_db.get(Job, upload_id)
+    job.status = JobStatus.RUNNING
+    test_db.add(job)
+    test_db.commit()
+    client.portal.call(run_invitation_upload, job.id, db.AsyncSessionLocal)
+
+
+@pytest.mark.usefixtures("test_email_invitation")
+def test_bulk_upload_invitations_from_csv(
+    superuser_client: TestClient,
+    test_db,
+    test_superuser,
+    monkeypatch,
+):
+    monkeypatch.setattr(config, "INVITATION_UPLOAD_CHUNK_SIZE", 2)
+    # The file is stored across several rows
+    monkeypatch.setattr(config, "JOB_FILE_CHUNK_SIZE_IN_BYTES", 64)
+    tag = uuid.uuid4().hex[:8]
+    rows = [
+        "name,email",
+        f"One,one{tag}@example.com",
+        f"Two,two{tag}@example.com",
+        f"One again,one{tag}@example.com",
+        "Invited,test_invite@example.com",
+        f"Existing user,{test_superuser.email}",
+        "Broken,not-an-email",
+        ",",
+        f"Three, three{tag}@example.com ",
+    ]
+    response = superuser_client.post(
+        "/invitations/bulk-upload",
+        files={"file": ("people.csv", "\n".join(rows).encode(), "text/csv")},
+        data={"user_expiry_date": "2030-01-01T00:00:00+00:00"},
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    upload = response.json()
+    assert upload["status"] == "pending"
+
+    def file_chunks() -> int:
+        chunks = test_db.exec(
+            select(JobFileChunk.seq).where(JobFileChunk.job_id == upload["id"])
+        )
+        return len(chunks.all())
+
+    assert file_chunks() > 1
+
+    _run_invitation_upload(superuser_client, test_db, upload["id"])
+
+    upload = superuser_client.get(f"/invitations/bulk-upload/{upload['id']}").json()
+    assert upload["status"] == "completed"
+    assert upload["progress"] == upload["total"] == 8
+    assert upload["created"] == 3
+    # The repeated row, the active invitation and the user
+    assert upload["existing"] == 3
+    assert upload["invalid"] == 1
+    assert upload["invalid_lines"] == [7]
+    # Uploaded files are removed once processed
+    assert file_chunks() == 0
+
+    invitations = test_db.exec(
+        select(Invitation).where(Invitation.email.like(f"%{tag}@example.com"))
+    ).all()
+    assert sorted(invitation.email for invitation in invitations) == sorted(
+        f"{name}{tag}@example.com" for name in ("one", "two", "three")
+    )
+    for invitation in invitations:
+        assert invitation.type == InvitationType.EMAIL
+        assert invitation.created_by_user_id == test_superuser.id
+        assert invitation.active
+        assert invitation.user_expiry_date == datetime(2030, 1, 1, tzinfo=timezone.utc)
+    audited = test_db.exec(
+        select(Transaction).where(
+            Transaction.model == Model.INVITATION,
+            any_of(Transaction.record_id, [str(i.id) for i in invitations]),
+        )
+    ).all()
+    assert len(audited) == 3
+
+
+def test_bulk_upload_invitations_from_ndjson(superuser_client: TestClient, test_db):
+    tag = uuid.uuid4().hex[:8]
+    lines = [
+        json.dumps({"email": f"first{tag}@example.com"}),
+        json.dumps(f"second{tag}@example.com"),
+        "{broken",
+        json.dumps({"name": "no email"}),
+    ]
+    response = superuser_client.post(
+        "/invitations/bulk-upload",
+        files={"file": ("people.ndjson", "\n".join(lines).encode())},
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    _run_invitation_upload(superuser_client, test_db, response.json()["id"])
+
+    upload = superuser_client.get(
+        f"/invitations/bulk-upload/{response.json()['id']}"
+    ).json()
+    assert upload["status"] == "completed"
+    assert (upload["created"], upload["invalid"]) == (2, 2)
+    assert upload["invalid_lines"] == [3, 4]
+
+
+def test_concurrent_invitations_of_an_email_create_one(
+    superuser_client: TestClient, test_db, test_superuser
+):
+    """Test that a second chunk inviting an email waits for the first one."""
+    from app.jobs.invitation_uploads import _insert_chunk
+
+    email = f"race{uuid.uuid4().hex[:8]}@example.com"
+    job = Job(
+        type=JobType.INVITATION_UPLOAD,
+        created_by_user_id=test_superuser.id,
+        params={"user_expiry_date": None},
+    )
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+
+    async def race() -> tuple[list, list]:
+        async with db.AsyncSessionLocal() as first, db.AsyncSessionLocal() as second:
+            created = await _insert_chunk(first, job, [email], expires_at)
+            racing = asyncio.create_task(
+                _insert_chunk(second, job, [email], expires_at)
+            )
+            await asyncio.sleep(0.2)
+            assert not racing.done()
+            await first.commit()
+            raced = await racing
+            await second.commit()
+            return created, raced
+
+    created, raced = superuser_client.portal.call(race)
+    assert [invited for invited, _ in created] == [email]
+    assert raced == []
+    invitations = test_db.exec(select(Invitation).where(Invitation.email == email))
+    assert len(invitations.all()) == 1
+
+
+def test_bulk_upload_invitations_rejects_other_files(
+    superuser_client: TestClient, test_db, monkeypatch
+):
+    jobs = select(Job.id).where(Job.type == JobType.INVITATION_UPLOAD)
+    uploads = set(test_db.exec(jobs).all())
+    response = superuser_client.post(
+        "/invitations/bulk-upload", files={"file": ("people.xlsx", b"data")}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    monkeypatch.setattr(config, "INVITATION_UPLOAD_MAX_SIZE_IN_BYTES", 10)
+    response = superuser_client.post(
+        "/invitations/bulk-upload",
+        files={"file": ("people.csv", b"someone@example.com")},
+    )
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    # Neither the job nor part of its file is kept
+    assert set(test_db.exec(jobs).all()) == uploads
+
+    response = superuser_client.get(f"/invitations/bulk-upload/{uuid.uuid4()}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_purge_expired_tokens(
+    superuser_client: TestClient, test_db, test_superuser, monkeypatch
+):
+    from app.jobs.purge_tokens import purge_expired_tokens
+
+    monkeypatch.setattr(config, "TOKEN_PURGE_BATCH_SIZE", 2)
+    now = datetime.now(timezone.utc)
+    long_ago = now - timedelta(days=config.INVITATION_RETENTION_IN_DAYS + 1)
+    resets = {
+        "expired": [
+            PasswordReset(
+                user_id=test_superuser.id, expires_at=now - timedelta(hours=1)
+            )
+            for _ in range(3)
+        ],
+        "active": [PasswordReset(user_id=test_superuser.id)],
+    }
+    invitations = {
+        "stale": [
+            Invitation(created_by_user_id=test_superuser.id, expires_at=long_ago)
+            for _ in range(3)
+        ],
+        "used": [Invitation(created_by_user_id=test_superuser.id, expires_at=long_ago)],
+        "recent": [
+            Invitation(
+                created_by_user_id=test_superuser.id, expires_at=now - timedelta(days=1)
+            )
+        ],
+    }
+    test_db.add_all([*sum(resets.values(), []), *sum(invitations.values(), [])])
+    test_db.commit()
+    test_db.add(
+        InvitationRegistration(
+            invitation_id=invitations["used"][0].id, user_id=test_superuser.id
+        )
+    )
+    test_db.commit()
+    reset_ids = {key: [r.id for r in rows] for key, rows in resets.items()}
+    invitation_ids = {key: [i.id for i in rows] for key, rows in invitations.items()}
+
+    async def purge():
+        async with db.AsyncSessionLocal() as session:
+            return await purge_expired_tokens(session=session)
+
+    purged = superuser_client.portal.call(purge)
+    assert purged["password_reset"] >= 3
+    assert purged["invitation"] >= 3
+
+    test_db.expire_all()
+    assert not any(test_db.get(PasswordReset, id) for id in reset_ids["expired"])
+    assert all(test_db.get(PasswordReset, id) for id in reset_ids["active"])
+    assert not any(test_db.get(Invitation, id) for id in invitation_ids["stale"])
+    for id in invitation_ids["used"] + invitation_ids["recent"]:
+        assert test_db.get(Invitation, id)
@@ -1,14 +1,25 @@
-from collections.abc import Generator
+import asyncio
+import uuid
+from collections.abc import AsyncIterator, Generator
+from datetime import date, datetime, timedelta, timezone
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session
-
-from app.models.notification import Notification
-from app.models.user import User
+from sqlmodel import Session, select, update
+
+from app.core import db
+from app.core import redis as core_redis
+from app.core.config import config
+from app.models.group import Group, UserGroup
+from app.models.job import Job, JobStatus
+from app.models.notification import Notification, NotificationMessage
+from app.models.notification_counter import NotificationCounter
+from app.models.user import User, UserStatus
 from data_pipeline.seeders.notification_seeder import (
     NotificationFactory,
+    NotificationMessageFactory,
 )
+from data_pipeline.seeders.user_seeder import UserFactory
 
 
 @pytest.fixture(scope="module")
@@ -185,3 +196,431 @@ def test_mark_all_notifications_as_read(
     data = get_response.json()
     assert data["count"] == 0
     assert len(data["data"]) == 0
+
+
+def test_get_unread_notification_count(
+    module_authorized_client: TestClient, session_db: Session, module_normal_user: User
+):
+    """Test that the unread count follows new and read notifications."""
+    initial = module_authorized_client.get("/notifications/unread-count")
+    assert initial.status_code == 200
+    count = initial.json()["count"]
+
+    notifications = [
+        NotificationFactory.build(user_id=module_normal_user.id, is_read=False)
+        for _ in range(2)
+    ]
+    session_db.add_all(notifications)
+    session_db.commit()
+
+    response = module_authorized_client.get("/notifications/unread-count")
+    assert response.json()["count"] == count + 2
+    assert module_authorized_client.get("/notifications/").json()["count"] == count + 2
+
+    module_authorized_client.patch(f"/notifications/{notifications[0].id}/read")
+    module_authorized_client.patch(f"/notifications/{notifications[0].id}/read")
+    response = module_authorized_client.get("/notifications/unread-count")
+    assert response.json()["count"] == count + 1
+
+    session_db.delete(notifications[1])
+    session_db.commit()
+    response = module_authorized_client.get("/notifications/unread-count")
+    assert response.json()["count"] == count
+
+
+def test_reconcile_notification_counters(
+    module_authorized_client: TestClient, session_db: Session, module_normal_user: User
+):
+    """Test that reconciling corrects a counter that drifted."""
+    from app.jobs.notification_counters import reconcile_notification_counters
+
+    count = module_authorized_client.get("/notifications/unread-count").json()["count"]
+    session_db.execute(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == module_normal_user.id)
+        .values(unread=NotificationCounter.unread + 5)
+    )
+    session_db.commit()
+    drifted = module_authorized_client.get("/notifications/unread-count")
+    assert drifted.json()["count"] == count + 5
+
+    assert module_authorized_client.portal.call(reconcile_notification_counters) >= 1
+
+    response = module_authorized_client.get("/notifications/unread-count")
+    assert response.json()["count"] == count
+
+
+def test_mark_notifications_as_read_by_ids(
+    module_authorized_client: TestClient,
+    session_db: Session,
+    test_db: Session,
+    module_normal_user: User,
+    other_user_notification: Notification,
+):
+    """Test marking only the given notifications of the user as read."""
+    other_user_notification.is_read = False
+    test_db.commit()
+    notifications = [
+        NotificationFactory.build(user_id=module_normal_user.id, is_read=False)
+        for _ in range(3)
+    ]
+    session_db.add_all(notifications)
+    session_db.commit()
+    ids = [notifications[0].id, notifications[1].id, other_user_notification.id]
+
+    response = module_authorized_client.patch("/notifications/read", json={"ids": ids})
+    assert response.status_code == 200
+    assert response.json() == {"success": True, "count": 2}
+
+    # Already read ones aren't counted again
+    response = module_authorized_client.patch("/notifications/read", json={"ids": ids})
+    assert response.json()["count"] == 0
+
+    for notification in notifications:
+        session_db.refresh(notification)
+    test_db.refresh(other_user_notification)
+    assert [n.is_read for n in notifications] == [True, True, False]
+    assert other_user_notification.is_read is False
+
+    response = module_authorized_client.patch("/notifications/read", json={"ids": []})
+    assert response.status_code == 422
+
+
+def test_mark_notifications_as_read_before(
+    module_authorized_client: TestClient,
+    session_db: Session,
+    module_normal_user: User,
+):
+    """Test marking the notifications created before a timestamp as read."""
+    now = datetime.now(timezone.utc)
+    old, recent = (
+        NotificationFactory.build(
+            user_id=module_normal_user.id, is_read=False, created_at=created_at
+        )
+        for created_at in (now - timedelta(days=2), now + timedelta(minutes=1))
+    )
+    session_db.add_all([old, recent])
+    session_db.commit()
+
+    response = module_authorized_client.patch(
+        "/notifications/read-all", params={"before": now.isoformat()}
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] >= 1
+
+    session_db.refresh(old)
+    session_db.refresh(recent)
+    assert old.is_read is True
+    assert recent.is_read is False
+
+    listed = module_authorized_client.get("/notifications/").json()
+    assert listed["data"][0]["id"] == recent.id
+    assert listed["count"] == len(listed["data"])
+
+
+@pytest.fixture
+def notification_stream_redis(
+    module_authorized_client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> Generator[None, None, None]:
+    """Serve notification streams from the local Redis, skipping without one."""
+    from app.utils.notification_stream import notification_hub
+
+    monkeypatch.setattr(config, "CACHE_ENABLED", True)
+    # A client of its own, on the test client's event loop
+    monkeypatch.setattr(core_redis, "_redis", None)
+    portal = module_authorized_client.portal
+
+    async def ping() -> bool:
+        try:
+            return await core_redis.get_redis().ping()
+        except core_redis.REDIS_ERRORS:
+            return False
+
+    try:
+        if not portal.call(ping):
+            pytest.skip("Needs a local Redis")
+        yield
+    finally:
+        portal.call(notification_hub.close)
+        portal.call(core_redis.close_redis)
+
+
+def test_notification_stream_requires_redis(module_authorized_client: TestClient):
+    """Test that streams aren't served without Redis."""
+    response = module_authorized_client.get("/notifications/stream")
+    assert response.status_code == 503
+
+
+@pytest.mark.usefixtures("notification_stream_redis")
+def test_notification_stream(
+    module_authorized_client: TestClient,
+    module_normal_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test pushing, resuming, fanning out to and capping notification streams."""
+    from app.jobs.notification_fanouts import insert_notification_chunks
+    from app.utils.notification import create_notification, mark_notifications_read
+    from app.utils.notification_stream import (
+        notification_events,
+        notification_hub,
+        publish_fanout,
+    )
+
+    user_id = module_normal_user.id
+
+    async def next_event(events: AsyncIterator[str]) -> str:
+        return await asyncio.wait_for(anext(events), timeout=5)
+
+    async def stream() -> None:
+        events = notification_events(user_id)
+        assert await next_event(events) == "retry: 3000\n\n"
+
+        notification = await create_notification(user_id=user_id, message="Hello")
+        pushed = await next_event(events)
+        assert pushed.startswith(f"id: {notification.id}\nevent: notification\n")
+        assert '"message":"Hello"' in pushed
+
+        async with db.AsyncSessionLocal() as session:
+            await mark_notifications_read(session, user_id, ids=[notification.id])
+        read = await next_event(events)
+        assert read == f'event: read\ndata: {{"ids": [{notification.id}]}}\n\n'
+
+        monkeypatch.setattr(config, "NOTIFICATION_STREAM_HEARTBEAT_IN_SECONDS", 0.05)
+        assert await next_event(events) == ": heartbeat\n\n"
+        monkeypatch.setattr(config, "NOTIFICATION_STREAM_HEARTBEAT_IN_SECONDS", 15)
+
+        # Missed unread notifications are replayed, the read one isn't
+        missed = await create_notification(user_id=user_id, message="Missed")
+        await next_event(events)
+        await events.aclose()
+        resumed = notification_events(user_id, last_event_id=notification.id - 1)
+        await next_event(resumed)
+        assert (await next_event(resumed)).startswith(f"id: {missed.id}\n")
+
+        # Fan-outs only announce their chunks, the hub loads the rows
+        async with db.AsyncSessionLocal() as session:
+            recipients = select(User.id).where(User.id == user_id)
+            chunks = insert_notification_chunks(session, recipients, message="All")
+            async for chunk in chunks:
+                await session.commit()
+                await publish_fanout(chunk.first_id, chunk.last_id)
+        fanned_out = await next_event(resumed)
+        assert fanned_out.startswith(f"id: {chunk.last_id}\nevent: notification\n")
+
+        monkeypatch.setattr(
+            config, "NOTIFICATION_STREAM_MAX_CONNECTIONS", notification_hub.connections
+        )
+        with pytest.raises(StopAsyncIteration):
+            await next_event(notification_events(user_id))
+        await resumed.aclose()
+        assert notification_hub.connections == 0
+
+    module_authorized_client.portal.call(stream)
+
+
+def _run_notification_fanout(client: TestClient, test_db: Session, id: str) -> None:
+    """Claim and run a fan-out the way the dispatcher would."""
+    from app.jobs.notification_fanouts import run_notification_fanout
+
+    job = test_db.get(Job, id)
+    job.status = JobStatus.RUNNING
+    test_db.add(job)
+    test_db.commit()
+    client.portal.call(run_notification_fanout, job.id, db.AsyncSessionLocal)
+
+
+def test_notification_fanout(
+    superuser_client: TestClient,
+    test_db: Session,
+    test_superuser: User,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test notifying the members of a group, a chunk at a time."""
+    members = [
+        UserFactory.build(
+            email=f"fanout-{uuid.uuid4().hex}@example.com",
+            hashed_password="x",
+            status=UserStatus.ACTIVE,
+        )
+        for _ in range(5)
+    ]
+    group = Group(name="Fan-out", created_by_user_id=test_superuser.id)
+    test_db.add_all([*members, group])
+    test_db.commit()
+    test_db.add_all(
+        UserGroup(user_id=member.id, group_id=group.id) for member in members
+    )
+    test_db.commit()
+    monkeypatch.setattr(config, "NOTIFICATION_FANOUT_CHUNK_SIZE", 2)
+
+    response = superuser_client.post(
+        "/notifications/fan-out",
+        json={
+            "message": "Maintenance tonight",
+            "type": "warning",
+            "audience": {"group_id": group.id},
+        },
+    )
+    assert response.status_code == 202
+    fanout = response.json()
+    assert fanout["status"] == "pending"
+
+    _run_notification_fanout(superuser_client, test_db, fanout["id"])
+
+    fanout = superuser_client.get(f"/notifications/fan-out/{fanout['id']}").json()
+    assert fanout["status"] == "completed"
+    assert fanout["progress"] == fanout["total"] == 5
+
+    member_ids = {member.id for member in members}
+    notifications = test_db.exec(
+        select(Notification).where(Notification.user_id.in_(member_ids))
+    ).all()
+    assert {notification.user_id for notification in notifications} == member_ids
+    assert len(notifications) == 5
+    assert all(n.message == "Maintenance tonight" for n in notifications)
+    assert all(n.type == "warning" and not n.is_read for n in notifications)
+    # Stored once for all of them
+    assert len({n.message_id for n in notifications}) == 1
+    # The counter triggers fire for bulk inserts too
+    for member in members:
+        assert test_db.get(NotificationCounter, member.id).unread == 1
+
+
+def test_purge_notification_messages(
+    superuser_client: TestClient,
+    test_db: Session,
+    test_normal_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test that bodies are deleted once no notification refers to them."""
+    from app.jobs.purge_notification_messages import purge_notification_messages
+
+    monkeypatch.setattr(config, "NOTIFICATION_MESSAGE_PURGE_BATCH_SIZE", 2)
+    shared = NotificationMessageFactory.build()
+    notifications = [
+        NotificationFactory.build(user_id=test_normal_user.id, body=shared)
+        for _ in range(2)
+    ]
+    orphans = NotificationMessageFactory.build_batch(3)
+    test_db.add_all([*notifications, *orphans])
+    test_db.commit()
+    orphan_ids = [orphan.id for orphan in orphans]
+    shared_id = shared.id
+    test_db.delete(notifications[0])
+    test_db.commit()
+
+    async def purge():
+        async with db.AsyncSessionLocal() as session:
+            return await purge_notification_messages(session=session)
+
+    assert superuser_client.portal.call(purge) >= 3
+    test_db.expire_all()
+    assert not any(test_db.get(NotificationMessage, id) for id in orphan_ids)
+    # Still read by the other recipient
+    assert test_db.get(NotificationMessage, shared_id)
+
+    test_db.delete(notifications[1])
+    test_db.commit()
+    superuser_client.portal.call(purge)
+    test_db.expire_all()
+    assert test_db.get(NotificationMessage, shared_id) is None
+
+
+def test_notification_partitions(
+    superuser_client: TestClient,
+    test_db: Session,
+    session_db: Session,
+    test_normal_user: User,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test that expired months are dropped, keeping their unread notifications."""
+    from app.jobs.notification_partitions import (
+        create_notification_partition,
+        maintain_notification_partitions,
+        partition_name,
+    )
+
+    monkeypatch.setattr(config, "NOTIFICATION_RETENTION_IN_DAYS", 30)
+    # January holds read and unread notifications, February only read ones
+    read, unread, february_read = (
+        NotificationFactory.build(
+            user_id=test_normal_user.id,
+            is_read=is_read,
+            created_at=datetime(2001, month, 15, tzinfo=timezone.utc),
+        )
+        for is_read, month in ((True, 1), (False, 1), (True, 2))
+    )
+    test_db.add_all([read, unread, february_read])
+    test_db.commit()
+    ids = [read.id, unread.id, february_read.id]
+    # Detaching waits for the transactions that read the table, like the
+    # ones these sessions opened refreshing notifications
+    test_db.commit()
+    session_db.commit()
+    january, february = (
+        partition_name(date(2001, 1, 1)),
+        partition_name(date(2001, 2, 1)),
+    )
+
+    async def partition():
+        async with db.AsyncSessionLocal() as session:
+            for month in (1, 2):
+                assert await create_notification_partition(
+                    session, date(2001, month, 1)
+                )
+
+    async def maintain():
+        async with db.AsyncSessionLocal() as session:
+            return await maintain_notification_partitions(session=session)
+
+    superuser_client.portal.call(partition)
+    maintenance = superuser_client.portal.call(maintain)
+    assert {january, february} <= set(maintenance.dropped)
+    assert maintenance.moved >= 1
+    now = datetime.now(timezone.utc)
+    assert partition_name(date(now.year, now.month, 1)) not in maintenance.created
+
+    test_db.expire_all()
+    remaining = test_db.exec(select(Notification.id).where(Notification.id.in_(ids)))
+    assert remaining.all() == [unread.id]
+    # Moved and dropped rows were counted right: only the unread one is, once
+    assert test_db.get(NotificationCounter, test_normal_user.id).unread == 1
+
+    test_db.exec(
+        update(Notification).where(Notification.id == unread.id).values(is_read=True)
+    )
+    test_db.commit()
+    maintenance = superuser_client.portal.call(maintain)
+    # Expired months left in the default partition don't get partitions again
+    assert not maintenance.created
+    assert maintenance.purged >= 1
+    remaining = test_db.exec(select(Notification.id).where(Notification.id.in_(ids)))
+    assert not remaining.all()
+
+
+def test_notification_fanout_audience(superuser_client: TestClient):
+    """Test that a fan-out needs exactly one existing audience."""
+    for audience in ({}, {"group_id": 1, "user_ids": [str(uuid.uuid4())]}):
+        response = superuser_client.post(
+            "/notifications/fan-out", json={"message": "Hi", "audience": audience}
+        )
+        assert response.status_code == 422
+
+    response = superuser_client.post(
+        "/notifications/fan-out",
+        json={"message": "Hi", "audience": {"group_id": 2**31 - 1}},
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Group not found"
+
+    response = superuser_client.get(f"/notifications/fan-out/{uuid.uuid4()}")
+    assert response.status_code == 404
+
+
+def test_notification_fanout_requires_superuser(authorized_client: TestClient):
+    """Test that normal users can't notify other users."""
+    response = authorized_client.post(
+        "/notifications/fan-out",
+        json={"message": "Hi", "audience": {"filters": {}}},
+    )
+    assert response.status_code == 403
@@ -1,10 +1,21 @@
+import csv
+import gzip
+import io
 import uuid
+from datetime import datetime, timedelta, timezone
 
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
+from sqlmodel import Session, select
 
+from app.core.config import config
+from app.models.group import UserGroup
+from app.models.invitation import Invitation, InvitationRegistration, InvitationType
+from app.models.transaction import Model, Transaction
 from app.models.user import User, UserStatus
+from app.utils import token_epoch
+from data_pipeline.seeders.group_seeder import GroupFactory
 from data_pipeline.seeders.user_seeder import UserFactory
 
 
@@ -101,6 +112,146 @@ def test_read_users_with_search(superuser_client: TestClient):
         assert found, "Search didn't return expected results"
 
 
+def test_read_users_with_fulltext_search(
+    superuser_client: TestClient, test_db: Session
+):
+    """Test prefix matching and relevance ordering of the fulltext search."""
+    suffix = uuid.uuid4().hex[:8]
+    exact = UserFactory.build(
+        first_name=f"Zebulon{suffix}",
+        last_name="Quarry",
+        email=f"zebulon{suffix}@example.com",
+        status=UserStatus.ACTIVE,
+    )
+    partial = UserFactory.build(
+        first_name="Other",
+        last_name="Person",
+        email=f"zebulon{suffix}.other@example.com",
+        status=UserStatus.ACTIVE,
+    )
+    test_db.add_all([exact, partial])
+    test_db.commit()
+
+    request_body = {
+        "search": f"zebulon{suffix[:4]} quar",
+        "search_mode": "fulltext",
+        "filters": {"status": "all", "role": "all", "group": "all"},
+    }
+    response = superuser_client.post("/users/datatable", json=request_body)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 1
+    assert data["data"][0]["id"] == str(exact.id)
+
+    request_body["search"] = f"zebulon{suffix}"
+    response = superuser_client.post("/users/datatable", json=request_body)
+    data = response.json()
+    assert data["count"] == 2
+    # The name and email both match for the first user, so it ranks higher
+    assert data["data"][0]["id"] == str(exact.id)
+
+    # Punctuation is ignored rather than producing an invalid tsquery
+    request_body["search"] = "!&|:*"
+    response = superuser_client.post("/users/datatable", json=request_body)
+    assert response.status_code == 200
+
+
+def test_read_users_with_cursor_pagination(
+    superuser_client: TestClient, test_db: Session
+):
+    """Test walking the users datatable forwards and backwards by cursor."""
+    suffix = uuid.uuid4().hex[:8]
+    created_at = datetime.now(timezone.utc)
+    users = [
+        UserFactory.build(
+            email=f"cursor{suffix}.{i}@example.com",
+            status=UserStatus.ACTIVE,
+            # Shared sort values are ordered by the id tiebreaker
+            created_at=created_at if i < 3 else created_at - timedelta(days=1),
+        )
+        for i in range(5)
+    ]
+    test_db.add_all(users)
+    test_db.commit()
+    expected = [
+        str(user.id)
+        for user in sorted(users, key=lambda u: (u.created_at, u.id), reverse=True)
+    ]
+
+    request_body = {
+        "limit": 2,
+        "search": f"cursor{suffix}",
+        "filters": {"status": "all", "role": "all", "group": "all"},
+        "pagination": "cursor",
+    }
+    pages = []
+    cursor = None
+    while True:
+        response = superuser_client.post(
+            "/users/datatable", json={**request_body, "cursor": cursor}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 5
+        pages.append(data)
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [len(page["data"]) for page in pages] == [2, 2, 1]
+    assert [user["id"] for page in pages for user in page["data"]] == expected
+    assert pages[0]["prev_cursor"] is None
+
+    response = superuser_client.post(
+        "/users/datatable", json={**request_body, "cursor": pages[2]["prev_cursor"]}
+    )
+    data = response.json()
+    assert [user["id"] for user in data["data"]] == expected[2:4]
+    assert data["next_cursor"] is not None
+    assert data["prev_cursor"] is not None
+
+    # Cursors are bound to the ordering that produced them
+    response = superuser_client.post(
+        "/users/datatable",
+        json={**request_body, "cursor": pages[0]["next_cursor"], "order": "asc"},
+    )
+    assert response.status_code == 400
+
+    response = superuser_client.post(
+        "/users/datatable", json={**request_body, "order_by": "hashed_password"}
+    )
+    assert response.status_code == 400
+
+
+def test_read_users_count_modes(superuser_client: TestClient):
+    """Test that each count mode reports the strategy behind the total."""
+    request_body = {
+        "filters": {"status": "all", "role": "all", "group": "all"},
+        "count_mode": "exact",
+    }
+    response = superuser_client.post("/users/datatable", json=request_body)
+    assert response.status_code == 200
+    exact = response.json()
+    assert exact["count_strategy"] == "exact"
+
+    response = superuser_client.post(
+        "/users/datatable", json={**request_body, "count_mode": "estimated"}
+    )
+    assert response.status_code == 200
+    estimated = response.json()
+    assert estimated["count_strategy"] == "estimated"
+    assert isinstance(estimated["count"], int)
+    assert estimated["data"] == exact["data"]
+
+    # Without Redis a cached count falls back to counting
+    response = superuser_client.post(
+        "/users/datatable",
+        json={**request_body, "count_mode": "cached", "search": "admin"},
+    )
+    assert response.status_code == 200
+    assert response.json()["count_strategy"] == "exact"
+
+
 def test_read_users_with_status_filter(superuser_client: TestClient):
     """Test getting users with status filter."""
     request_body = {
@@ -123,6 +274,50 @@ def test_read_users_with_status_filter(superuser_client: TestClient):
             assert user["status"] == "active"
 
 
+def test_read_users_with_group_filters(
+    superuser_client: TestClient, test_superuser: User, test_db: Session
+):
+    """`group` and `exclude_group` combine into the difference of the groups."""
+    users = [
+        UserFactory.build(email=f"grouped{i}{uuid.uuid4().hex[:8]}@example.com")
+        for i in range(3)
+    ]
+    included, excluded = (
+        GroupFactory.build(created_by_user_id=test_superuser.id) for _ in range(2)
+    )
+    test_db.add_all([*users, included, excluded])
+    test_db.commit()
+    test_db.add_all(
+        [
+            *(UserGroup(user_id=user.id, group_id=included.id) for user in users),
+            UserGroup(user_id=users[0].id, group_id=excluded.id),
+        ]
+    )
+    test_db.commit()
+
+    def user_ids(filters: dict) -> set[str]:
+        response = superuser_client.post(
+            "/users/datatable", json={"limit": 100, "filters": filters}
+        )
+        assert response.status_code == 200
+        return {user["id"] for user in response.json()["data"]}
+
+    assert user_ids({"group": included.id}) == {str(user.id) for user in users}
+    assert user_ids({"group": included.id, "exclude_group": excluded.id}) == {
+        str(users[1].id),
+        str(users[2].id),
+    }
+    assert str(users[0].id) not in user_ids({"exclude_group": excluded.id})
+
+    response = superuser_client.post(
+        "/groups/datatable", json={"filters": {"user_id": str(users[0].id)}}
+    )
+    assert {group["id"] for group in response.json()["data"]} == {
+        included.id,
+        excluded.id,
+    }
+
+
 def test_create_user(superuser_client: TestClient, test_user_data):
     """Test creating a new user."""
     response = superuser_client.post("/users/", json=test_user_data)
@@ -199,6 +394,49 @@ def test_export_user_data(superuser_client: TestClient):
     assert "created_at" in header
 
 
+def test_export_user_data_with_filters(superuser_client: TestClient, test_db: Session):
+    """Test that the export applies the datatable filters and quotes fields."""
+    suffix = uuid.uuid4().hex[:8]
+    active = UserFactory.build(
+        first_name='Export, "Quoted"',
+        email=f"export{suffix}.active@example.com",
+        status=UserStatus.ACTIVE,
+    )
+    pending = UserFactory.build(
+        email=f"export{suffix}.pending@example.com",
+        status=UserStatus.PENDING_ADMIN_APPROVAL,
+    )
+    test_db.add_all([active, pending])
+    test_db.commit()
+
+    response = superuser_client.get(
+        "/users/export", params={"search": f"export{suffix}"}
+    )
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "first_name", "last_name", "email", "created_at"]
+    # Only active users are exported by default
+    assert [row[0] for row in rows[1:]] == [str(active.id)]
+    assert rows[1][1] == 'Export, "Quoted"'
+
+    response = superuser_client.get(
+        "/users/export",
+        params={"search": f"export{suffix}", "status": "all", "gzip": True},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert (
+        response.headers["content-disposition"] == 'attachment; filename="users.csv.gz"'
+    )
+    rows = list(csv.reader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert {row[3] for row in rows[1:]} == {active.email, pending.email}
+
+    response = superuser_client.get(
+        "/users/export", params={"order_by": "hashed_password"}
+    )
+    assert response.status_code == 400
+
+
 def test_read_user_by_id(superuser_client: TestClient, test_normal_user: User):
     """Test getting a specific user by ID."""
     response = superuser_client.get(f"/users/{test_normal_user.id}")
@@ -214,6 +452,49 @@ def test_read_user_by_id(superuser_client: TestClient, test_normal_user: User):
     assert "is_superuser" in user
 
 
+def test_read_user_by_id_with_groups_and_invitation(
+    superuser_client: TestClient, test_superuser: User, test_db: Session
+):
+    """Only active groups are listed, along with the invitation used."""
+    user = UserFactory.build(
+        email=f"detail{uuid.uuid4().hex[:8]}@example.com", status=UserStatus.ACTIVE
+    )
+    active_group = GroupFactory.build(
+        name="Detail Active", created_by_user_id=test_superuser.id
+    )
+    inactive_group = GroupFactory.build(
+        name="Detail Inactive",
+        created_by_user_id=test_superuser.id,
+        is_active=False,
+    )
+    invitation = Invitation(
+        type=InvitationType.LINK, created_by_user_id=test_superuser.id
+    )
+    test_db.add_all([user, active_group, inactive_group, invitation])
+    test_db.commit()
+    test_db.add_all(
+        [
+            UserGroup(user_id=user.id, group_id=active_group.id),
+            UserGroup(user_id=user.id, group_id=inactive_group.id),
+            InvitationRegistration(invitation_id=invitation.id, user_id=user.id),
+        ]
+    )
+    test_db.commit()
+
+    response = superuser_client.get(f"/users/{user.id}")
+    assert response.status_code == 200
+    detail = response.json()
+    assert detail["email"] == user.email
+    assert [group["name"] for group in detail["groups"]] == ["Detail Active"]
+    assert detail["invitation"]["id"] == invitation.id
+    assert detail["invitation"]["type"] == "link"
+    assert detail["invitation"]["created_by_user"]["email"] == test_superuser.email
+
+    response = superuser_client.get(f"/users/{test_superuser.id}")
+    assert response.json()["groups"] == []
+    assert response.json()["invitation"] is None
+
+
 def test_read_user_nonexistent_id(superuser_client: TestClient):
     """Test getting a user with a non-existent ID."""
     non_existent_id = uuid.uuid4()
@@ -364,3 +645,193 @@ def test_update_invalid_status(superuser_client: TestClient, test_normal_user: U
 
     # Should get validation error
     assert response.status_code == 422
+
+
+def test_bulk_update_user_status(
+    superuser_client: TestClient,
+    test_superuser: User,
+    test_db: Session,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Bulk status changes run in chunks, skip the current user and are audited."""
+    monkeypatch.setattr(config, "USER_BULK_UPDATE_CHUNK_SIZE", 2)
+    users = [
+        UserFactory.build(
+            email=f"bulk{i}{uuid.uuid4().hex[:8]}@example.com",
+            status=UserStatus.DEACTIVATED if i == 0 else UserStatus.ACTIVE,
+        )
+        for i in range(5)
+    ]
+    test_db.add_all(users)
+    test_db.commit()
+    user_ids = [str(user.id) for user in users]
+
+    response = superuser_client.post(
+        "/users/bulk",
+        json={
+            "user_ids": [*user_ids, str(test_superuser.id), str(uuid.uuid4())],
+            "status": "deactivated",
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "matched": 6,
+        "updated": 4,
+        "added_to_group": 0,
+        "removed_from_group": 0,
+        "complete": True,
+    }
+
+    for user in users:
+        test_db.refresh(user)
+        assert user.status == UserStatus.DEACTIVATED
+    test_db.refresh(test_superuser)
+    assert test_superuser.status == UserStatus.ACTIVE
+
+    audit = test_db.exec(
+        select(Transaction).where(
+            Transaction.model == Model.USER, Transaction.record_id.in_(user_ids)
+        )
+    ).all()
+    assert {t.record_id for t in audit} == set(user_ids[1:])
+    assert all(
+        t.meta_data
+        == {"old_data": {"status": "ACTIVE"}, "new_data": {"status": "DEACTIVATED"}}
+        for t in audit
+    )
+
+
+def test_bulk_update_stops_when_tokens_cannot_be_revoked(
+    superuser_client: TestClient,
+    test_db: Session,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """A bulk update reports the chunks it applied before revocation failed."""
+    monkeypatch.setattr(config, "USER_BULK_UPDATE_CHUNK_SIZE", 1)
+    users = sorted(
+        (
+            UserFactory.build(
+                email=f"bulkrevoke{i}{uuid.uuid4().hex[:8]}@example.com",
+                status=UserStatus.ACTIVE,
+            )
+            for i in range(2)
+        ),
+        key=lambda user: user.id,
+    )
+    test_db.add_all(users)
+    test_db.commit()
+    user_ids = [str(user.id) for user in users]
+
+    revocations = 0
+
+    async def revoke_tokens(*_):
+        nonlocal revocations
+        revocations += 1
+        # Before and after the first chunk's commit, then before the second's
+        if revocations > 2:
+            raise token_epoch.TokenRevocationError("Connection refused")
+
+    monkeypatch.setattr(token_epoch, "revoke_tokens", revoke_tokens)
+    invalidated = []
+
+    async def invalidate_counts(*names):
+        invalidated.extend(names)
+
+    monkeypatch.setattr(
+        "app.api.keystone.utils.user.invalidate_counts", invalidate_counts
+    )
+
+    response = superuser_client.post(
+        "/users/bulk", json={"user_ids": user_ids, "status": "deactivated"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "matched": 1,
+        "updated": 1,
+        "added_to_group": 0,
+        "removed_from_group": 0,
+        "complete": False,
+    }
+    # The counts of the chunk applied are refreshed all the same
+    assert invalidated == ["users", "groups"]
+
+    for user in users:
+        test_db.refresh(user)
+    assert [user.status for user in users] == [
+        UserStatus.DEACTIVATED,
+        UserStatus.ACTIVE,
+    ]
+    audit = test_db.exec(
+        select(Transaction.record_id).where(
+            Transaction.model == Model.USER, Transaction.record_id.in_(user_ids)
+        )
+    ).all()
+    assert audit == [user_ids[0]]
+
+
+def test_bulk_update_users_by_filters(
+    superuser_client: TestClient, test_superuser: User, test_db: Session
+):
+    """Users matching the datatable search and filters are added to a group."""
+    marker = uuid.uuid4().hex[:8]
+    users = [
+        UserFactory.build(
+            email=f"bulkfilter{i}{marker}@example.com", is_superuser=False
+        )
+        for i in range(3)
+    ]
+    group = GroupFactory.build(created_by_user_id=test_superuser.id)
+    test_db.add_all([*users, group])
+    test_db.commit()
+    test_db.add(UserGroup(user_id=users[0].id, group_id=group.id))
+    test_db.commit()
+
+    body = {
+        "search": marker,
+        "filters": {"status": "all", "role": "user"},
+        "add_to_group": group.id,
+    }
+    response = superuser_client.post("/users/bulk", json=body)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["matched"] == 3
+    assert response.json()["added_to_group"] == 2
+    member_ids = test_db.exec(
+        select(UserGroup.user_id).where(UserGroup.group_id == group.id)
+    ).all()
+    assert set(member_ids) == {user.id for user in users}
+
+    response = superuser_client.post(
+        "/users/bulk",
+        json={**body, "add_to_group": None, "remove_from_group": group.id},
+    )
+    assert response.json()["removed_from_group"] == 3
+    assert not test_db.exec(
+        select(UserGroup).where(UserGroup.group_id == group.id)
+    ).all()
+
+
+def test_bulk_update_users_validation(superuser_client: TestClient):
+    user_id = str(uuid.uuid4())
+
+    # Neither or both selections
+    response = superuser_client.post("/users/bulk", json={"status": "active"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    response = superuser_client.post(
+        "/users/bulk", json={"user_ids": [user_id], "filters": {}, "status": "active"}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # Nothing to change
+    response = superuser_client.post("/users/bulk", json={"user_ids": [user_id]})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = superuser_client.post(
+        "/users/bulk",
+        json={"user_ids": [user_id], "status": "pending_email_verification"},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = superuser_client.post(
+        "/users/bulk", json={"user_ids": [user_id], "add_to_group": 999999}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -43,3 +43,20 @@ def test_test_email(superuser_client: TestClient, mock_send_email: Mock):
     assert call_args["email_to"] == email
     assert "subject" in call_args
     assert "html_content" in call_args
+
+
+def test_read_metrics_normal_user(authorized_client: TestClient):
+    """Test that normal users cannot read worker metrics."""
+    response = authorized_client.get("/utils/metrics/")
+
+    assert response.status_code == 403
+
+
+def test_read_metrics(superuser_client: TestClient):
+    """Test that superusers can read worker metrics."""
+    response = superuser_client.get("/utils/metrics/")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert "counters" in data
+    assert "timings" in data
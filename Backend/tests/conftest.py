@@ -19,6 +19,7 @@ from data_pipeline.seeders.user_seeder import UserFactory, pwd_context
 # Test-specific overrides
 config.SECRET_KEY = "test_secret_key"
 config.CACHE_ENABLED = False
+config.AUTH_THROTTLE_ENABLED = False
 config.EMAILS_FROM_EMAIL = "test@example.com"
 
 # ------------------------------------------------------------------------------
@@ -47,7 +48,11 @@ def override_db_session():
     # Patch the AsyncSessionLocal in app.core.db
     with patch("app.core.db.AsyncSessionLocal", test_async_session_local):
         with patch("app.api.deps.AsyncSessionLocal", test_async_session_local):
-            yield
+            # Streamed responses open their own sessions
+            with patch(
+                "app.utils.csv_export.AsyncSessionLocal", test_async_session_local
+            ):
+                yield
 
 
 @pytest.fixture(scope="session", autouse=True)
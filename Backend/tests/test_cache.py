@@ -0,0 +1,56 @@
+import time
+import uuid
+
+from app.utils.cache import BloomFilter, TTLCache
+
+
+def test_ttl_cache_get_set_and_pop():
+    """Test basic get, set and pop on the TTL cache."""
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert "a" in cache
+    assert cache.pop("a") == 1
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_expires_entries():
+    """Test that entries are dropped once their TTL elapses."""
+    cache: TTLCache[str, int] = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted when full."""
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test that every added item is reported present."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [uuid.uuid4().bytes for _ in range(1000)]
+    bloom.update(items)
+
+    assert all(item in bloom for item in items)
+
+
+def test_bloom_filter_false_positive_rate():
+    """Test that the false positive rate stays near the configured one."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    bloom.update(uuid.uuid4().bytes for _ in range(1000))
+
+    false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10_000))
+    assert false_positives < 300
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import timedelta
+
+import jwt
+import pytest
+from passlib.hash import bcrypt
+
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.security import (
+    ALGORITHM,
+    PasswordHasher,
+    PasswordHasherBusyError,
+    create_access_token,
+    get_password_hash,
+    password_needs_rehash,
+)
+
+
+def test_password_hasher_hash_and_verify():
+    """Test hashing and verification through the process pool."""
+    hasher = PasswordHasher(max_workers=1, max_queue_size=4)
+
+    async def run() -> tuple[bool, bool]:
+        hashed = await hasher.hash("password")
+        return (
+            await hasher.verify("password", hashed),
+            await hasher.verify("wrong-password", hashed),
+        )
+
+    try:
+        assert asyncio.run(run()) == (True, False)
+    finally:
+        hasher.shutdown()
+
+    assert hasher.pending == 0
+    assert metrics.snapshot()["timings"]["password_hasher.verify"]["count"] >= 2
+
+
+def test_password_hasher_rejects_when_queue_full():
+    """Test that calls beyond the queue limit are rejected without hashing."""
+    hasher = PasswordHasher(max_workers=1, max_queue_size=0)
+
+    with pytest.raises(PasswordHasherBusyError):
+        asyncio.run(hasher.verify("password", get_password_hash("password")))
+
+    assert hasher.pending == 0
+
+
+def test_create_access_token_claims():
+    """Test that role, status and epoch claims are embedded together."""
+    token = create_access_token(
+        "user-id",
+        expires_delta=timedelta(minutes=5),
+        is_superuser=True,
+        status="active",
+        epoch=2,
+    )
+    payload = jwt.decode(token, config.SECRET_KEY, algorithms=[ALGORITHM])
+    assert (payload["sub"], payload["su"], payload["st"], payload["ep"]) == (
+        "user-id",
+        True,
+        "active",
+        2,
+    )
+
+    legacy = create_access_token("user-id", expires_delta=timedelta(minutes=5))
+    payload = jwt.decode(legacy, config.SECRET_KEY, algorithms=[ALGORITHM])
+    assert "ep" not in payload
+
+
+def test_password_needs_rehash():
+    """Test that only hashes below the shared minimum cost are rehashed."""
+    assert not password_needs_rehash(get_password_hash("password"))
+    assert password_needs_rehash(bcrypt.using(rounds=4).hash("password"))
+    # Hashed by a host calibrated to another cost
+    min_rounds = bcrypt.using(rounds=config.BCRYPT_MIN_ROUNDS).hash("password")
+    assert not password_needs_rehash(min_rounds)